@@ -0,0 +1,266 @@
+"""Banc d'essai du moteur, sans interface graphique.
+
+Génère des grilles synthétiques paramétrées (serpentin de câbles, chaînes
+d'inverseurs, matrice de LED, lignes de répéteurs, mosaïque de portes,
+oscillateurs en anneau), les simule sans tkinter et mesure pour chacune les
+ticks par seconde, le temps passé dans chaque phase du tick et le pic de
+mémoire. Les résultats sont écrits en JSON pour être comparés d'une version à
+l'autre :
+
+    python benchmark.py --output avant.json
+    python benchmark.py --compare avant.json    # code de sortie 1 en cas de régression
+    python benchmark.py --buffered --shards 4   # grilles découpées en 4 processus (voir sharded.py)
+
+Pendant la mesure, une partie des boutons est basculée à intervalle régulier,
+comme le ferait un utilisateur, pour que le circuit ne reste pas au repos.
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from engine import Simulation, CABLE, BUTTON, SWITCH, LED, REPEATER, SWITCH_INIT_DELAY
+from presets import PRESETS, schema_size, tile_placements
+from profiler import TickProfiler
+from sharded import ShardedSimulation
+
+FORMAT_VERSION = 1
+TOGGLE_EVERY = 10  # Ticks entre deux vagues de bascules de boutons
+TOGGLE_FRACTION = 0.25  # Part des boutons basculés à chaque vague
+MEMORY_TICKS = 50  # Ticks simulés pendant la mesure de mémoire (tracemalloc ralentit la simulation)
+
+
+# ---------------------- Générateurs de grilles ----------------------
+# Chaque générateur renvoie (lignes, colonnes, [(type d'item, x, y), ...]) pour une grille de côté size.
+
+def serpentine(size):
+    """Un seul câble qui parcourt toute la grille en serpentin, d'un bouton à une LED."""
+    path = []
+    for y in range(0, size, 2):
+        columns = range(size) if y % 4 == 0 else range(size - 1, -1, -1)
+        path += [(x, y) for x in columns]
+        if y + 1 < size:
+            path.append((columns[-1], y + 1))  # Virage vers la ligne suivante
+    placements = [(CABLE, x, y) for x, y in path]
+    placements[0] = (BUTTON,) + path[0]
+    placements[-1] = (LED,) + path[-1]
+    return size, size, placements
+
+
+def inverter_chains(size):
+    """Chaque ligne : un bouton suivi d'une chaîne de switches (inverseurs) jusqu'au bord."""
+    placements = []
+    for y in range(size):
+        placements.append((BUTTON, 0, y))
+        placements += [(SWITCH, x, y) for x in range(1, size)]
+    return size, size, placements
+
+
+def led_array(size):
+    """Damier de boutons et de LED : chaque LED est allumée par les boutons qui l'entourent."""
+    return size, size, [(BUTTON if (x + y) % 2 else LED, x, y) for y in range(size) for x in range(size)]
+
+
+def repeater_lines(size):
+    """Une ligne sur deux : un bouton suivi de répéteurs jusqu'au bord."""
+    placements = []
+    for y in range(0, size, 2):
+        placements.append((BUTTON, 0, y))
+        placements += [(REPEATER, x, y) for x in range(1, size)]
+    return size, size, placements
+
+
+def preset_array(size, name="Porte XOR"):
+    """Mosaïque de copies d'un preset couvrant la grille."""
+    width, height = schema_size(PRESETS[name])
+    count_x, count_y = max(1, size // (width + 1)), max(1, size // (height + 1))
+    return size, size, tile_placements(PRESETS[name], 0, 0, count_x, count_y)
+
+
+def ring_oscillators(size):
+    """
+    Mosaïque d'oscillateurs : un switch dont le câble de sortie (dessous) revient sur son entrée
+    (gauche) change d'état à chaque tick.
+    """
+    placements = []
+    for y in range(0, size - 1, 3):
+        for x in range(0, size - 1, 3):
+            placements += [(CABLE, x, y), (SWITCH, x + 1, y), (CABLE, x, y + 1), (CABLE, x + 1, y + 1)]
+    return size, size, placements
+
+
+GENERATORS = {
+    'serpentine': serpentine,
+    'inverter_chains': inverter_chains,
+    'led_array': led_array,
+    'repeater_lines': repeater_lines,
+    'preset_array': preset_array,
+    'ring_oscillators': ring_oscillators,
+}
+
+
+# ---------------------- Mesures ----------------------
+def build(engine, generator, size, buffered):
+    rows, cols, placements = generator(size)
+    sim = engine(rows, cols, buffered)
+    sim.place_items(placements)
+    return sim
+
+
+def simulate(sim, ticks, seed):
+    """Simule ticks ticks (un step() par tick, comme la boucle de l'interface) avec des bascules régulières."""
+    rng = random.Random(seed)
+    buttons = sim.cells_of_type(BUTTON)
+    count = max(1, int(len(buttons) * TOGGLE_FRACTION)) if buttons else 0
+    for tick in range(ticks):
+        if count and tick % TOGGLE_EVERY == 0:
+            for cell in rng.sample(buttons, count):
+                sim.toggle_item_state(cell)
+        sim.step()
+
+
+def run_benchmark(name, engine=Simulation, size=100, ticks=200, buffered=False, seed=0, shards=0):
+    """
+    Mesure un générateur et renvoie le résultat sous forme de dictionnaire sérialisable en JSON.
+    Avec shards > 0, la grille est calculée en autant de processus (mode bufferisé, moteur Python).
+    """
+    generator = GENERATORS[name]
+    start = time.perf_counter()
+    sim = build(engine, generator, size, buffered)
+    build_time = time.perf_counter() - start
+    sim.run(SWITCH_INIT_DELAY + 1)  # Fin de la chauffe des switches, hors mesure
+
+    if shards:
+        with ShardedSimulation(sim, shards) as sharded:
+            start = time.perf_counter()
+            simulate(sharded, ticks, seed)
+            elapsed = time.perf_counter() - start
+        timings = {'other': elapsed}  # Les phases sont calculées dans les processus, hors de portée du profileur
+    else:
+        profiler = TickProfiler(capacity=1)  # Seuls les cumuls par phase servent ici
+        profiler.attach(sim)
+        start = time.perf_counter()
+        simulate(sim, ticks, seed)
+        elapsed = time.perf_counter() - start
+        profiler.detach()
+        timings = dict(profiler.totals)
+        timings['other'] = max(0.0, elapsed - sum(timings.values()))
+
+    # Mémoire : nouvelle grille mesurée sous tracemalloc (construction comprise)
+    tracemalloc.start()
+    memory_sim = build(engine, generator, size, buffered)
+    simulate(memory_sim, min(ticks, MEMORY_TICKS), seed)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'name': name,
+        'engine': engine.__name__,
+        'size': size,
+        'buffered': buffered,
+        'shards': shards,
+        'cells': sim.cell_count(),
+        'ticks': ticks,
+        'build_seconds': round(build_time, 6),
+        'seconds': round(elapsed, 6),
+        'ticks_per_second': round(ticks / elapsed, 3) if elapsed else None,
+        'phases': {phase: round(seconds, 6) for phase, seconds in timings.items()},
+        'peak_memory': peak,
+    }
+
+
+def run_suite(names=None, engine=Simulation, size=100, ticks=200, buffered=False, seed=0, shards=0):
+    results = [run_benchmark(name, engine, size, ticks, buffered, seed, shards) for name in names or GENERATORS]
+    return {
+        'format': FORMAT_VERSION,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+
+
+# ---------------------- Rapport et comparaison ----------------------
+def result_key(result):
+    return (result['name'], result['engine'], result['size'], result['buffered'], result.get('shards', 0),
+            result['ticks'])
+
+
+def format_report(report):
+    lines = [f"{'banc':<18} {'cellules':>9} {'ticks/s':>10} {'mémoire':>10}  phases (ms)"]
+    for result in report['results']:
+        phases = ' '.join(f"{phase}={seconds * 1000:.1f}" for phase, seconds in result['phases'].items() if seconds)
+        lines.append(f"{result['name']:<18} {result['cells']:>9} {result['ticks_per_second'] or 0:>10.1f} "
+                     f"{result['peak_memory'] / 2 ** 20:>8.1f}Mo  {phases}")
+    return '\n'.join(lines)
+
+
+def compare(report, baseline, tolerance=0.1):
+    """
+    Compare les ticks par seconde avec une mesure de référence (mêmes bancs et paramètres).
+    Renvoie (lignes du rapport, régressions) ; une régression est un ralentissement de plus de tolerance.
+    """
+    previous = {result_key(result): result for result in baseline['results']}
+    lines, regressions = [], []
+    for result in report['results']:
+        old = previous.get(result_key(result))
+        if old is None or not old['ticks_per_second'] or not result['ticks_per_second']:
+            lines.append(f"{result['name']:<18} pas de référence")
+            continue
+        ratio = result['ticks_per_second'] / old['ticks_per_second']
+        memory = result['peak_memory'] / old['peak_memory'] if old['peak_memory'] else 1.0
+        flag = ''
+        if ratio < 1 - tolerance:
+            flag = '  RÉGRESSION'
+            regressions.append(result['name'])
+        lines.append(f"{result['name']:<18} vitesse x{ratio:.2f}  mémoire x{memory:.2f}{flag}")
+    return lines, regressions
+
+
+def engine_class(name):
+    if name == 'numpy':
+        from numpy_engine import NumpySimulation  # NumPy est optionnel
+        return NumpySimulation
+    return Simulation
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banc d'essai du moteur elektrikal (sans affichage)")
+    parser.add_argument('benchmarks', nargs='*', metavar='banc',
+                        help=f"bancs à lancer parmi {', '.join(GENERATORS)} (tous par défaut)")
+    parser.add_argument('--engine', choices=('python', 'numpy'), default='python')
+    parser.add_argument('--size', type=int, default=100, help="côté des grilles générées")
+    parser.add_argument('--ticks', type=int, default=200, help="ticks mesurés par banc")
+    parser.add_argument('--buffered', action='store_true', help="mode de tick bufferisé")
+    parser.add_argument('--seed', type=int, default=0, help="graine des bascules de boutons")
+    parser.add_argument('--shards', type=int, default=0,
+                        help="processus de calcul par grille (mode bufferisé et moteur python uniquement)")
+    parser.add_argument('--output', help="fichier JSON où écrire les résultats")
+    parser.add_argument('--compare', help="fichier JSON de référence")
+    parser.add_argument('--tolerance', type=float, default=0.1, help="ralentissement toléré (0.1 = 10 %%)")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.benchmarks if name not in GENERATORS]
+    if unknown:
+        parser.error(f"banc inconnu : {', '.join(unknown)}")
+    if args.shards and (not args.buffered or args.engine != 'python'):
+        parser.error("--shards exige --buffered et le moteur python")
+
+    report = run_suite(args.benchmarks, engine_class(args.engine), args.size, args.ticks, args.buffered, args.seed,
+                       args.shards)
+    print(format_report(report))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            lines, regressions = compare(report, json.load(f), args.tolerance)
+        print('\n'.join(lines))
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+"""Sauvegarde et chargement des grilles dans un format binaire compact (.elk).
+
+La grille est découpée en chunks carrés compressés séparément ; un index en
+tête de fichier donne la position de chaque chunk, si bien qu'un lecteur peut
+projeter le fichier en mémoire (mmap) et ne décompresser que les chunks dont il
+a besoin, directement dans les plans du moteur, sans objet Python par cellule.
+
+Format (little-endian) :
+    en-tête        magic b'ELKB', version (H), rows (I), cols (I), tick (Q), taille des chunks (H), options (H)
+    métadonnées    longueur (I) puis JSON UTF-8 (définitions des items de l'interface)
+    temporisations nombre (I) puis, pour chacune, action (B), délai en ticks (I), x (I), y (I)
+    index          offset (Q) de chaque chunk, ligne de chunks par ligne de chunks, puis sa longueur (I) ;
+                   une longueur nulle désigne un chunk entièrement vide
+    chunks         zlib(types + états actifs + initialisations), chaque plan ligne par ligne
+"""
+import json
+import mmap
+import struct
+import zlib
+
+from engine import Simulation, TimingWheel, EMPTY, SWITCH_READY, REPEATER_OUTPUT
+
+MAGIC = b'ELKB'
+VERSION = 1
+CHUNK_SIZE = 64
+BUFFERED_FLAG = 1
+
+HEADER = struct.Struct('<4sHIIQHH')
+LENGTH = struct.Struct('<I')
+TIMER = struct.Struct('<BIII')
+
+
+def chunk_grid(rows, cols, chunk_size):
+    """Nombre de chunks (en largeur, en hauteur) pour une grille rows x cols."""
+    return -(-cols // chunk_size), -(-rows // chunk_size)
+
+
+def save_board(sim, path, items=None, chunk_size=CHUNK_SIZE):
+    """
+    Enregistre la grille du moteur (types, états, chauffe des switches et signaux de répéteurs
+    en attente) ainsi que les définitions d'items items (dictionnaire sérialisable en JSON).
+    """
+    metadata = json.dumps({'items': items or {}}).encode('utf-8')
+    timers = [(SWITCH_READY, due - sim.tick) + sim.position(cell) for cell, due in sim.warming.items()]
+    timers += [(REPEATER_OUTPUT, tick - sim.tick) + sim.position(cell)
+               for tick, action, cell in sim.pending_events() if action == REPEATER_OUTPUT]
+    chunks_x, chunks_y = chunk_grid(sim.rows, sim.cols, chunk_size)
+    offsets, lengths = [], []
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, sim.rows, sim.cols, sim.tick, chunk_size,
+                            BUFFERED_FLAG if sim.buffered else 0))
+        f.write(LENGTH.pack(len(metadata)))
+        f.write(metadata)
+        f.write(LENGTH.pack(len(timers)))
+        f.write(b''.join(TIMER.pack(*timer) for timer in timers))
+        index_position = f.tell()
+        f.write(bytes(12 * chunks_x * chunks_y))  # Index réécrit une fois les chunks placés
+        for cy in range(chunks_y):
+            for cx in range(chunks_x):
+                data = chunk_bytes(sim, cx * chunk_size, cy * chunk_size, chunk_size)
+                if data is None:
+                    offsets.append(0)
+                    lengths.append(0)
+                    continue
+                data = zlib.compress(data)
+                offsets.append(f.tell())
+                lengths.append(len(data))
+                f.write(data)
+        f.seek(index_position)
+        f.write(struct.pack(f'<{len(offsets)}Q', *offsets))
+        f.write(struct.pack(f'<{len(lengths)}I', *lengths))
+
+
+def chunk_bytes(sim, x0, y0, chunk_size):
+    """Plans d'un chunk bout à bout, ou None s'il ne contient aucun item."""
+    width, height = min(chunk_size, sim.cols - x0), min(chunk_size, sim.rows - y0)
+    planes = []
+    for plane in (sim.kind, sim.active, sim.initialized):
+        rows = []
+        for y in range(y0, y0 + height):
+            start = sim.index(x0, y)
+            rows.append(plane[start:start + width])
+        planes.append(b''.join(rows))
+    if planes[0].count(EMPTY) == width * height:
+        return None
+    return b''.join(planes)
+
+
+class BoardReader:
+    """
+    Lecture paresseuse d'une sauvegarde : le fichier est projeté en mémoire et chaque
+    chunk n'est lu et décompressé qu'à la demande.
+    """
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.data = None
+        try:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.read_header()
+        except struct.error as error:
+            self.close()
+            raise ValueError("Fichier de grille tronqué") from error
+        except ValueError:
+            self.close()
+            raise
+
+    def read_header(self):
+        data = self.data
+        magic, version, self.rows, self.cols, self.tick, self.chunk_size, flags = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError("Ce fichier n'est pas une grille elektrikal")
+        if version != VERSION:
+            raise ValueError(f"Version de fichier non prise en charge : {version}")
+        self.buffered = bool(flags & BUFFERED_FLAG)
+        position = HEADER.size
+        (length,) = LENGTH.unpack_from(data, position)
+        position += LENGTH.size
+        self.metadata = json.loads(data[position:position + length].decode('utf-8'))
+        position += length
+        (count,) = LENGTH.unpack_from(data, position)
+        position += LENGTH.size
+        self.timers = [TIMER.unpack_from(data, position + i * TIMER.size) for i in range(count)]
+        position += count * TIMER.size
+        self.chunks_x, self.chunks_y = chunk_grid(self.rows, self.cols, self.chunk_size)
+        total = self.chunks_x * self.chunks_y
+        self.offsets = struct.unpack_from(f'<{total}Q', data, position)
+        self.lengths = struct.unpack_from(f'<{total}I', data, position + 8 * total)
+
+    def close(self):
+        if self.data is not None:
+            self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def items(self):
+        """Définitions d'items enregistrées, indexées par identifiant."""
+        return {int(item_id): data for item_id, data in self.metadata.get('items', {}).items()}
+
+    def chunk(self, cx, cy):
+        """
+        Renvoie (x0, y0, largeur, hauteur, types, états, initialisations) pour le chunk (cx, cy),
+        ou None s'il est vide.
+        """
+        i = cy * self.chunks_x + cx
+        if not self.lengths[i]:
+            return None
+        offset = self.offsets[i]
+        try:
+            data = zlib.decompress(self.data[offset:offset + self.lengths[i]])
+        except zlib.error as error:
+            raise ValueError(f"Chunk ({cx}, {cy}) illisible") from error
+        x0, y0 = cx * self.chunk_size, cy * self.chunk_size
+        width, height = min(self.chunk_size, self.cols - x0), min(self.chunk_size, self.rows - y0)
+        area = width * height
+        if len(data) != 3 * area:
+            raise ValueError(f"Chunk ({cx}, {cy}) illisible")
+        return x0, y0, width, height, data[:area], data[area:2 * area], data[2 * area:]
+
+    def chunks(self):
+        """Itère sur les chunks non vides, un seul étant décompressé à la fois."""
+        for cy in range(self.chunks_y):
+            for cx in range(self.chunks_x):
+                if self.lengths[cy * self.chunks_x + cx]:
+                    yield self.chunk(cx, cy)
+
+    def load_into(self, sim):
+        """Remplace le contenu du moteur par la grille enregistrée."""
+        sim.reset(self.rows, self.cols)
+        sim.buffered = self.buffered
+        for x0, y0, width, height, kind, active, initialized in self.chunks():
+            for row in range(height):
+                start = sim.index(x0, y0 + row)
+                source = slice(row * width, (row + 1) * width)
+                sim.kind[start:start + width] = kind[source]
+                sim.active[start:start + width] = active[source]
+                sim.initialized[start:start + width] = initialized[source]
+        sim.rebuild()
+        sim.tick = self.tick
+        sim.events = TimingWheel(self.tick)
+        for action, delay, x, y in self.timers:
+            cell = sim.index(x, y)
+            if action == SWITCH_READY:
+                sim.start_warmup(cell, self.tick + delay)
+            else:
+                sim.schedule(delay, action, cell)
+        return sim
+
+
+def load_board(path, sim=None):
+    """Charge une sauvegarde dans sim (un nouveau Simulation par défaut) et renvoie (sim, items)."""
+    with BoardReader(path) as reader:
+        if sim is None:
+            sim = Simulation(reader.rows, reader.cols)
+        reader.load_into(sim)
+        return sim, reader.items
@@ -0,0 +1,197 @@
+"""Simulation de grilles en ligne de commande, sans interface graphique.
+
+Charge des sauvegardes (.elk, voir boardfile.py) ou un preset, bascule
+éventuellement des boutons, calcule N ticks ou s'arrête au premier point
+fixe, puis affiche l'état des LED (ou des cellules sondées), ou leur trace
+tick par tick. Le module n'importe pas tkinter : le démarrage ne prend que
+quelques millisecondes, et plusieurs grilles se vérifient dans un même
+processus, pour l'intégration continue :
+
+    python cli.py grille.elk --ticks 200
+    python cli.py --preset "Porte XOR" --press 0,0 --until-stable --expect 1
+    python cli.py grille.elk --ticks 50 --trace --probe 3,1 --probe 7,1
+    python cli.py tests/*.elk --until-stable --json
+
+Le code de sortie vaut 1 si une grille n'a pas les états finaux attendus
+(--expect : un chiffre 0 / 1 par LED ou sonde, dans l'ordre de lecture),
+n'atteint pas de point fixe avec --until-stable, ou ne peut pas être chargée
+ou simulée (les grilles suivantes sont tout de même vérifiées) ; il vaut 2
+pour des arguments invalides.
+"""
+import argparse
+import json
+import sys
+
+from boardfile import load_board
+from cycles import CycleDetector
+from engine import Simulation, LED
+from netlist import Netlist
+from presets import PRESETS, schema_size, stamp
+
+DEFAULT_TICKS = 100  # Ticks calculés sans --ticks
+STABLE_LIMIT = 100000  # Ticks calculés au plus par --until-stable sans --ticks
+
+
+def position(text):
+    """Type argparse : « x,y » -> (x, y)."""
+    try:
+        x, y = (int(value) for value in text.split(','))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"position attendue sous la forme x,y : {text!r}")
+    return x, y
+
+
+def build_preset(name):
+    """Moteur à la taille d'un preset, qui y est posé."""
+    width, height = schema_size(PRESETS[name])
+    sim = Simulation(height, width)
+    stamp(sim, PRESETS[name])
+    return sim
+
+
+def probe_cells(sim, positions):
+    """Cellules observées : celles des positions données, ou toutes les LED (dans l'ordre de lecture)."""
+    if not positions:
+        return sim.cells_of_type(LED)
+    outside = [f"{x},{y}" for x, y in positions if not sim.in_bounds(x, y)]
+    if outside:
+        raise ValueError(f"sonde hors grille : {', '.join(outside)}")
+    return [sim.index(x, y) for x, y in positions]
+
+
+def states(sim, cells):
+    active = sim.active
+    return ''.join('1' if active[cell] else '0' for cell in cells)
+
+
+def run(sim, ticks, until_stable=False):
+    """
+    Calcule ticks ticks, les périodes entières d'un cycle étant sautées ; avec until_stable, s'arrête
+    dès que l'orbite est connue (point fixe ou cycle). Renvoie la période atteinte (1 : point fixe) ou None.
+    """
+    detector = CycleDetector(sim)
+    if not until_stable:
+        detector.run(ticks)
+        return detector.current_period()
+    for _ in range(ticks):
+        period = detector.observe()
+        if period is not None:
+            return period
+        sim.advance()
+    return detector.observe()
+
+
+def trace(sim, cells, ticks, until_stable=False):
+    """
+    Comme run, en calculant chaque tick hors point fixe ; renvoie (période, changements), changements
+    listant les (tick, états des cellules) : l'état initial, puis chaque tick où l'un d'eux change.
+    """
+    detector = CycleDetector(sim)
+    end = sim.tick + ticks
+    values = states(sim, cells)
+    changes = [(sim.tick, values)]
+    period = None
+    while sim.tick < end:
+        period = detector.observe()
+        if period == 1 or period is not None and until_stable:
+            break
+        sim.advance()
+        current = states(sim, cells)
+        if current != values:
+            changes.append((sim.tick, current))
+            values = current
+    else:
+        period = detector.observe()
+    if period == 1 and not until_stable:
+        sim.skip(end - sim.tick)  # Point fixe : plus aucun changement
+    return period, changes
+
+
+def describe(period):
+    return "" if period is None else " (au repos)" if period == 1 else f" (cycle de {period} ticks)"
+
+
+def check(sim, args):
+    """Bascule les boutons, calcule les ticks demandés et renvoie le résultat (dict) d'une grille."""
+    if args.buffered:
+        sim.set_buffered(True)
+    cells = probe_cells(sim, args.probe)
+    for x, y in args.press:
+        if not sim.in_bounds(x, y) or not sim.toggle_item_state(sim.index(x, y)):
+            raise ValueError(f"pas de bouton en {x},{y}")
+    if args.settle:
+        Netlist(sim).settle()
+    ticks = args.ticks if args.ticks is not None else STABLE_LIMIT if args.until_stable else DEFAULT_TICKS
+    result = {'cells': [list(sim.position(cell)) for cell in cells]}
+    if args.trace:
+        period, changes = trace(sim, cells, ticks, args.until_stable)
+        result['trace'] = [[tick, values] for tick, values in changes]
+    else:
+        period = run(sim, ticks, args.until_stable)
+    result.update(tick=sim.tick, period=period, states=states(sim, cells))
+    failures = []
+    if args.until_stable and period != 1:
+        failures.append(f"pas de point fixe en {ticks} ticks{describe(period)}")
+    if args.expect is not None and result['states'] != args.expect:
+        failures.append(f"états finaux {result['states']}, attendus {args.expect}")
+    result['failures'] = failures
+    return result
+
+
+def format_result(result):
+    labels = [f"{x},{y}" for x, y in result['cells']]
+    lines = [] if result['tick'] is None else [f"Tick {result['tick']}{describe(result['period'])}"]
+    if 'trace' in result:
+        lines.append(' '.join(['tick'] + labels))
+        lines.extend(' '.join([str(tick)] + list(values)) for tick, values in result['trace'])
+    else:
+        lines.extend(f"{label} : {value}" for label, value in zip(labels, result['states']))
+    lines.extend(f"Échec : {failure}" for failure in result['failures'])
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulation de grilles elektrikal (sans affichage)")
+    parser.add_argument('boards', nargs='*', metavar='grille', help="sauvegardes .elk à simuler")
+    parser.add_argument('--preset', choices=sorted(PRESETS), help="simuler un preset au lieu de sauvegardes")
+    parser.add_argument('--ticks', type=int,
+                        help=f"ticks calculés ({DEFAULT_TICKS} par défaut ; limite de --until-stable, "
+                             f"{STABLE_LIMIT} par défaut)")
+    parser.add_argument('--until-stable', action='store_true', help="s'arrêter au premier point fixe")
+    parser.add_argument('--press', type=position, action='append', default=[], metavar='x,y',
+                        help="bouton basculé avant les ticks (répétable)")
+    parser.add_argument('--settle', action='store_true', help="stabiliser le circuit avant les ticks (voir netlist.py)")
+    parser.add_argument('--buffered', action='store_true', help="mode de tick bufferisé")
+    parser.add_argument('--probe', type=position, action='append', default=[], metavar='x,y',
+                        help="cellule observée (répétable ; toutes les LED par défaut)")
+    parser.add_argument('--trace', action='store_true', help="afficher chaque changement d'état, tick par tick")
+    parser.add_argument('--expect', metavar='états',
+                        help="états finaux attendus, un chiffre 0 / 1 par cellule observée")
+    parser.add_argument('--json', action='store_true', help="une ligne JSON par grille")
+    args = parser.parse_args(argv)
+    if bool(args.boards) == bool(args.preset):
+        parser.error("donner des sauvegardes ou --preset (un seul des deux)")
+    if args.ticks is not None and args.ticks < 0:
+        parser.error("--ticks doit être positif")
+
+    status = 0
+    for board in args.boards or [None]:
+        try:
+            sim = build_preset(args.preset) if board is None else load_board(board)[0]
+            result = check(sim, args)
+        except (OSError, ValueError) as error:
+            # La grille est signalée en échec, les suivantes sont tout de même vérifiées
+            result = {'cells': [], 'tick': None, 'period': None, 'states': '', 'failures': [str(error)]}
+        if result['failures']:
+            status = 1
+        if args.json:
+            print(json.dumps(dict(result, board=board or args.preset)))
+        else:
+            if len(args.boards) > 1:
+                print(f"== {board}")
+            print(format_result(result))
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""Détection des points fixes et des cycles de la simulation.
+
+Sans action extérieure, le moteur est déterministe : si l'état entre deux
+ticks (voir Simulation.state_digest) retrouve une valeur déjà vue p ticks plus
+tôt, la suite se répète avec la période p. Le détecteur garde les empreintes des
+derniers ticks calculés ; dès qu'une empreinte revient, la période est connue
+et les périodes entières n'ont plus besoin d'être calculées : l'horloge du
+moteur est simplement avancée (Simulation.skip). Une période de 1 est un point
+fixe : la grille dort et chaque tick ne coûte plus rien.
+
+Toute action extérieure (bouton basculé, état imposé, pose, déplacement ou
+suppression d'un item) change revision ou inputs dans le moteur : le
+détecteur oublie alors ses empreintes et recommence à calculer chaque tick.
+"""
+import time
+from collections import deque
+
+DEFAULT_HISTORY = 4096  # Empreintes gardées : période la plus longue détectable
+
+
+class CycleDetector:
+    def __init__(self, sim, history=DEFAULT_HISTORY):
+        self.sim = sim
+        self.history = history
+        self.seen = {}  # empreinte -> tick où l'état a été vu
+        self.order = deque()  # empreintes dans l'ordre d'observation, pour oublier les plus anciennes
+        self.epoch = None  # (revision, inputs) du moteur lors des observations en cours
+        self.period = None  # Période de l'orbite courante (1 : point fixe), None tant qu'elle est inconnue
+        self.skipped = 0  # Ticks sautés sans calcul depuis la création
+
+    def forget(self):
+        self.seen.clear()
+        self.order.clear()
+        self.period = None
+
+    def observe(self):
+        """Enregistre l'état courant du moteur ; renvoie la période si l'état s'est déjà présenté, sinon None."""
+        sim = self.sim
+        epoch = (sim.revision, sim.inputs)
+        if epoch != self.epoch:
+            self.forget()
+            self.epoch = epoch
+        if self.period is not None:
+            return self.period
+        digest = sim.state_digest()
+        first = self.seen.get(digest)
+        if first is not None:
+            self.period = sim.tick - first
+            return self.period
+        self.seen[digest] = sim.tick
+        self.order.append(digest)
+        if len(self.order) > self.history:
+            del self.seen[self.order.popleft()]
+        return None
+
+    def current_period(self):
+        """Période de l'orbite courante (1 : point fixe), None si inconnue ou périmée par une action extérieure."""
+        return self.period if self.epoch == (self.sim.revision, self.sim.inputs) else None
+
+    # ---------------------- Simulation avec sauts ----------------------
+    def advance(self, remaining=None):
+        """
+        Calcule un tick, ou saute sans calcul autant de périodes entières que remaining le permet
+        (une seule si remaining vaut None). Renvoie le nombre de ticks écoulés.
+        """
+        period = self.observe()
+        if period is None or remaining is not None and period > remaining:
+            self.sim.advance()
+            return 1
+        jump = period if remaining is None else remaining - remaining % period
+        self.sim.skip(jump)
+        self.skipped += jump
+        return jump
+
+    def step(self):
+        """Équivalent de Simulation.step, sans calcul sur un point fixe."""
+        self.advance(1)
+        return self.sim.collect_changes()
+
+    def run(self, n_ticks):
+        """Équivalent de Simulation.run : les périodes entières de l'orbite sont sautées."""
+        while n_ticks:
+            n_ticks -= self.advance(n_ticks)
+        return self.sim.collect_changes()
+
+    def run_for(self, seconds, max_ticks=None):
+        """Équivalent de Simulation.run_for ; sans max_ticks, chaque saut couvre une période."""
+        deadline = time.perf_counter() + seconds
+        ticks = 0
+        while True:
+            ticks += self.advance(None if max_ticks is None else max_ticks - ticks)
+            if ticks == max_ticks or time.perf_counter() >= deadline:
+                return ticks, self.sim.collect_changes()
@@ -0,0 +1,907 @@
+"""Moteur de simulation de la grille, sans dépendance à tkinter.
+
+Le moteur contient l'état logique des items placés et applique les règles de
+propagation tick par tick. L'interface graphique (main.py) n'en est qu'une vue :
+elle transmet les actions de l'utilisateur et redessine les cellules modifiées.
+
+L'état est stocké dans des plans compacts (bytearray) indexés par cellule :
+type d'item, état actif et initialisation des switches. La grille est entourée
+d'une bordure vide, si bien que les voisins d'une cellule i sont toujours
+i - 1, i + 1, i - stride et i + stride, sans test de bord. Une cellule est
+donc identifiée par sa position et change d'identifiant quand elle est déplacée.
+
+Par défaut, les phases d'un tick s'enchaînent sur un état unique : une cellule
+voit les valeurs déjà calculées dans ce tick par les phases et cellules
+précédentes. En mode bufferisé (buffered=True), chaque tick calcule le nouvel
+état uniquement à partir de l'état figé au début du tick, puis l'applique en
+une fois : le résultat ne dépend plus de l'ordre des phases ni des cellules.
+"""
+import hashlib
+import heapq
+import time
+from array import array
+from collections import deque
+
+# Types d'items (mêmes identifiants que le panneau Items)
+CABLE = 0
+BUTTON = 1
+SWITCH = 2
+LED = 3
+COMPARATOR = 4
+REPEATER = 5
+EMPTY = 255  # Case vide dans le plan des types
+
+# Ordre des phases dans un tick (les boutons ne sont jamais réévalués)
+PHASES = (SWITCH, CABLE, LED, COMPARATOR, REPEATER)
+PHASE_OF = {item_id: phase for phase, item_id in enumerate(PHASES)}
+CABLE_PHASE = PHASE_OF[CABLE]
+
+REPEATER_DELAY = 1  # Délai du répéteur en ticks (100 ms dans l'interface)
+SWITCH_INIT_DELAY = 2  # Temps de chauffe d'un switch en ticks (200 ms dans l'interface)
+
+CHUNK_SIZE = 32  # La grille s'agrandit par blocs de CHUNK_SIZE cases (voir grow_to)
+
+# Raisons de refus d'une pose en lot (place_items)
+OUT_OF_BOUNDS = 'out of bounds'
+OCCUPIED = 'occupied'
+
+# Actions programmables dans l'échéancier
+SWITCH_READY = 0  # fin de la chauffe d'un switch
+REPEATER_OUTPUT = 1  # signal d'un répéteur arrivant sur sa sortie
+MACRO_OUTPUT = 2  # état d'une macro appliqué après sa latence (voir macro.py)
+EVENT_ACTIONS = 3
+
+
+class TimingWheel:
+    """
+    Échéancier de la simulation, indexé par numéro de tick : une roue de size cases
+    (une par tick à venir) complétée par un tas pour les échéances plus lointaines.
+    Les événements d'un même tick sont regroupés par action et déclenchés en bloc.
+    """
+    def __init__(self, start=0, size=64):
+        self.size = size
+        self.slots = [self.empty_slot() for _ in range(size)]
+        self.far = []  # tas de (tick, numéro d'ordre, action, argument)
+        self.counter = 0
+        self.current = start  # dernier tick dépilé
+
+    @staticmethod
+    def empty_slot():
+        return [[] for _ in range(EVENT_ACTIONS)]
+
+    def schedule(self, tick, action, arg):
+        """Programme action(arg) au tick donné (au plus tôt au prochain tick dépilé)."""
+        tick = max(tick, self.current + 1)
+        if tick - self.current < self.size:
+            self.slots[tick % self.size][action].append(arg)
+        else:
+            heapq.heappush(self.far, (tick, self.counter, action, arg))
+            self.counter += 1
+
+    def pop_due(self, tick):
+        """Renvoie, par action, les arguments des événements échus jusqu'au tick donné inclus."""
+        size, slots = self.size, self.slots
+        if tick == self.current + 1:
+            due = slots[tick % size]
+            slots[tick % size] = self.empty_slot()
+        else:
+            due = self.empty_slot()
+            # Au-delà d'un tour de roue, toutes les cases sont échues
+            for past in range(self.current + 1, min(tick, self.current + size - 1) + 1):
+                slot = slots[past % size]
+                for action, args in enumerate(slot):
+                    due[action] += args
+                slots[past % size] = self.empty_slot()
+        far = self.far
+        while far and far[0][0] <= tick:
+            _, _, action, arg = heapq.heappop(far)
+            due[action].append(arg)
+        self.current = tick
+        return due
+
+    def shift(self, ticks):
+        """Décale de ticks ticks le dernier tick dépilé et tous les événements programmés."""
+        turn = ticks % self.size
+        if turn:
+            # La case d'un tick T passe de T % size à (T + ticks) % size
+            self.slots = self.slots[-turn:] + self.slots[:-turn]
+        self.current += ticks
+        self.far = [(tick + ticks, counter, action, arg) for tick, counter, action, arg in self.far]
+
+    def pending(self):
+        """Itère sur les événements programmés : (tick, action, argument)."""
+        size, current = self.size, self.current
+        for offset in range(1, size):
+            tick = current + offset
+            for action, args in enumerate(self.slots[tick % size]):
+                for arg in args:
+                    yield tick, action, arg
+        for tick, _, action, arg in sorted(self.far):
+            yield tick, action, arg
+
+
+class Simulation:
+    def __init__(self, rows=8, cols=8, buffered=False):
+        self.buffered = buffered  # True : chaque tick ne lit que l'état figé du tick précédent
+        self.revision = 0  # Incrémenté à chaque édition de la disposition (voir netlist.py)
+        self.inputs = 0  # Incrémenté à chaque état imposé de l'extérieur, boutons compris (voir cycles.py)
+        # Réseaux de câbles (union-find), maintenus à chaque édition de la grille
+        self.network_size = {}  # racine -> nombre de câbles du réseau
+        self.network_sources = {}  # racine -> nombre de contacts avec une source active
+        self.network_state = {}  # racine -> état appliqué aux câbles (None : à rafraîchir)
+        self.reset(rows, cols)
+
+    def allocate(self, rows, cols):
+        """Alloue des plans vides pour une grille rows x cols (plus une bordure d'une case)."""
+        self.rows = rows
+        self.cols = cols
+        self.stride = cols + 2
+        size = (rows + 2) * self.stride
+        self.kind = bytearray([EMPTY]) * size  # type d'item de chaque case
+        self.active = bytearray(size)  # état actif (0 ou 1)
+        self.initialized = bytearray(size)  # switch prêt (temps de chauffe écoulé)
+        self.frozen = bytearray(size)  # cellule simulée par une macro et non par les règles
+        self.cable_parent = {}  # câble -> parent dans l'union-find (câbles posés uniquement)
+        self.type_counts = [0] * EMPTY  # nombre de cellules placées par type d'item
+        # Décalages des voisins, dans l'ordre gauche, droite, haut, bas
+        self.offsets = (-1, 1, -self.stride, self.stride)
+        self.switch_offsets = (1, -self.stride, self.stride)  # Un switch n'émet pas vers sa gauche
+
+    # ---------------------- Adressage des cellules ----------------------
+    def in_bounds(self, x, y):
+        return 0 <= x < self.cols and 0 <= y < self.rows
+
+    def index(self, x, y):
+        return (y + 1) * self.stride + x + 1
+
+    def position(self, cell):
+        y, x = divmod(cell, self.stride)
+        return x - 1, y - 1
+
+    def cell_at(self, x, y):
+        """Renvoie la cellule occupée en (x, y), ou None."""
+        if not self.in_bounds(x, y):
+            return None
+        cell = self.index(x, y)
+        return cell if self.kind[cell] != EMPTY else None
+
+    def cells_of_type(self, item_id):
+        """
+        Liste les cellules placées d'un type donné. Le plan des types sert de registre :
+        la recherche se fait en C (bytearray.find) et ne visite que les cellules de ce type.
+        """
+        cells = []
+        remaining = self.type_counts[item_id]
+        find, target = self.kind.find, bytes([item_id])
+        cell = -1
+        while remaining:
+            cell = find(target, cell + 1)
+            cells.append(cell)
+            remaining -= 1
+        return cells
+
+    def placed_cells(self):
+        """Itère sur toutes les cellules placées."""
+        for item_id, count in enumerate(self.type_counts):
+            if count:
+                yield from self.cells_of_type(item_id)
+
+    def cell_count(self):
+        return sum(self.type_counts)
+
+    # ---------------------- Édition de la grille ----------------------
+    def place_item(self, item_id, x, y):
+        """
+        Place un item de type item_id en (x, y) et renvoie la cellule créée.
+        Renvoie None si la case est hors de la grille ou déjà occupée.
+        """
+        if not self.in_bounds(x, y) or not 0 <= item_id < EMPTY:
+            return None
+        cell = self.index(x, y)
+        if self.kind[cell] != EMPTY:
+            return None
+        self.revision += 1
+        self.kind[cell] = item_id
+        self.active[cell] = (item_id == BUTTON)  # Les boutons sont activés par défaut
+        self.type_counts[item_id] += 1
+        self.attach(cell)
+        if item_id == SWITCH:
+            self.start_warmup(cell, self.tick + SWITCH_INIT_DELAY)
+        return cell
+
+    def place_items(self, placements, atomic=False):
+        """
+        Place un lot d'items [(item_id, x, y), ...] en une passe et renvoie (cellules créées, refus).
+        Les refus sont des (x, y, raison) : case hors de la grille (OUT_OF_BOUNDS), ou déjà occupée,
+        y compris par un item précédent du même lot (OCCUPIED). Une case occupée n'est jamais écrasée.
+        Avec atomic=True, rien n'est posé si un seul item est refusé.
+        """
+        accepted, rejected, taken = [], [], set()
+        kind = self.kind
+        for item_id, x, y in placements:
+            if not self.in_bounds(x, y) or not 0 <= item_id < EMPTY:
+                rejected.append((x, y, OUT_OF_BOUNDS))
+                continue
+            cell = self.index(x, y)
+            if kind[cell] != EMPTY or cell in taken:
+                rejected.append((x, y, OCCUPIED))
+                continue
+            taken.add(cell)
+            accepted.append((item_id, x, y))
+        if atomic and rejected:
+            return [], rejected
+        return [self.place_item(item_id, x, y) for item_id, x, y in accepted], rejected
+
+    def move_item(self, cell, x, y):
+        """
+        Déplace une cellule vers (x, y) en conservant son état et renvoie sa nouvelle cellule.
+        Renvoie None si la case cible n'est pas libre.
+        """
+        item_id = self.kind[cell]
+        if item_id == EMPTY or not self.in_bounds(x, y):
+            return None
+        if cell in self.macro_at:
+            self.remove_macro(self.macro_at[cell])
+        new_cell = self.index(x, y)
+        if new_cell == cell:
+            return cell
+        if self.kind[new_cell] != EMPTY:
+            return None
+        self.revision += 1
+        active, initialized = self.active[cell], self.initialized[cell]
+        warmup = self.warming.pop(cell, None)
+        before = self.changes.pop(cell, None)
+        self.detach(cell)
+        self.kind[new_cell] = item_id
+        self.active[new_cell] = active
+        self.initialized[new_cell] = initialized
+        if before is not None:
+            self.changes[new_cell] = before
+        self.attach(new_cell)
+        if warmup is not None:
+            self.start_warmup(new_cell, warmup)
+        return new_cell
+
+    def delete_item(self, cell):
+        item_id = self.kind[cell]
+        if item_id != EMPTY:
+            if cell in self.macro_at:
+                self.remove_macro(self.macro_at[cell])
+            self.revision += 1
+            self.detach(cell)
+            self.type_counts[item_id] -= 1
+            self.warming.pop(cell, None)
+            self.changes.pop(cell, None)
+
+    def toggle_item_state(self, cell):
+        """Inverse l'état d'un bouton. Renvoie False si la cellule n'est pas un bouton."""
+        if self.kind[cell] != BUTTON:
+            return False
+        self.inputs += 1
+        self.set_active(cell, not self.active[cell])
+        return True
+
+    def set_buffered(self, buffered):
+        """Change de mode de tick ; toute la grille est réévaluée avec les nouvelles règles."""
+        if buffered != self.buffered:
+            self.buffered = buffered
+            self.revision += 1
+            self.invalidate()
+
+    def reset(self, rows=None, cols=None):
+        """Vide la grille, éventuellement avec de nouvelles dimensions."""
+        self.allocate(self.rows if rows is None else rows, self.cols if cols is None else cols)
+        self.revision += 1
+        self.events = TimingWheel()  # événements programmés (chauffe des switches, répéteurs)
+        self.warming = {}  # switch en chauffe -> tick où il devient initialisé
+        self.changes = {}  # cellule -> état avant sa première modification
+        self.tick = 0
+        self.staged = {}  # mode bufferisé : cellule -> nouvel état, appliqué en fin de tick
+        # Ordonnanceur : seules les cellules "sales" sont réévaluées à chaque tick
+        self.dirty = [set() for _ in PHASES]  # cellules à évaluer au tick courant, par phase
+        self.next_dirty = [set() for _ in PHASES]  # cellules à évaluer au tick suivant
+        self.current_phase = -1  # -1 : hors des phases (entre deux ticks ou au début d'un tick)
+        self.current_cell = None
+        self.phase_heap = None  # file de la phase en cours (ordre des cellules)
+        self.phase_queued = None
+        self.macros = []  # instances de macros (voir macro.py)
+        self.macro_at = {}  # cellule d'une instance -> instance
+        self.macro_dirty = set()  # instances dont un bouton d'entrée a changé
+        self.network_size.clear()
+        self.network_sources.clear()
+        self.network_state.clear()
+
+    # ---------------------- Dimensions de la grille ----------------------
+    def bounding_box(self):
+        """Renvoie (x0, y0, x1, y1), les colonnes x0..x1 et lignes y0..y1 occupées, ou None si la grille est vide."""
+        positions = [self.position(cell) for cell in self.placed_cells()]
+        if not positions:
+            return None
+        xs, ys = [x for x, _ in positions], [y for _, y in positions]
+        return min(xs), min(ys), max(xs), max(ys)
+
+    def resize(self, rows, cols, offset_x=0, offset_y=0):
+        """
+        Change les dimensions de la grille en gardant tous les items, décalés de (offset_x, offset_y),
+        avec leur état, leur chauffe et les signaux en cours. Lève ValueError, sans rien modifier, si
+        un item sortirait de la nouvelle grille.
+        """
+        if rows < 1 or cols < 1:
+            raise ValueError(f"Dimensions de grille invalides : {cols} x {rows}")
+        old_cols, old_rows, old_stride = self.cols, self.rows, self.stride
+        new_stride = cols + 2
+
+        def moved(cell):
+            # Nouvel identifiant d'une case de la grille, None hors de l'ancienne ou de la nouvelle grille
+            y, x = divmod(cell, old_stride)
+            if not (0 < x <= old_cols and 0 < y <= old_rows):
+                return None
+            x, y = x + offset_x, y + offset_y
+            return y * new_stride + x if 0 < x <= cols and 0 < y <= rows else None
+
+        cells = list(self.placed_cells())
+        for cell in cells:
+            if moved(cell) is None:
+                x, y = self.position(cell)
+                raise ValueError(f"L'item en ({x}, {y}) sortirait de la grille {cols} x {rows}")
+
+        planes = (self.kind, self.active, self.initialized, self.frozen)
+        type_counts, parent = self.type_counts, self.cable_parent
+        events = list(self.events.pending())
+        self.allocate(rows, cols)
+        for source, target in zip(planes, (self.kind, self.active, self.initialized, self.frozen)):
+            for cell in cells:
+                target[moved(cell)] = source[cell]
+        self.type_counts = type_counts
+        self.revision += 1
+
+        # Structures indexées par cellule : mêmes valeurs sous les nouveaux identifiants
+        self.cable_parent = {moved(cable): moved(root) for cable, root in parent.items()}
+        for networks in (self.network_size, self.network_sources, self.network_state):
+            values = list(networks.items())
+            networks.clear()
+            networks.update((moved(root), value) for root, value in values)
+        self.warming = {moved(cell): ready for cell, ready in self.warming.items()}
+        self.changes = {moved(cell): before for cell, before in self.changes.items() if moved(cell) is not None}
+        self.staged = {moved(cell): active for cell, active in self.staged.items() if moved(cell) is not None}
+        for queues in (self.dirty, self.next_dirty):
+            for phase, queued in enumerate(queues):
+                queues[phase] = {moved(cell) for cell in queued} - {None}
+        self.events = TimingWheel(self.tick, self.events.size)
+        for due, action, arg in events:
+            if action == MACRO_OUTPUT:
+                self.events.schedule(due, action, arg)
+                continue
+            targets = [cell for cell in map(moved, self.event_cells(arg)) if cell is not None]
+            if targets:
+                self.events.schedule(due, action, self.event_arg(arg, targets))
+        self.macro_at = {}
+        for instance in self.macros:
+            instance.cells = [moved(cell) for cell in instance.cells]
+            instance.inputs = [moved(cell) for cell in instance.inputs]
+            instance.x, instance.y = instance.x + offset_x, instance.y + offset_y
+            self.macro_at.update(dict.fromkeys(instance.cells, instance))
+
+    @staticmethod
+    def event_cells(arg):
+        """Cellules visées par un événement programmé (une seule cellule dans ce moteur)."""
+        return (arg,)
+
+    @staticmethod
+    def event_arg(arg, cells):
+        return cells[0]
+
+    def grow_to(self, x, y):
+        """
+        Agrandit la grille par blocs de CHUNK_SIZE cases, dans n'importe quelle direction, pour qu'elle
+        contienne la case (x, y). Renvoie le décalage (dx, dy) appliqué aux items existants, non nul
+        quand la grille s'étend vers la gauche ou vers le haut.
+        """
+        dx = -(x // CHUNK_SIZE) * CHUNK_SIZE if x < 0 else 0
+        dy = -(y // CHUNK_SIZE) * CHUNK_SIZE if y < 0 else 0
+        cols = max(self.cols, -(-(x + 1) // CHUNK_SIZE) * CHUNK_SIZE) + dx
+        rows = max(self.rows, -(-(y + 1) // CHUNK_SIZE) * CHUNK_SIZE) + dy
+        if (cols, rows) != (self.cols, self.rows):
+            self.resize(rows, cols, dx, dy)
+        return dx, dy
+
+    def crop(self, margin=0):
+        """
+        Réduit (ou agrandit) la grille au rectangle occupé par les items, plus margin cases de chaque
+        côté, et renvoie le décalage (dx, dy) appliqué aux items. Une grille vide n'est pas modifiée.
+        """
+        box = self.bounding_box()
+        if box is None:
+            return 0, 0
+        x0, y0, x1, y1 = box
+        dx, dy = margin - x0, margin - y0
+        self.resize(y1 - y0 + 1 + 2 * margin, x1 - x0 + 1 + 2 * margin, dx, dy)
+        return dx, dy
+
+    def attach(self, cell):
+        """Prend en compte une cellule nouvellement posée dans les réseaux de câbles."""
+        item_id = self.kind[cell]
+        if item_id == CABLE:
+            self.add_cable(cell)
+        elif self.active[cell] and item_id in (BUTTON, SWITCH):
+            self.feed_cables(cell, 1)
+        self.touch(cell)
+
+    def detach(self, cell):
+        """Retire une cellule de la grille (suppression ou début de déplacement)."""
+        item_id = self.kind[cell]
+        if item_id == CABLE:
+            self.remove_cable(cell)
+        elif self.active[cell] and item_id in (BUTTON, SWITCH):
+            self.feed_cables(cell, -1)
+        self.kind[cell] = EMPTY
+        self.active[cell] = 0
+        self.initialized[cell] = 0
+        self.touch_neighbors(cell)
+
+    def count_types(self):
+        kind = self.kind
+        self.type_counts = [0] * EMPTY
+        for item_id in set(kind):
+            if item_id != EMPTY:
+                self.type_counts[item_id] = kind.count(item_id)
+
+    def rebuild(self):
+        """
+        Recalcule les structures dérivées des plans (compteurs par type, réseaux de câbles)
+        après une écriture directe dans les plans, par exemple au chargement d'une sauvegarde.
+        Toute la grille est réévaluée au tick suivant.
+        """
+        self.revision += 1
+        self.count_types()
+        self.rebuild_networks()
+        self.invalidate()
+
+    def rebuild_networks(self):
+        """
+        Recalcule les réseaux de câbles et leurs sources d'après les plans, sans changer revision :
+        la disposition est inchangée, seuls les états ont été réécrits (voir history.py).
+        """
+        self.cable_parent.clear()
+        self.network_size.clear()
+        self.network_sources.clear()
+        self.network_state.clear()
+        kind, offsets = self.kind, self.offsets
+        seen = bytearray(len(kind))
+        for cable in self.cells_of_type(CABLE):
+            if seen[cable]:
+                continue
+            seen[cable] = 1
+            component = [cable]
+            frontier = deque([cable])
+            while frontier:
+                current = frontier.popleft()
+                for offset in offsets:
+                    neighbor = current + offset
+                    if kind[neighbor] == CABLE and not seen[neighbor]:
+                        seen[neighbor] = 1
+                        component.append(neighbor)
+                        frontier.append(neighbor)
+            self.new_network(component)
+
+    def set_active(self, cell, active):
+        if self.active[cell] != active:
+            if cell not in self.changes:
+                self.changes[cell] = self.active[cell]
+            self.active[cell] = active
+            item_id = self.kind[cell]
+            if item_id == BUTTON or item_id == SWITCH:
+                self.feed_cables(cell, 1 if active else -1)
+            self.touch(cell)
+
+    def emit(self, cell, active):
+        """Écrit le résultat d'une règle : immédiatement, ou en fin de tick en mode bufferisé."""
+        if self.buffered:
+            self.staged[cell] = active
+        else:
+            self.set_active(cell, active)
+
+    def driven(self, cable):
+        """Mode bufferisé : un câble en sortie d'un comparateur ou répéteur actif est alimenté."""
+        back = cable - 1
+        return self.kind[back] in (COMPARATOR, REPEATER) and self.active[back] == 1
+
+    # ---------------------- Ordonnancement des cellules sales ----------------------
+    def enqueue(self, cell, item_id):
+        """
+        Programme l'évaluation d'une cellule. Une cellule dont la phase n'est pas encore passée
+        (ou située après la cellule en cours dans la phase courante) est évaluée dans ce tick,
+        comme le ferait un parcours complet de la grille ; sinon elle l'est au tick suivant.
+        """
+        phase = PHASE_OF.get(item_id)
+        if phase is None:
+            if self.frozen[cell]:
+                self.macro_dirty.add(self.macro_at[cell])  # Bouton d'entrée d'une macro
+            return
+        if phase > self.current_phase:
+            self.dirty[phase].add(cell)
+        elif phase == self.current_phase == CABLE_PHASE:
+            return  # La phase câbles applique l'état de tout le réseau d'un coup
+        elif phase == self.current_phase and cell > self.current_cell:
+            if cell not in self.phase_queued:
+                self.phase_queued.add(cell)
+                heapq.heappush(self.phase_heap, cell)
+        else:
+            self.next_dirty[phase].add(cell)
+
+    def touch_neighbors(self, cell):
+        kind = self.kind
+        for offset in self.offsets:
+            neighbor = cell + offset
+            if kind[neighbor] != EMPTY:
+                self.enqueue(neighbor, kind[neighbor])
+
+    def touch(self, cell):
+        """Signale un changement : la cellule et ses voisines devront être réévaluées."""
+        if cell != self.current_cell:
+            self.enqueue(cell, self.kind[cell])
+        self.touch_neighbors(cell)
+
+    def invalidate(self, item_ids=PHASES):
+        """
+        Marque comme sales toutes les cellules des types donnés (par défaut tous les types évalués),
+        ce qui équivaut au recalcul complet d'un tick. À appeler entre deux ticks.
+        """
+        for item_id in item_ids:
+            phase = PHASE_OF.get(item_id)
+            if phase is not None:
+                self.dirty[phase].update(self.cells_of_type(item_id))
+
+    def ordered(self, cells, item_id):
+        """Parcourt les cellules sales de la phase courante dans l'ordre de la grille (ligne par ligne)."""
+        kind, frozen = self.kind, self.frozen
+        heap = list(cells)
+        heapq.heapify(heap)
+        self.phase_heap = heap
+        self.phase_queued = cells
+        while heap:
+            cell = heapq.heappop(heap)
+            if kind[cell] != item_id or frozen[cell]:
+                continue  # Cellule supprimée (ou remplacée) depuis sa mise en file, ou simulée par une macro
+            self.current_cell = cell
+            yield cell
+        self.current_cell = None
+        self.phase_heap = None
+        self.phase_queued = None
+
+    # ---------------------- Réseaux de câbles (union-find) ----------------------
+    def find_network(self, cable):
+        """Renvoie la racine du réseau contenant le câble (avec compression de chemin)."""
+        parent = self.cable_parent
+        root = cable
+        while parent[root] != root:
+            root = parent[root]
+        while parent[cable] != root:
+            parent[cable], cable = root, parent[cable]
+        return root
+
+    def source_contacts(self, cable):
+        """Nombre de sources actives (bouton, ou switch hors de sa gauche) qui alimentent le câble."""
+        kind, active = self.kind, self.active
+        count = 0
+        for offset in self.offsets:
+            source = cable + offset
+            if active[source]:
+                if kind[source] == BUTTON or (kind[source] == SWITCH and offset != 1):
+                    count += 1
+        return count
+
+    def feed_cables(self, cell, delta):
+        """Ajoute delta au compteur de sources des réseaux alimentés par la source cell."""
+        kind = self.kind
+        for offset in (self.offsets if kind[cell] == BUTTON else self.switch_offsets):
+            neighbor = cell + offset
+            if kind[neighbor] == CABLE:
+                self.network_sources[self.find_network(neighbor)] += delta
+                self.enqueue(neighbor, CABLE)
+
+    def network_cables(self, root):
+        """Liste les câbles d'un réseau (parcours en largeur restreint aux câbles de même racine)."""
+        kind, offsets = self.kind, self.offsets
+        cables = [root]
+        seen = {root}
+        frontier = deque([root])
+        while frontier:
+            current = frontier.popleft()
+            for offset in offsets:
+                neighbor = current + offset
+                if kind[neighbor] == CABLE and neighbor not in seen and self.find_network(neighbor) == root:
+                    seen.add(neighbor)
+                    cables.append(neighbor)
+                    frontier.append(neighbor)
+        return cables
+
+    def new_network(self, members):
+        root = members[0]
+        for cable in members:
+            self.cable_parent[cable] = root
+        self.network_size[root] = len(members)
+        self.network_sources[root] = sum(self.source_contacts(cable) for cable in members)
+        self.network_state[root] = None
+        self.enqueue(root, CABLE)
+
+    def union_networks(self, a, b):
+        root_a, root_b = self.find_network(a), self.find_network(b)
+        if root_a == root_b:
+            return
+        if self.network_size[root_a] < self.network_size[root_b]:
+            root_a, root_b = root_b, root_a
+        # Le plus petit réseau est absorbé ; seuls ses câbles sont à rafraîchir
+        if self.network_state[root_b] != self.network_state[root_a]:
+            for cable in self.network_cables(root_b):
+                self.enqueue(cable, CABLE)
+        self.cable_parent[root_b] = root_a
+        self.network_size[root_a] += self.network_size.pop(root_b)
+        self.network_sources[root_a] += self.network_sources.pop(root_b)
+        del self.network_state[root_b]
+
+    def add_cable(self, cell):
+        self.new_network([cell])
+        for offset in self.offsets:
+            if self.kind[cell + offset] == CABLE:
+                self.union_networks(cell, cell + offset)
+
+    def remove_cable(self, cell):
+        """Retire un câble de son réseau ; le reste du réseau est redécoupé en composantes connexes."""
+        root = self.find_network(cell)
+        del self.cable_parent[cell]
+        del self.network_size[root]
+        del self.network_sources[root]
+        del self.network_state[root]
+        kind = self.kind
+        seen = {cell}
+        for offset in self.offsets:
+            start = cell + offset
+            if kind[start] != CABLE or start in seen:
+                continue
+            # Chaque voisin non encore atteint démarre une nouvelle composante
+            seen.add(start)
+            component = [start]
+            frontier = deque([start])
+            while frontier:
+                current = frontier.popleft()
+                for neighbor_offset in self.offsets:
+                    neighbor = current + neighbor_offset
+                    if kind[neighbor] == CABLE and neighbor not in seen:
+                        seen.add(neighbor)
+                        component.append(neighbor)
+                        frontier.append(neighbor)
+            self.new_network(component)
+
+    # ---------------------- Macros ----------------------
+    def add_macro(self, instance):
+        """
+        Confie les cellules d'une instance de macro (voir macro.py) à sa table : les règles ne les
+        évaluent plus, l'instance est consultée quand un de ses boutons d'entrée change.
+        """
+        self.revision += 1
+        for cell in instance.cells:
+            self.frozen[cell] = 1
+            self.macro_at[cell] = instance
+        self.macros.append(instance)
+        self.macro_dirty.add(instance)
+
+    def remove_macro(self, instance):
+        """Rend les cellules d'une instance aux règles de propagation (avant une édition, par exemple)."""
+        self.revision += 1
+        self.macros.remove(instance)
+        self.macro_dirty.discard(instance)
+        for cell in instance.cells:
+            self.frozen[cell] = 0
+            del self.macro_at[cell]
+        # write_frozen n'a pas tenu à jour les sources des réseaux de câbles internes
+        for root in {self.find_network(cell) for cell in instance.cells if self.kind[cell] == CABLE}:
+            self.network_sources[root] = sum(self.source_contacts(cable) for cable in self.network_cables(root))
+            self.network_state[root] = None
+        for cell in instance.cells:
+            self.touch(cell)
+
+    def write_frozen(self, cells, values):
+        """
+        Écrit l'état de cellules simulées par une macro. L'instance étant isolée, aucune cellule
+        extérieure n'est à réévaluer : seuls les changements à afficher sont enregistrés.
+        """
+        active, changes = self.active, self.changes
+        for cell, value in zip(cells, values):
+            if active[cell] != value:
+                if cell not in changes:
+                    changes[cell] = active[cell]
+                active[cell] = value
+
+    # ---------------------- Temporisations ----------------------
+    def pending_events(self):
+        """Itère sur les événements programmés, une cellule à la fois : (tick, action, cellule)."""
+        return self.events.pending()
+
+    def schedule(self, delay, action, arg):
+        """Programme une action (SWITCH_READY, REPEATER_OUTPUT) au début du tick courant + delay."""
+        self.events.schedule(self.tick + delay, action, arg)
+
+    def fire_due_events(self):
+        """Déclenche les événements échus au tick courant et renvoie leur nombre."""
+        ready, outputs, macro_outputs = self.events.pop_due(self.tick)
+        fired = len(ready) + len(macro_outputs)
+        for cell in ready:
+            self.set_switch_initialized(cell)
+        if outputs:
+            fired += self.propagate_repeater_signals(outputs)
+        for instance, key in macro_outputs:
+            instance.apply(self, key)
+        return fired
+
+    def start_warmup(self, cell, ready_tick):
+        """Programme l'initialisation d'un switch au tick ready_tick."""
+        self.warming[cell] = ready_tick
+        self.schedule(ready_tick - self.tick, SWITCH_READY, cell)
+
+    def set_switch_initialized(self, cell):
+        # L'événement est ignoré si le switch a été supprimé ou déplacé entre-temps
+        if self.warming.get(cell) == self.tick:
+            del self.warming[cell]
+            self.initialized[cell] = 1
+            self.enqueue(cell, SWITCH)
+
+    # ---------------------- Boucle de simulation ----------------------
+    def advance(self):
+        """Calcule un tick sans collecter les changements."""
+        self.tick += 1
+        self.fire_due_events()
+        if self.macro_dirty:
+            instances, self.macro_dirty = self.macro_dirty, set()
+            for instance in instances:
+                instance.poll(self)
+        for phase, update in enumerate((self.update_switches, self.update_cables, self.update_leds,
+                                        self.update_comparators, self.update_repeaters)):
+            cells = self.dirty[phase]
+            if cells:
+                self.dirty[phase] = set()
+                self.current_phase = phase
+                update(cells)
+        if self.staged:
+            self.commit()
+        self.current_phase = -1
+        self.dirty, self.next_dirty = self.next_dirty, self.dirty
+
+    def commit(self):
+        """Applique l'état calculé en mode bufferisé ; les cellules touchées sont évaluées au tick suivant."""
+        self.current_phase = len(PHASES)
+        staged, self.staged = self.staged, {}
+        for cell, active in staged.items():
+            self.set_active(cell, active)
+
+    def collect_changes(self):
+        """Renvoie les cellules dont l'état a changé depuis la dernière collecte."""
+        active = self.active
+        changed = {cell for cell, before in self.changes.items() if active[cell] != before}
+        self.changes = {}
+        return changed
+
+    def step(self):
+        """Calcule un tick et renvoie l'ensemble des cellules modifiées."""
+        self.advance()
+        return self.collect_changes()
+
+    def run_for(self, seconds, max_ticks=None):
+        """
+        Calcule des ticks pendant environ seconds secondes (au moins un, au plus max_ticks) et
+        renvoie (ticks calculés, cellules dont l'état final a changé).
+        """
+        deadline = time.perf_counter() + seconds
+        ticks = 0
+        while True:
+            self.advance()
+            ticks += 1
+            if ticks == max_ticks or time.perf_counter() >= deadline:
+                return ticks, self.collect_changes()
+
+    def skip(self, ticks):
+        """
+        Avance l'horloge de ticks ticks sans les calculer. Valable seulement quand l'état se répète
+        avec une période qui divise ticks (voir cycles.py) : l'état atteint est l'état courant.
+        """
+        self.tick += ticks
+        self.events.shift(ticks)
+        for cell in self.warming:
+            self.warming[cell] += ticks
+
+    def state_digest(self):
+        """
+        Empreinte de l'état entre deux ticks : états, switches prêts, cellules sales, événements et
+        chauffes restantes (relatifs au tick courant), combinaisons des macros. Sans action
+        extérieure, deux ticks de même empreinte sont suivis des mêmes états.
+        """
+        tick = self.tick
+        digest = hashlib.blake2b(self.active, digest_size=16)
+        digest.update(self.initialized)
+        for cells in self.dirty:
+            digest.update(array('q', sorted(cells)).tobytes() + b'|')
+        events, macro_events = [], []
+        for due, action, arg in self.pending_events():
+            if action == MACRO_OUTPUT:
+                macro_events.append((due - tick, arg[0].cells[0], arg[1]))
+            else:
+                events.append((due - tick, action, arg))
+        events.sort()
+        digest.update(array('q', [value for event in events for value in event]).tobytes() + b'|')
+        warming = sorted((cell, ready - tick) for cell, ready in self.warming.items())
+        digest.update(repr((sorted(macro_events), warming, [instance.key for instance in self.macros])).encode())
+        return digest.digest()
+
+    def visited(self, phase, cells):
+        """Nombre de cellules évaluées par la phase phase appelée avec cells (voir profiler.py)."""
+        return len(cells)
+
+    def run(self, n_ticks):
+        """Calcule n_ticks ticks et renvoie les cellules dont l'état final a changé."""
+        for _ in range(n_ticks):
+            self.advance()
+        return self.collect_changes()
+
+    # ---------------------- Règles de propagation ----------------------
+    def update_switches(self, cells):
+        active, initialized = self.active, self.initialized
+        for cell in self.ordered(cells, SWITCH):
+            if initialized[cell]:
+                self.emit(cell, not active[cell - 1])
+
+    def update_cables(self, cells):
+        """Applique aux câbles sales l'état de leur réseau : alimenté s'il touche au moins une source active."""
+        kind, frozen, buffered = self.kind, self.frozen, self.buffered
+        refreshed = set()
+        for cell in cells:
+            if kind[cell] != CABLE or frozen[cell]:
+                continue
+            root = self.find_network(cell)
+            powered = self.network_sources[root] > 0
+            if root not in refreshed:
+                refreshed.add(root)
+                if self.network_state[root] != powered:
+                    self.network_state[root] = powered
+                    for cable in self.network_cables(root):
+                        self.emit(cable, powered or buffered and self.driven(cable))
+            self.emit(cell, powered or buffered and self.driven(cell))
+
+    def update_leds(self, cells):
+        active, stride = self.active, self.stride
+        for cell in self.ordered(cells, LED):
+            self.emit(cell, bool(active[cell - 1] or active[cell + 1] or
+                                 active[cell - stride] or active[cell + stride]))
+
+    def update_comparators(self, cells):
+        """Met à jour les comparateurs et applique les règles Redstone de Minecraft."""
+        kind, active, stride = self.kind, self.active, self.stride
+        for cell in self.ordered(cells, COMPARATOR):
+            # Arrière : gauche en 2D ; entrées latérales : haut et bas en 2D
+            back_active = active[cell - 1]
+            side_active = active[cell - stride] or active[cell + stride]
+            # Le signal arrière n'est transmis que si aucune entrée latérale n'est active
+            self.emit(cell, bool(back_active and not side_active))
+
+            # Propagation du signal vers l'avant (Droite) si un câble est en sortie
+            # (en mode bufferisé, c'est la phase câbles du tick suivant qui l'alimente)
+            if not self.buffered and active[cell] and kind[cell + 1] == CABLE:
+                self.set_active(cell + 1, True)
+
+    def update_repeaters(self, cells):
+        """Met à jour les répéteurs pour qu'ils prolongent un signal uniquement vers l'avant (droite)."""
+        active = self.active
+        for cell in self.ordered(cells, REPEATER):
+            back_active = bool(active[cell - 1])
+            self.emit(cell, back_active)
+            if back_active:
+                # Propage le signal vers l'avant au tick suivant, tant que l'entrée reste active
+                self.schedule(REPEATER_DELAY, REPEATER_OUTPUT, cell + 1)
+                self.next_dirty[PHASE_OF[REPEATER]].add(cell)
+
+    def propagate_repeater_signals(self, front_cells):
+        """Active les sorties des répéteurs (câble, répéteur, switch ou LED) ; renvoie le nombre de signaux."""
+        kind, frozen = self.kind, self.frozen
+        for front_cell in front_cells:
+            if kind[front_cell] in (CABLE, REPEATER, SWITCH, LED) and not frozen[front_cell]:
+                self.set_active(front_cell, True)
+        return len(front_cells)
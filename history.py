@@ -0,0 +1,296 @@
+"""Historique borné des derniers ticks : retour en arrière et nouvelle simulation.
+
+Un état vaut 0 ou 1 : la différence entre deux ticks est la liste des
+cellules qui ont basculé, vide pour un tick au repos. L'historique la relève
+après chaque tick dans le registre des changements du moteur
+(Simulation.changes), sans parcourir la grille : son coût et sa mémoire
+suivent l'activité, pas la taille de la grille.
+
+Toutes les keyframe_every ticks, et après chaque action extérieure (bouton
+basculé, stabilisation), une image clé fige l'état complet du moteur entre
+deux ticks : plans actif et initialisé compressés (zlib), cellules sales,
+événements programmés, chauffes et combinaisons des macros. Revenir au tick t
+(jump) restaure la dernière image clé avant t et recalcule les ticks qui
+séparent les deux (les cycles y sont sautés, voir cycles.py) : le moteur étant
+déterministe, l'état obtenu est exactement celui du tick t, et la simulation
+repart de là ; la suite de l'historique est oubliée. active_at(t) reconstruit
+seulement le plan actif du tick t, en défaisant les bascules, sans calcul.
+
+L'historique couvre les capacity derniers ticks ; une édition de la
+disposition (revision) l'efface.
+"""
+import zlib
+from array import array
+from collections import deque
+
+from cycles import CycleDetector
+from engine import Simulation, TimingWheel, CABLE, PHASES, CABLE_PHASE, MACRO_OUTPUT
+
+DEFAULT_CAPACITY = 3000  # Ticks gardés : 5 minutes à 100 ms par tick
+KEYFRAME_EVERY = 200  # Ticks entre deux images clés : au plus autant de ticks recalculés par retour
+
+
+class History:
+    def __init__(self, capacity=DEFAULT_CAPACITY, keyframe_every=KEYFRAME_EVERY):
+        self.capacity = capacity
+        self.keyframe_every = keyframe_every
+        self.sim = None
+        self.saved = {}  # Méthodes du moteur remplacées par attach (wrappers du profileur compris)
+        self.period = None  # Fonction renvoyant la période de l'orbite sautée (voir attach)
+        self.frames = deque()  # (tick, cellules basculées par ce tick), pour les ticks où l'état a changé
+        self.keyframes = deque()  # Images clés, dans l'ordre chronologique
+        self.shadow = {}  # Cellule du registre des changements -> état à la fin du dernier tick relevé
+        self.epoch = None  # (revision, inputs) du moteur au dernier relevé
+        self.replaying = False  # Ticks recalculés par jump : ni relevés ni images clés
+
+    # ---------------------- Instrumentation du moteur ----------------------
+    def attach(self, sim, period=None):
+        """
+        Suit les ticks calculés et sautés par sim. period renvoie la période de l'orbite sautée
+        (CycleDetector.current_period), pour reconstituer les bascules des ticks sautés ; sans period,
+        un saut est supposé couvrir un point fixe.
+        """
+        if type(sim) is not Simulation:
+            raise ValueError("L'historique suit le registre des changements du moteur Python (engine.Simulation)")
+        self.detach()
+        self.sim, self.period = sim, period
+        self.saved = {name: sim.__dict__.get(name) for name in ('advance', 'skip', 'collect_changes')}
+        advance, skip, collect_changes = sim.advance, sim.skip, sim.collect_changes
+
+        def recorded_advance():
+            if self.replaying:
+                advance()
+                return
+            self.sync()
+            advance()
+            self.record(self.sim.tick, self.flips())
+            self.close_tick()
+
+        def recorded_skip(ticks):
+            if self.replaying:
+                skip(ticks)
+                return
+            self.sync()
+            start = self.sim.tick
+            skip(ticks)
+            self.replay(start, ticks)
+            self.close_tick()
+
+        def recorded_collect():
+            if not self.replaying:
+                self.fold()
+            return collect_changes()
+        sim.advance, sim.skip, sim.collect_changes = recorded_advance, recorded_skip, recorded_collect
+        self.clear()
+
+    def detach(self):
+        """Rend au moteur ses méthodes (celles qu'il avait à l'attache) ; l'historique est oublié."""
+        if self.sim is None:
+            return
+        for name, method in self.saved.items():
+            if method is None:
+                self.sim.__dict__.pop(name, None)
+            else:
+                setattr(self.sim, name, method)
+        self.sim = None
+        self.frames.clear()
+        self.keyframes.clear()
+
+    def clear(self):
+        """Oublie l'historique ; il repart de l'état courant."""
+        sim = self.sim
+        self.frames.clear()
+        self.keyframes.clear()
+        self.shadow = {cell: sim.active[cell] for cell in sim.changes}
+        self.epoch = (sim.revision, sim.inputs)
+        self.keyframes.append(self.snapshot(after_input=False))
+
+    def sync(self):
+        """
+        Prend en compte les actions faites depuis le dernier tick : une édition efface l'historique, une
+        action extérieure ajoute une image clé (le recalcul d'un tick plus récent part de l'état qui la suit).
+        """
+        sim = self.sim
+        epoch = (sim.revision, sim.inputs)
+        if epoch == self.epoch:
+            return
+        if epoch[0] != self.epoch[0]:
+            self.clear()
+        else:
+            self.epoch = epoch
+            self.keyframes.append(self.snapshot(after_input=True))
+
+    # ---------------------- Relevé des bascules ----------------------
+    def fold(self):
+        """Garde l'état de fin de tick des cellules du registre des changements, avant qu'il soit vidé."""
+        shadow = self.shadow
+        for cell, before in self.sim.changes.items():
+            if cell not in shadow:
+                shadow[cell] = before
+
+    def flips(self):
+        """Cellules dont l'état a basculé depuis la fin du tick précédent (actions extérieures comprises)."""
+        self.fold()
+        active, changes = self.sim.active, self.sim.changes
+        flipped = array('I', [cell for cell, before in self.shadow.items() if active[cell] != before])
+        self.shadow = {cell: active[cell] for cell in changes}
+        return flipped
+
+    def record(self, tick, flipped):
+        if flipped:
+            self.frames.append((tick, flipped))
+
+    def replay(self, start, ticks, period=None):
+        """
+        Bascules des ticks start + 1 .. start + ticks, sautés sur une orbite de période period : ce sont
+        celles des period ticks qui précèdent start, répétées. Seuls les capacity derniers ticks sont utiles.
+        """
+        period = period or (self.period() if self.period else None) or 1
+        if period == 1:
+            return  # Point fixe : aucune bascule
+        previous = {}
+        for tick, flipped in reversed(self.frames):
+            if tick <= start - period:
+                break
+            previous[tick] = flipped
+        for offset in range(max(1, ticks - self.capacity + 1), ticks + 1):
+            source = start + offset - period * -(-offset // period)
+            if source in previous:
+                self.frames.append((start + offset, previous[source]))
+
+    def close_tick(self):
+        """Ajoute une image clé si la dernière est trop ancienne, puis oublie les ticks sortis de l'historique."""
+        if self.sim.tick - self.keyframes[-1]['tick'] >= self.keyframe_every:
+            self.keyframes.append(self.snapshot(after_input=False))
+        oldest = self.sim.tick - self.capacity
+        frames, keyframes = self.frames, self.keyframes
+        while frames and frames[0][0] <= oldest:
+            frames.popleft()
+        while len(keyframes) > 1 and usable(keyframes[1], oldest):
+            keyframes.popleft()
+
+    # ---------------------- Images clés ----------------------
+    def snapshot(self, after_input):
+        """Image clé de l'état complet du moteur entre deux ticks."""
+        sim = self.sim
+        rank = {id(instance): index for index, instance in enumerate(sim.macros)}
+        events = []
+        for tick, action, arg in sim.pending_events():
+            if action == MACRO_OUTPUT:
+                arg = (rank[id(arg[0])], arg[1])  # Instance désignée par son rang dans sim.macros
+            events.append((tick, action, arg))
+        return {
+            'tick': sim.tick,
+            'after_input': after_input,  # Prise après une action extérieure, et non à la fin du tick
+            'active': zlib.compress(sim.active, 1),
+            'initialized': zlib.compress(sim.initialized, 1),
+            'dirty': [array('q', cells) for cells in sim.dirty],
+            'events': events,
+            'warming': dict(sim.warming),
+            'macros': [instance.key for instance in sim.macros],
+            'macro_dirty': [rank[id(instance)] for instance in sim.macro_dirty],
+        }
+
+    def restore(self, keyframe):
+        """Remet le moteur dans l'état d'une image clé (même disposition)."""
+        sim = self.sim
+        sim.active[:] = zlib.decompress(keyframe['active'])
+        sim.initialized[:] = zlib.decompress(keyframe['initialized'])
+        sim.tick = keyframe['tick']
+        sim.inputs += 1  # État imposé de l'extérieur : les cycles observés depuis ne valent plus (voir cycles.py)
+        sim.rebuild_networks()  # Sources des réseaux de câbles recalculées d'après les états restaurés
+        sim.dirty = [set(cells) for cells in keyframe['dirty']]
+        sim.next_dirty = [set() for _ in PHASES]
+        # Un réseau dont l'état appliqué est périmé a toujours un câble sale : il sera rafraîchi en entier
+        stale = {sim.find_network(cell) for cell in sim.dirty[CABLE_PHASE] if sim.kind[cell] == CABLE}
+        for root in sim.network_state:
+            sim.network_state[root] = None if root in stale else sim.network_sources[root] > 0
+        sim.events = TimingWheel(sim.tick)
+        for tick, action, arg in keyframe['events']:
+            if action == MACRO_OUTPUT:
+                arg = (sim.macros[arg[0]], arg[1])
+            sim.events.schedule(tick, action, arg)
+        sim.warming = dict(keyframe['warming'])
+        for instance, key in zip(sim.macros, keyframe['macros']):
+            instance.key = key
+        sim.macro_dirty = {sim.macros[index] for index in keyframe['macro_dirty']}
+        sim.staged = {}
+        sim.changes = {}
+
+    # ---------------------- Retour en arrière ----------------------
+    def oldest(self):
+        """Premier tick encore accessible (une image clé prise après une action ne rend que le tick suivant)."""
+        keyframe = self.keyframes[0]
+        return max(self.sim.tick - self.capacity, keyframe['tick'] + keyframe['after_input'])
+
+    def retains(self, tick):
+        return self.oldest() <= tick <= self.sim.tick
+
+    def pending(self):
+        """État à la fin du dernier tick des cellules modifiées depuis (actions extérieures)."""
+        state = dict(self.sim.changes)
+        state.update(self.shadow)
+        return state
+
+    def active_at(self, tick):
+        """Plan actif du tick tick (un des ticks gardés), reconstruit sans recalcul."""
+        self.sync()
+        if not self.retains(tick):
+            raise ValueError(f"Tick {tick} hors de l'historique ({self.oldest()} à {self.sim.tick})")
+        plane = bytearray(self.sim.active)
+        for cell, value in self.pending().items():
+            plane[cell] = value
+        for frame_tick, flipped in reversed(self.frames):
+            if frame_tick <= tick:
+                break
+            for cell in flipped:
+                plane[cell] ^= 1
+        return plane
+
+    def jump(self, tick):
+        """
+        Ramène le moteur exactement dans l'état du tick tick (un des ticks gardés) et renvoie les cellules
+        dont l'état a changé. Les ticks suivants et les actions extérieures non encore calculées sont oubliés.
+        """
+        self.sync()
+        if not self.retains(tick):
+            raise ValueError(f"Tick {tick} hors de l'historique ({self.oldest()} à {self.sim.tick})")
+        sim = self.sim
+        candidates = set(self.pending())
+        for frame_tick, flipped in reversed(self.frames):
+            if frame_tick <= tick:
+                break
+            candidates.update(flipped)
+        before = {cell: sim.active[cell] for cell in candidates}
+        keyframes = self.keyframes
+        while not usable(keyframes[-1], tick):
+            keyframes.pop()
+        keyframe = keyframes[-1]
+        self.replaying = True
+        try:
+            self.restore(keyframe)
+            CycleDetector(sim).run(tick - keyframe['tick'])
+        finally:
+            self.replaying = False
+        while self.frames and self.frames[-1][0] > tick:
+            self.frames.pop()
+        sim.changes = {}
+        self.shadow = {}
+        self.epoch = (sim.revision, sim.inputs)
+        return {cell for cell, value in before.items() if sim.active[cell] != value}
+
+    def rewind(self, ticks):
+        """Recule de ticks ticks, au plus jusqu'au premier tick gardé ; renvoie (tick atteint, cellules modifiées)."""
+        self.sync()
+        tick = max(self.sim.tick - ticks, self.oldest())
+        return tick, self.jump(tick)
+
+    def memory(self):
+        """Octets occupés par les bascules et les plans compressés des images clés (hors surcoût Python)."""
+        flips = sum(flipped.itemsize * len(flipped) for _, flipped in self.frames)
+        return flips + sum(len(keyframe['active']) + len(keyframe['initialized']) for keyframe in self.keyframes)
+
+
+def usable(keyframe, tick):
+    """True si l'image clé peut servir à recalculer l'état de fin du tick tick."""
+    return keyframe['tick'] < tick or keyframe['tick'] == tick and not keyframe['after_input']
@@ -0,0 +1,198 @@
+"""Macros : un sous-circuit vérifié simulé comme une seule table de consultation.
+
+Une macro est définie à partir d'un schéma (voir presets.py), de ses ports
+d'entrée (ses boutons) et de ses ports de sortie (ses LED par défaut). À la
+compilation, la netlist du schéma est évaluée sur toutes les combinaisons
+d'entrées à la fois (voir netlist.py) : on obtient, pour chaque combinaison,
+l'état stable de toutes les cellules du schéma. Le schéma est aussi simulé
+cellule par cellule pour mesurer sa latence, c'est-à-dire le nombre de ticks
+nécessaires aux sorties pour se stabiliser après le basculement d'une entrée.
+
+Une instance posée sur la grille n'est plus évaluée par les règles du moteur :
+quand un de ses boutons change, le moteur consulte la table et applique l'état
+correspondant après la latence mesurée. Les cellules restent sur la grille
+(affichage, sauvegarde) et une édition d'une de leurs cases rend l'instance
+aux règles habituelles. Seuls les circuits combinatoires (sans boucle ni
+groupe de LED qui se maintient) et isolés (aucun item au contact hors de
+l'instance) peuvent être convertis.
+"""
+from engine import Simulation, BUTTON, LED, EMPTY, MACRO_OUTPUT, SWITCH_INIT_DELAY
+from netlist import Netlist, LATCH, input_pattern
+from presets import schema_size, tile_placements
+
+MAX_MACRO_INPUTS = 8  # La latence est mesurée sur chaque basculement : n * 2**n simulations
+
+
+class Macro:
+    """
+    Sous-circuit précompilé. inputs et outputs sont des positions relatives au schéma ; par
+    défaut, tous les boutons et toutes les LED, dans l'ordre du schéma. La combinaison k donne
+    à l'entrée inputs[i] l'état du bit i de k.
+    """
+    def __init__(self, name, schema, inputs=None, outputs=None):
+        self.name = name
+        self.schema = schema
+        self.width, self.height = schema_size(schema)
+        self.inputs = [(x, y) for item_id, x, y in schema if item_id == BUTTON] if inputs is None else list(inputs)
+        self.outputs = [(x, y) for item_id, x, y in schema if item_id == LED] if outputs is None else list(outputs)
+        if len(self.inputs) > MAX_MACRO_INPUTS:
+            raise ValueError(f"Trop d'entrées pour une macro : {len(self.inputs)} (maximum {MAX_MACRO_INPUTS})")
+        self.positions = []  # Positions des cellules du schéma, dans l'ordre des états
+        # Compilé pour chaque mode de tick : état stable par combinaison et latence
+        self.states = {}
+        self.latency = {}
+        for buffered in (False, True):
+            self.compile(buffered)
+
+    def scratch(self, buffered):
+        """Simulation isolée contenant une copie du schéma, switches initialisés."""
+        sim = Simulation(self.height, self.width, buffered)
+        sim.place_items(self.schema)
+        sim.run(SWITCH_INIT_DELAY + 1)
+        return sim
+
+    def compile(self, buffered):
+        sim = self.scratch(buffered)
+        cells = sorted(sim.placed_cells())
+        self.positions = [sim.position(cell) for cell in cells]
+        inputs = [sim.cell_at(x, y) for x, y in self.inputs]
+        if any(cell is None or sim.kind[cell] != BUTTON for cell in inputs) or len(set(inputs)) != len(inputs):
+            raise ValueError(f"Les entrées de la macro {self.name} doivent être des boutons distincts")
+        if len(inputs) != sim.type_counts[BUTTON]:
+            raise ValueError(f"Tous les boutons de la macro {self.name} doivent être des entrées")
+        outputs = [sim.cell_at(x, y) for x, y in self.outputs]
+        if None in outputs:
+            raise ValueError(f"Une sortie de la macro {self.name} est une case vide")
+
+        # États stables de toutes les cellules, toutes les combinaisons à la fois
+        netlist = Netlist(sim)
+        if LATCH in netlist.ops:
+            raise ValueError(f"La macro {self.name} contient des LED adjacentes qui se maintiennent allumées")
+        count = 1 << len(inputs)
+        mask = (1 << count) - 1
+        patterns = {netlist.node_of[cell]: input_pattern(i, count) for i, cell in enumerate(inputs)}
+        values, unknown = netlist.propagate(mask, patterns)
+        nodes = [netlist.node_of[cell] for cell in cells]
+        if any(unknown[node] for node in nodes):
+            raise ValueError(f"La macro {self.name} n'est pas combinatoire (boucle ou sortie forcée)")
+        states = [bytes(values[node] >> k & 1 for node in nodes) for k in range(count)]
+        self.states[buffered] = states
+
+        # Latence : ticks nécessaires aux sorties après chaque basculement d'une entrée
+        limit = 4 * len(cells) + 8
+        slots = [cells.index(cell) for cell in outputs]
+        latency = 1
+        for k in range(count):
+            self.set_inputs(sim, inputs, k)
+            sim.run(limit)
+            for i, cell in enumerate(inputs):
+                target = k ^ (1 << i)
+                expected = [states[target][slot] for slot in slots]
+                sim.toggle_item_state(cell)
+                last = 0
+                for tick in range(1, limit + 1):
+                    sim.step()
+                    if [sim.active[output] for output in outputs] != expected:
+                        last = tick
+                if bytes(sim.active[cell] for cell in cells) != states[target]:
+                    raise ValueError(f"La macro {self.name} ne se stabilise pas sur l'état calculé")
+                latency = max(latency, last + 1)
+                sim.toggle_item_state(cell)
+                sim.run(limit)
+        self.latency[buffered] = latency
+
+    @staticmethod
+    def set_inputs(sim, inputs, k):
+        for i, cell in enumerate(inputs):
+            if sim.active[cell] != (k >> i & 1):
+                sim.toggle_item_state(cell)
+
+    def table(self, buffered=False):
+        """Table de vérité des sorties : pour chaque combinaison, l'état de chaque sortie."""
+        slots = [self.positions.index(position) for position in self.outputs]
+        return [tuple(state[slot] for slot in slots) for state in self.states[buffered]]
+
+
+class MacroInstance:
+    """Copie d'une macro posée en (x, y) sur la grille d'un moteur."""
+    def __init__(self, macro, sim, x, y):
+        self.macro = macro
+        self.x, self.y = x, y
+        self.cells = [sim.index(x + dx, y + dy) for dx, dy in macro.positions]
+        self.inputs = [sim.index(x + dx, y + dy) for dx, dy in macro.inputs]
+        self.key = None  # Combinaison d'entrées dont l'état est appliqué ou programmé
+
+    def read_key(self, active):
+        key = 0
+        for i, cell in enumerate(self.inputs):
+            key |= active[cell] << i
+        return key
+
+    def poll(self, sim):
+        """Appelé par le moteur quand un bouton d'entrée a changé : programme le nouvel état."""
+        key = self.read_key(sim.active)
+        if key == self.key:
+            return
+        self.key = key
+        delay = self.macro.latency[sim.buffered]
+        if delay <= 1:
+            self.apply(sim, key)
+        else:
+            sim.schedule(delay - 1, MACRO_OUTPUT, (self, key))
+
+    def apply(self, sim, key):
+        """Écrit l'état stable de la combinaison key dans les cellules de l'instance."""
+        if sim.macro_at.get(self.cells[0]) is not self:
+            return  # Instance rendue aux règles depuis la programmation
+        sim.write_frozen(self.cells, self.macro.states[sim.buffered][key])
+
+
+def is_isolated(sim, macro, x, y):
+    """Vrai si une copie de la macro en (x, y) ne touche aucun item extérieur."""
+    cells = {sim.index(x + dx, y + dy) for dx, dy in macro.positions}
+    kind, offsets = sim.kind, sim.offsets
+    return all(kind[cell + offset] == EMPTY or cell + offset in cells for cell in cells for offset in offsets)
+
+
+def collapse(sim, macro, x, y):
+    """
+    Convertit en instance la copie du schéma de la macro déjà posée en (x, y) et renvoie l'instance.
+    Lève ValueError si la grille ne contient pas exactement le schéma à cet endroit, s'il touche
+    d'autres items ou si le moteur ne prend pas en charge les macros.
+    """
+    for (item_id, dx, dy) in macro.schema:
+        cell = sim.cell_at(x + dx, y + dy)
+        if cell is None or sim.kind[cell] != item_id or cell in sim.macro_at:
+            raise ValueError(f"Pas de copie libre de la macro {macro.name} en ({x}, {y})")
+    if not is_isolated(sim, macro, x, y):
+        raise ValueError(f"La copie de la macro {macro.name} en ({x}, {y}) touche d'autres items")
+    instance = MacroInstance(macro, sim, x, y)
+    sim.add_macro(instance)  # Refusée (ValueError) avant toute modification si le moteur n'a pas de macros
+    for cell in instance.cells:
+        # Les switches sont pris tels que la table les suppose : chauffe terminée
+        if sim.warming.pop(cell, None) is not None:
+            sim.initialized[cell] = 1
+    instance.apply(sim, instance.read_key(sim.active))
+    instance.key = instance.read_key(sim.active)
+    return instance
+
+
+def stamp_macro(sim, macro, offset_x=0, offset_y=0, count_x=1, count_y=1, stride_x=None, stride_y=None):
+    """
+    Pose une mosaïque de copies de la macro (voir presets.stamp) et convertit chaque copie posée
+    entièrement et isolée en instance. Renvoie (cellules créées, refus, instances) ; les copies
+    partielles ou au contact d'autres items restent simulées cellule par cellule.
+    """
+    stride_x = macro.width + 1 if stride_x is None else stride_x
+    stride_y = macro.height + 1 if stride_y is None else stride_y
+    placements = tile_placements(macro.schema, offset_x, offset_y, count_x, count_y, stride_x, stride_y)
+    cells, rejected = sim.place_items(placements)
+    instances = []
+    for j in range(count_y):
+        for i in range(count_x):
+            x, y = offset_x + i * stride_x, offset_y + j * stride_y
+            try:
+                instances.append(collapse(sim, macro, x, y))
+            except ValueError:
+                pass
+    return cells, rejected, instances
@@ -1,6 +1,27 @@
+import os
+import time
 import tkinter as tk
-from tkinter import ttk
-from collections import deque
+from tkinter import ttk, filedialog
+from boardfile import save_board, load_board
+from cycles import CycleDetector
+from engine import Simulation, CABLE, BUTTON, SWITCH, LED, REPEATER, OCCUPIED
+from history import History
+from netlist import Netlist, format_truth_table
+from macro import Macro, stamp_macro
+from presets import PRESETS, stamp, tile_bounds
+from profiler import TickProfiler, slowest_phase
+from renderer import CanvasRenderer
+from waveform import TraceRecorder, TraceReader, write_vcd
+
+MAX_VIEW_WIDTH = 800  # Taille maximale initiale de la fenêtre d'affichage de la grille (pixels)
+MAX_VIEW_HEIGHT = 600
+MAX_CELL_SIZE = 100  # Zoom maximal (pixels par case)
+CROP_MARGIN = 2  # Cases vides gardées autour des items par « Recadrer sur le contenu »
+# Niveaux du zoom (pixels par case) ; en dessous de 1, la vue d'ensemble échantillonne les cases
+ZOOM_LEVELS = (1 / 64, 1 / 32, 1 / 16, 1 / 8, 1 / 4, 1 / 2, 1, 2, 3, 4, 6, 8, 12, 16, 24, 32, 50, 64, 100)
+# Turbo et avance rapide : temps de calcul (s) par passage de la boucle, le reste va au rendu et aux clics
+TURBO_SLICE = 0.025
+FAST_FORWARD_TICKS = 1000  # Valeur initiale du champ « Avancer de N ticks »
 
 class GridApp:
     def __init__(self, root, rows=8, cols=8):
@@ -9,13 +30,29 @@ class GridApp:
         self.cols = cols
         self.grid_size = 50  # Taille d'une case
         self.items = {}
-        self.placed_items = {}
-        self.position_index = {}  # (x, y) -> id de l'item placé
+        self.sim = Simulation(rows, cols)  # Moteur de simulation (sans tkinter)
         self.selected_item = None
         self.item_id_counter = 0
         self.textures = {}
         self.tick_interval = 100  # Intervalle en ms pour la boucle de mise à jour
         self.ticker_id = None
+        self.frame_interval = 33  # Intervalle minimal en ms entre deux frames dessinées
+        self.frame_id = None
+        self.paused = False  # Boucle arrêtée : la simulation n'avance qu'au pas à pas ou en avance rapide
+        self.fast_forward_ticks = 0  # Ticks restant à calculer en avance rapide
+        self.fast_forward_start = None  # (instant, tick) du début de l'avance rapide
+        self.dragged_cell = None  # Cellule saisie au clic et déplacée par glisser
+        self.netlist = None  # Netlist compilée pour l'évaluation topologique (voir netlist.py)
+        self.needs_settle = False  # Grille ou entrées modifiées depuis la dernière stabilisation
+        self.macros = {}  # nom du preset -> Macro compilée (à la première pose en macro)
+        # Profil des derniers ticks (voir profiler.py) ; budget d'un tick : l'intervalle de la boucle
+        self.profiler = TickProfiler(budget=self.tick_interval / 1000)
+        self.profiler.attach(self.sim)
+        self.cycles = CycleDetector(self.sim)  # Points fixes et cycles : ticks sautés sans calcul
+        self.history = History()  # Derniers ticks, pour revenir en arrière (voir history.py)
+        self.history.attach(self.sim, self.cycles.current_period)
+        self.probes = set()  # Positions (x, y) des sondes, enregistrées par les traces (voir waveform.py)
+        self.recorder = None  # Enregistrement en cours de l'état des sondes
 
         self.notebook = ttk.Notebook(root)
         self.notebook.pack(expand=True, fill='both')
@@ -31,10 +68,37 @@ class GridApp:
         self.notebook.add(self.frame_settings, text='Paramètres')
         self.notebook.add(self.frame_presets, text='Presets')
         
-        # Canvas de la grille
-        self.canvas = tk.Canvas(self.frame_grid, width=self.cols * self.grid_size, 
-                                height=self.rows * self.grid_size, bg='white')
-        self.canvas.pack()
+        # Canvas de la grille : une fenêtre défilante et zoomable sur la grille du moteur
+        toolbar = tk.Frame(self.frame_grid)
+        toolbar.pack(side=tk.TOP, fill=tk.X)
+        tk.Button(toolbar, text="Zoom +", command=lambda: self.zoom_view(1)).pack(side=tk.LEFT)
+        tk.Button(toolbar, text="Zoom -", command=lambda: self.zoom_view(-1)).pack(side=tk.LEFT)
+        tk.Button(toolbar, text="Vue d'ensemble", command=self.zoom_to_fit).pack(side=tk.LEFT)
+        # Contrôle de la simulation : pause, pas à pas, avance rapide et turbo (sans attente entre ticks)
+        self.pause_button = tk.Button(toolbar, text="Pause", command=self.toggle_pause)
+        self.pause_button.pack(side=tk.LEFT, padx=(10, 0))
+        tk.Button(toolbar, text="Pas arrière", command=lambda: self.rewind(1)).pack(side=tk.LEFT)
+        tk.Button(toolbar, text="Pas", command=self.step_once).pack(side=tk.LEFT)
+        self.ticks_entry = tk.Entry(toolbar, width=7)
+        self.ticks_entry.insert(0, str(FAST_FORWARD_TICKS))
+        self.ticks_entry.pack(side=tk.LEFT)
+        tk.Button(toolbar, text="Avancer de N ticks", command=self.fast_forward).pack(side=tk.LEFT)
+        tk.Button(toolbar, text="Reculer de N ticks", command=self.rewind_ticks).pack(side=tk.LEFT)
+        self.turbo_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(toolbar, text="Turbo", variable=self.turbo_var, command=self.restart_loop).pack(side=tk.LEFT)
+        self.tick_label = tk.Label(toolbar, text="Tick 0")
+        self.tick_label.pack(side=tk.RIGHT)
+        self.hscroll = tk.Scrollbar(self.frame_grid, orient=tk.HORIZONTAL, command=self.scroll_x)
+        self.hscroll.pack(side=tk.BOTTOM, fill=tk.X)
+        self.vscroll = tk.Scrollbar(self.frame_grid, orient=tk.VERTICAL, command=self.scroll_y)
+        self.vscroll.pack(side=tk.RIGHT, fill=tk.Y)
+        view_width, view_height = self.view_size()
+        self.canvas = tk.Canvas(self.frame_grid, width=view_width, height=view_height, bg='white',
+                                highlightthickness=0)
+        self.canvas.pack(side=tk.LEFT, expand=True, fill='both')
+        self.renderer = CanvasRenderer(self.canvas, self.sim, self.item_color, self.grid_size,
+                                       view_width, view_height)
+        self.renderer.outlined = self.probes
         
         # Panneau Items
         self.selected_item_label = tk.Label(self.frame_items, text="Aucun item sélectionné", fg="red")
@@ -54,7 +118,13 @@ class GridApp:
         self.canvas.bind("<Button-1>", self.place_item)
         self.canvas.bind("<B1-Motion>", self.move_item)
         self.canvas.bind("<Button-3>", self.delete_item)
+        self.canvas.bind("<Shift-Button-1>", self.toggle_probe)  # Maj + clic : poser ou retirer une sonde
         self.canvas.bind("<Button-2>", self.release_item)  # Clique molette pour déselectionner
+        self.canvas.bind("<ButtonRelease-1>", self.end_drag)
+        self.canvas.bind("<Configure>", self.resize_view)
+        # Molette : défilement vertical, Maj + molette : horizontal, Ctrl + molette : zoom
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.canvas.bind(sequence, self.on_mouse_wheel)
         
         # Barre de statut
         self.status_bar = tk.Label(root, text="Item en main : Aucun", anchor='w')
@@ -64,15 +134,229 @@ class GridApp:
 
     # ---------------------- Boucle de mise à jour centralisée ----------------------
     def start_update_loop(self):
-        self.ticker_id = self.root.after(self.tick_interval, self.update_loop)
+        self.schedule_loop(self.tick_interval)
+
+    def schedule_loop(self, delay):
+        if self.ticker_id is None:
+            self.ticker_id = self.root.after(delay, self.update_loop)
+
+    def stop_loop(self):
+        if self.ticker_id is not None:
+            self.root.after_cancel(self.ticker_id)
+            self.ticker_id = None
+
+    def restart_loop(self):
+        """Relance la boucle sans attendre la fin de l'intervalle en cours (changement de mode)."""
+        self.stop_loop()
+        if self.fast_forward_ticks or not self.paused:
+            self.schedule_loop(1)
 
     def update_loop(self):
-        self.update_switches()
-        self.update_cables()
-        self.update_leds()
-        self.update_comparators()
-        self.update_repeaters()
-        self.ticker_id = self.root.after(self.tick_interval, self.update_loop)
+        """
+        Un passage de la boucle : un tick en temps réel, ou autant de ticks que TURBO_SLICE le permet
+        en turbo et en avance rapide. Le rendu, limité à une frame par frame_interval, ne montre que
+        l'état atteint à la fin des passages.
+        """
+        self.ticker_id = None
+        start = time.perf_counter()
+        self.settle_if_needed()
+        runner = self.runner()
+        if self.fast_forward_ticks:
+            ticks, changes = runner.run_for(TURBO_SLICE, self.fast_forward_ticks)
+            self.render_cells(changes)
+            self.fast_forward_ticks -= ticks
+            if not self.fast_forward_ticks:
+                self.end_fast_forward()
+        elif self.turbo_var.get():
+            self.render_cells(runner.run_for(TURBO_SLICE)[1])
+        else:
+            self.render_cells(runner.step())
+            overrun = self.profiler.end_tick(time.perf_counter() - start)
+            if overrun is not None:
+                self.report_overrun(overrun)
+        if self.fast_forward_ticks or not self.paused:
+            self.schedule_loop(1 if self.fast_forward_ticks or self.turbo_var.get() else self.tick_interval)
+
+    def runner(self):
+        """Objet qui calcule les ticks : le détecteur de cycles (ticks périodiques sautés) ou le moteur."""
+        return self.cycles if self.cycles_var.get() else self.sim
+
+    def settle_if_needed(self):
+        if self.needs_settle and self.settle_var.get():
+            self.settle_circuit()
+
+    def toggle_pause(self):
+        """Met en pause (avance rapide comprise) ou relance la simulation."""
+        self.paused = not self.paused
+        self.pause_button.config(text="Lecture" if self.paused else "Pause")
+        if self.paused:
+            self.stop_loop()
+            if self.fast_forward_ticks:
+                self.end_fast_forward()
+        else:
+            self.schedule_loop(self.tick_interval)
+
+    def step_once(self):
+        """Met la simulation en pause et calcule un seul tick."""
+        if not self.paused:
+            self.toggle_pause()
+        self.settle_if_needed()
+        self.render_cells(self.runner().step())
+
+    def tick_count(self, action):
+        """Nombre de ticks du champ N, ou None (signalé dans la barre de statut) s'il est invalide."""
+        try:
+            count = int(self.ticks_entry.get())
+            if count <= 0:
+                raise ValueError
+        except ValueError:
+            self.status_bar.config(text=f"{action} : nombre de ticks invalide")
+            return None
+        return count
+
+    def fast_forward(self):
+        """Calcule N ticks aussi vite que possible, puis reprend le mode précédent (pause comprise)."""
+        count = self.tick_count("Avance rapide")
+        if count is None:
+            return
+        if not self.fast_forward_ticks:
+            self.fast_forward_start = (time.perf_counter(), self.sim.tick)
+        self.fast_forward_ticks += count
+        self.restart_loop()
+
+    def rewind(self, count):
+        """Met la simulation en pause et revient count ticks en arrière, au plus au début de l'historique."""
+        if not self.paused:
+            self.toggle_pause()
+        self.stop_recording()  # Une trace ne remonte pas le temps
+        tick, changed = self.history.rewind(count)
+        self.render_cells(changed)
+        self.status_bar.config(text=f"Retour au tick {tick} (historique gardé depuis le tick {self.history.oldest()})")
+
+    def rewind_ticks(self):
+        count = self.tick_count("Retour en arrière")
+        if count is not None:
+            self.rewind(count)
+
+    def end_fast_forward(self):
+        self.fast_forward_ticks = 0
+        start, first_tick = self.fast_forward_start
+        elapsed = time.perf_counter() - start
+        ticks = self.sim.tick - first_tick
+        rate = f" ({ticks / elapsed:.0f} ticks/s)" if elapsed else ""
+        self.status_bar.config(text=f"Avance rapide : {ticks} ticks en {elapsed:.2f} s{rate}")
+
+    def report_overrun(self, record):
+        """Signale dans la barre de statut un tick plus long que l'intervalle de la boucle."""
+        phase, seconds = slowest_phase(record)
+        self.status_bar.config(text=f"Tick {record['tick']} en retard : {record['seconds'] * 1000:.0f} ms "
+                                    f"pour {self.tick_interval} ms (phase {phase} : {seconds * 1000:.0f} ms, "
+                                    f"{self.profiler.overruns} dépassements)")
+
+    # ---------------------- Rendu des cellules ----------------------
+    def item_color(self, item_id, active):
+        """Couleur d'une cellule selon son type et son état dans le moteur."""
+        if item_id == CABLE:
+            return "lime" if active else "forestgreen"
+        if item_id == BUTTON:
+            return self.items[BUTTON]['color'] if active else 'brown'
+        if item_id == SWITCH:
+            return "orange" if active else "moccasin"
+        if item_id == LED:
+            return self.items[LED].get('on_color', "yellow") if active else "olive"
+        if item_id == REPEATER:
+            return "blue" if active else "darkblue"
+        return self.items[item_id]['color']
+
+    def render_cells(self, cells):
+        """Programme le redessin des cellules ; les ticks d'une même frame sont fusionnés."""
+        self.renderer.mark(cells)
+        if self.frame_id is None:
+            self.frame_id = self.root.after(self.frame_interval, self.draw_frame)
+
+    def draw_frame(self):
+        self.frame_id = None
+        start = time.perf_counter()
+        redrawn = self.renderer.flush()
+        self.profiler.record_frame(redrawn, time.perf_counter() - start)
+        period = self.cycles.current_period() if self.cycles_var.get() else None
+        state = "" if period is None else " (au repos)" if period == 1 else f" (cycle de {period} ticks)"
+        self.tick_label.config(text=f"Tick {self.sim.tick}{state}")
+
+    def cell_under(self, event):
+        """Renvoie la cellule du moteur sous le curseur, ou None."""
+        return self.sim.cell_at(*self.renderer.position_at(event.x, event.y))
+
+    # ---------------------- Défilement et zoom ----------------------
+    def view_size(self):
+        return (min(self.cols * self.grid_size, MAX_VIEW_WIDTH),
+                min(self.rows * self.grid_size, MAX_VIEW_HEIGHT))
+
+    def update_scrollbars(self):
+        x0, y0, x1, y1 = self.renderer.visible_range()
+        self.hscroll.set(x0 / max(1, self.cols), x1 / max(1, self.cols))
+        self.vscroll.set(y0 / max(1, self.rows), y1 / max(1, self.rows))
+
+    def scroll_view(self, axis, action, amount, unit=None):
+        """Commande des barres de défilement ("moveto" fraction ou "scroll" n units/pages)."""
+        renderer = self.renderer
+        if axis == 'x':
+            position, total, page = renderer.view_x, self.cols, renderer.width // renderer.cell_size
+        else:
+            position, total, page = renderer.view_y, self.rows, renderer.height // renderer.cell_size
+        if action == 'moveto':
+            position = int(float(amount) * total)
+        else:
+            position += int(amount) * (max(1, page) if unit == 'pages' else 1)
+        if axis == 'x':
+            renderer.scroll_to(position, renderer.view_y)
+        else:
+            renderer.scroll_to(renderer.view_x, position)
+        self.update_scrollbars()
+
+    def scroll_x(self, *args):
+        self.scroll_view('x', *args)
+
+    def scroll_y(self, *args):
+        self.scroll_view('y', *args)
+
+    def on_mouse_wheel(self, event):
+        if event.num == 4 or getattr(event, 'delta', 0) > 0:
+            direction = -1
+        else:
+            direction = 1
+        if event.state & 0x0004:  # Ctrl
+            self.zoom_view(-direction, event.x, event.y)
+        elif event.state & 0x0001:  # Maj
+            self.scroll_view('x', 'scroll', 3 * direction, 'units')
+        else:
+            self.scroll_view('y', 'scroll', 3 * direction, 'units')
+
+    def zoom_view(self, direction, px=0, py=0):
+        """Passe au niveau de zoom suivant (direction 1) ou précédent (direction -1)."""
+        scale = self.renderer.scale()
+        if direction > 0:
+            levels = [level for level in ZOOM_LEVELS if level > scale]
+            new_scale = levels[0] if levels else None
+        else:
+            levels = [level for level in ZOOM_LEVELS if level < scale]
+            new_scale = levels[-1] if levels else None
+        if new_scale is not None:
+            self.renderer.zoom(new_scale, px, py)
+            self.update_scrollbars()
+
+    def zoom_to_fit(self):
+        """Affiche toute la grille dans la fenêtre (vue d'ensemble sur les grandes grilles)."""
+        renderer = self.renderer
+        scale = min(renderer.width / max(1, self.cols), renderer.height / max(1, self.rows), MAX_CELL_SIZE)
+        # Sous un pixel par case, on échantillonne une case sur n (n entier, arrondi vers le haut)
+        renderer.set_scale(int(scale) if scale >= 1 else 1 / -(-1 // scale))
+        renderer.scroll_to(0, 0)
+        self.update_scrollbars()
+
+    def resize_view(self, event):
+        self.renderer.resize(event.width, event.height)
+        self.update_scrollbars()
 
     # ---------------------- Mise à jour des éléments ----------------------
     def update_status_bar(self):
@@ -88,13 +372,9 @@ class GridApp:
         self.update_status_bar()
 
     def draw_grid(self):
-        self.canvas.delete("grid_line")
-        for i in range(self.cols + 1):
-            self.canvas.create_line(i * self.grid_size, 0, i * self.grid_size, self.rows * self.grid_size,
-                                    tags="grid_line")
-        for i in range(self.rows + 1):
-            self.canvas.create_line(0, i * self.grid_size, self.cols * self.grid_size, i * self.grid_size,
-                                    tags="grid_line")
+        """Redessine la partie visible de la grille (lignes et cellules)."""
+        self.renderer.redraw()
+        self.update_scrollbars()
 
     # ---------------------- Panneaux Items, Paramètres et Presets ----------------------
     def create_settings_panel(self):
@@ -128,14 +408,43 @@ class GridApp:
         self.grid_size_entry = tk.Entry(self.frame_settings)
         self.grid_size_entry.pack()
         self.grid_size_entry.insert(0, str(self.grid_size))
+        # Décalage appliqué aux items existants : agrandir la grille vers la gauche ou vers le haut
+        tk.Label(self.frame_settings, text="Décalage x des items:").pack()
+        self.shift_x_entry = tk.Entry(self.frame_settings)
+        self.shift_x_entry.pack()
+        self.shift_x_entry.insert(0, "0")
+        tk.Label(self.frame_settings, text="Décalage y des items:").pack()
+        self.shift_y_entry = tk.Entry(self.frame_settings)
+        self.shift_y_entry.pack()
+        self.shift_y_entry.insert(0, "0")
         tk.Button(self.frame_settings, text="Confirmer paramètres grille", command=self.confirm_grid_settings).pack(pady=5)
+        tk.Button(self.frame_settings, text="Recadrer sur le contenu", command=self.crop_grid).pack(pady=5)
+        self.grow_var = tk.BooleanVar(value=True)
+        tk.Checkbutton(self.frame_settings, text="Agrandir la grille au besoin (pose hors grille)",
+                       variable=self.grow_var).pack()
+        self.buffered_var = tk.BooleanVar(value=self.sim.buffered)
+        tk.Checkbutton(self.frame_settings, text="Tick bufferisé (déterministe)", variable=self.buffered_var,
+                       command=self.toggle_buffered).pack()
+        self.settle_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(self.frame_settings, text="Évaluation topologique (stabilisation immédiate)",
+                       variable=self.settle_var, command=self.request_settle).pack()
+        self.cycles_var = tk.BooleanVar(value=True)
+        tk.Checkbutton(self.frame_settings, text="Sauter les ticks au repos et les cycles",
+                       variable=self.cycles_var).pack()
         tk.Button(self.frame_settings, text="Reset Grid", command=self.reset_grid).pack(pady=5)
+        tk.Button(self.frame_settings, text="Sauvegarder la grille", command=self.save_board_file).pack(pady=5)
+        tk.Button(self.frame_settings, text="Charger une grille", command=self.load_board_file).pack(pady=5)
+        tk.Button(self.frame_settings, text="Exporter le profil des ticks", command=self.dump_profile).pack(pady=5)
+        self.record_button = tk.Button(self.frame_settings, text="Enregistrer les sondes",
+                                       command=self.toggle_recording)
+        self.record_button.pack(pady=5)
+        tk.Button(self.frame_settings, text="Exporter une trace en VCD", command=self.export_vcd).pack(pady=5)
 
     def create_presets_panel(self):
         """Crée l'interface pour importer des schémas préconfigurés."""
         tk.Label(self.frame_presets, text="Sélectionnez un preset:", font=('Helvetica', 12, 'bold')).pack(pady=5)
         self.preset_selector = ttk.Combobox(self.frame_presets, state="readonly")
-        self.preset_selector['values'] = ["Porte AND","Porte OR","Porte NAND","Porte NOR","Porte NOT","Porte XOR","Porte XNOR"]
+        self.preset_selector['values'] = list(PRESETS)
         self.preset_selector.current(0)
         self.preset_selector.pack(pady=5)
         
@@ -149,8 +458,29 @@ class GridApp:
         self.offset_y_entry = tk.Entry(offset_frame, width=5)
         self.offset_y_entry.insert(0, "0")
         self.offset_y_entry.grid(row=0, column=3, padx=2)
+        # Mosaïque : nombre de copies et pas entre deux copies (vide : une case d'écart)
+        tk.Label(offset_frame, text="Copies X:").grid(row=1, column=0, padx=2)
+        self.count_x_entry = tk.Entry(offset_frame, width=5)
+        self.count_x_entry.insert(0, "1")
+        self.count_x_entry.grid(row=1, column=1, padx=2)
+        tk.Label(offset_frame, text="Copies Y:").grid(row=1, column=2, padx=2)
+        self.count_y_entry = tk.Entry(offset_frame, width=5)
+        self.count_y_entry.insert(0, "1")
+        self.count_y_entry.grid(row=1, column=3, padx=2)
+        tk.Label(offset_frame, text="Pas X:").grid(row=2, column=0, padx=2)
+        self.stride_x_entry = tk.Entry(offset_frame, width=5)
+        self.stride_x_entry.grid(row=2, column=1, padx=2)
+        tk.Label(offset_frame, text="Pas Y:").grid(row=2, column=2, padx=2)
+        self.stride_y_entry = tk.Entry(offset_frame, width=5)
+        self.stride_y_entry.grid(row=2, column=3, padx=2)
         
+        self.macro_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(self.frame_presets, text="Poser en macro (table précompilée)",
+                       variable=self.macro_var).pack()
         tk.Button(self.frame_presets, text="Importer le preset", command=self.import_selected_preset).pack(pady=5)
+        self.preset_report = tk.Label(self.frame_presets, text="")
+        self.preset_report.pack(pady=5)
+        tk.Button(self.frame_presets, text="Table de vérité de la grille", command=self.show_truth_table).pack(pady=5)
 
     def load_item_settings(self, event):
         selected_text = self.item_selector.get()
@@ -184,390 +514,389 @@ class GridApp:
         self.update_status_bar()
 
     def confirm_grid_settings(self):
+        """Redimensionne la grille en gardant les items (décalés si demandé) et change la taille des cases."""
         try:
             new_rows = int(self.rows_entry.get())
             new_cols = int(self.cols_entry.get())
             new_grid_size = int(self.grid_size_entry.get())
+            shift_x = int(self.shift_x_entry.get() or 0)
+            shift_y = int(self.shift_y_entry.get() or 0)
         except ValueError:
             return
-        self.rows = new_rows
-        self.cols = new_cols
-        self.grid_size = new_grid_size
-        self.canvas.config(width=self.cols * self.grid_size, height=self.rows * self.grid_size)
-        self.reset_grid()
+        try:
+            self.sim.resize(new_rows, new_cols, shift_x, shift_y)
+        except ValueError as error:
+            self.status_bar.config(text=f"Redimensionnement impossible : {error}")
+            return
+        for entry in (self.shift_x_entry, self.shift_y_entry):
+            entry.delete(0, tk.END)
+            entry.insert(0, "0")
+        self.grid_size = max(1, min(new_grid_size, MAX_CELL_SIZE))
+        self.renderer.set_scale(self.grid_size)
+        view_width, view_height = self.view_size()
+        self.canvas.config(width=view_width, height=view_height)
+        self.renderer.width, self.renderer.height = view_width, view_height
+        self.grid_resized(shift_x, shift_y)
+
+    def grid_resized(self, shift_x=0, shift_y=0):
+        """Suit un changement de dimensions du moteur ; la vue suit les items décalés de (shift_x, shift_y)."""
+        self.rows, self.cols = self.sim.rows, self.sim.cols
+        for entry, value in ((self.rows_entry, self.rows), (self.cols_entry, self.cols)):
+            entry.delete(0, tk.END)
+            entry.insert(0, str(value))
+        self.dragged_cell = None
+        self.request_settle()
+        self.renderer.view_x += shift_x
+        self.renderer.view_y += shift_y
+        self.renderer.clamp_view()
+        if shift_x or shift_y:
+            shifted = {(x + shift_x, y + shift_y) for x, y in self.probes}
+            self.probes.clear()
+            self.probes.update(shifted)
+            if self.recorder is not None:
+                self.recorder.shift(shift_x, shift_y)
+        self.draw_grid()
+
+    def grow_grid(self, x0, y0, x1, y1):
+        """
+        Agrandit la grille (si l'option est active) pour qu'elle contienne le rectangle x0..x1, y0..y1
+        et renvoie le décalage (dx, dy) appliqué aux items existants et à ce rectangle.
+        """
+        if not self.grow_var.get() or (self.sim.in_bounds(x0, y0) and self.sim.in_bounds(x1, y1)):
+            return 0, 0
+        dx, dy = self.sim.grow_to(x0, y0)
+        self.sim.grow_to(x1 + dx, y1 + dy)
+        self.grid_resized(dx, dy)
+        return dx, dy
+
+    def crop_grid(self):
+        """Réduit la grille au rectangle occupé par les items (plus une marge) pour libérer la mémoire."""
+        rows, cols = self.sim.rows, self.sim.cols
+        dx, dy = self.sim.crop(CROP_MARGIN)
+        self.grid_resized(dx, dy)
+        self.status_bar.config(text=f"Grille recadrée : {cols} x {rows} -> {self.cols} x {self.rows}")
+
+    def toggle_buffered(self):
+        self.sim.set_buffered(self.buffered_var.get())
+        self.request_settle()
+
+    # ---------------------- Évaluation topologique ----------------------
+    def request_settle(self):
+        """Demande une stabilisation avant le prochain tick (si l'option est active)."""
+        self.needs_settle = True
+
+    def compiled_netlist(self):
+        """Netlist de la grille, recompilée seulement après une édition."""
+        if self.netlist is None or self.netlist.sim is not self.sim or self.netlist.is_stale():
+            self.netlist = Netlist(self.sim)
+        return self.netlist
+
+    def settle_circuit(self):
+        """
+        Amène en une passe la partie acyclique du circuit à son état stable ; les boucles
+        restent simulées tick par tick. La netlist n'est recompilée qu'après une édition.
+        """
+        settled, remaining = self.compiled_netlist().settle()
+        # Un switch en chauffe change de règle à la fin de sa chauffe : on restabilise alors
+        self.needs_settle = bool(self.sim.warming)
+        self.status_bar.config(text=f"Circuit stabilisé : {settled} cellules, {remaining} simulées au tick")
+
+    def show_truth_table(self):
+        """
+        Affiche dans une fenêtre la table de vérité des LED sur toutes les combinaisons des boutons
+        de la grille, évaluées en parallèle sur la netlist (sans basculer les boutons).
+        """
+        inputs = sorted(self.sim.cells_of_type(BUTTON))
+        try:
+            tables = self.compiled_netlist().truth_table(inputs)
+        except ValueError as error:
+            self.status_bar.config(text=f"Table de vérité impossible : {error}")
+            return
+        window = tk.Toplevel(self.root)
+        window.title("Table de vérité")
+        text = tk.Text(window, font=('Courier', 10), width=80, height=30)
+        scrollbar = tk.Scrollbar(window, command=text.yview)
+        text.config(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        text.pack(side=tk.LEFT, expand=True, fill='both')
+        text.insert(tk.END, format_truth_table(self.sim, inputs, tables))
+        text.config(state=tk.DISABLED)
 
     def reset_grid(self):
-        for item_id in list(self.placed_items.keys()):
-            self.canvas.delete(item_id)
-        self.placed_items.clear()
-        self.position_index.clear()
-        self.canvas.delete("all")
+        self.fast_forward_ticks = 0
+        self.clear_probes()
+        self.sim.reset(self.rows, self.cols)
+        self.dragged_cell = None
+        self.renderer.view_x = self.renderer.view_y = 0
+        self.draw_grid()
+
+    # ---------------------- Profilage ----------------------
+    def dump_profile(self):
+        """Écrit dans un fichier JSON le profil des derniers ticks (durée et cellules par phase)."""
+        path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("Profil JSON", "*.json")])
+        if not path:
+            return
+        try:
+            self.profiler.dump(path)
+        except OSError as error:
+            self.status_bar.config(text=f"Export du profil impossible : {error}")
+            return
+        self.status_bar.config(text=f"Profil de {len(self.profiler.records)} ticks exporté "
+                                    f"({self.profiler.overruns} dépassements)")
+
+    # ---------------------- Sondes et traces ----------------------
+    def toggle_probe(self, event):
+        """Maj + clic : pose ou retire une sonde sur l'item sous le curseur."""
+        cell = self.cell_under(event)
+        if cell is None:
+            return
+        position = self.sim.position(cell)
+        if position in self.probes:
+            self.probes.discard(position)
+        else:
+            self.probes.add(position)
+        self.renderer.move_cell(cell, cell)  # Redessine l'ovale avec ou sans contour
+        recording = " (prises en compte au prochain enregistrement)" if self.recorder is not None else ""
+        self.status_bar.config(text=f"{len(self.probes)} sondes{recording}")
+
+    def clear_probes(self):
+        self.stop_recording()
+        self.probes.clear()
+
+    def toggle_recording(self):
+        """Démarre l'enregistrement de l'état des sondes dans un fichier de trace, ou l'arrête."""
+        if self.recorder is not None:
+            self.stop_recording()
+            return
+        if not self.probes:
+            self.status_bar.config(text="Aucune sonde : Maj + clic sur un item pour en poser")
+            return
+        path = filedialog.asksaveasfilename(defaultextension=".elt", filetypes=[("Trace elektrikal", "*.elt")])
+        if not path:
+            return
+        probes = []
+        for x, y in sorted(self.probes, key=lambda position: (position[1], position[0])):
+            item = self.items.get(self.sim.kind[self.sim.index(x, y)]) if self.sim.in_bounds(x, y) else None
+            probes.append((f"{item['name'] if item else 'vide'}_{x}_{y}", x, y))
+        try:
+            self.recorder = TraceRecorder(path, probes)
+        except OSError as error:
+            self.status_bar.config(text=f"Enregistrement impossible : {error}")
+            return
+        # Les cycles détectés ensuite tiennent dans les relevés, qui rejouent les ticks sautés
+        self.cycles.forget()
+        self.recorder.attach(self.sim, self.cycles.current_period)
+        self.record_button.config(text="Arrêter l'enregistrement")
+        self.status_bar.config(text=f"Enregistrement de {len(probes)} sondes dans {path}")
+
+    def stop_recording(self):
+        if self.recorder is None:
+            return
+        recorder, self.recorder = self.recorder, None
+        recorder.close()
+        self.record_button.config(text="Enregistrer les sondes")
+        self.status_bar.config(text=f"Trace enregistrée : {recorder.ticks} ticks, {len(recorder.probes)} sondes")
+
+    def export_vcd(self):
+        """Convertit un fichier de trace au format VCD (une unité de temps par tick : l'intervalle de la boucle)."""
+        path = filedialog.askopenfilename(filetypes=[("Trace elektrikal", "*.elt")])
+        if not path:
+            return
+        target = filedialog.asksaveasfilename(defaultextension=".vcd", filetypes=[("Value Change Dump", "*.vcd")])
+        if not target:
+            return
+        if os.path.abspath(target) == os.path.abspath(path):
+            self.status_bar.config(text="Export VCD impossible : la trace serait écrasée")
+            return
+        try:
+            with TraceReader(path) as reader:
+                write_vcd(reader, target, f"{self.tick_interval} ms")
+        except (OSError, ValueError) as error:
+            self.status_bar.config(text=f"Export VCD impossible : {error}")
+            return
+        self.status_bar.config(text=f"Trace exportée en VCD : {target}")
+
+    # ---------------------- Sauvegarde et chargement ----------------------
+    def item_definitions(self):
+        """Définitions des items sans les objets tkinter, pour la sauvegarde."""
+        return {item_id: {key: value for key, value in data.items() if key in ('name', 'color', 'on_color')}
+                for item_id, data in self.items.items()}
+
+    def save_board_file(self):
+        path = filedialog.asksaveasfilename(defaultextension=".elk", filetypes=[("Grille elektrikal", "*.elk")])
+        if path:
+            save_board(self.sim, path, self.item_definitions())
+
+    def load_board_file(self):
+        path = filedialog.askopenfilename(filetypes=[("Grille elektrikal", "*.elk")])
+        if not path:
+            return
+        try:
+            _, items = load_board(path, self.sim)
+        except (OSError, ValueError) as error:
+            self.status_bar.config(text=f"Chargement impossible : {error}")
+            return
+        self.restore_items(items)
+        self.rows, self.cols = self.sim.rows, self.sim.cols
+        for entry, value in ((self.rows_entry, self.rows), (self.cols_entry, self.cols)):
+            entry.delete(0, tk.END)
+            entry.insert(0, str(value))
+        self.buffered_var.set(self.sim.buffered)
+        self.fast_forward_ticks = 0
+        self.clear_probes()
+        self.dragged_cell = None
+        self.request_settle()
+        self.renderer.view_x = self.renderer.view_y = 0
         self.draw_grid()
 
+    def restore_items(self, items):
+        """Recrée les items enregistrés manquants et applique les noms et couleurs enregistrés."""
+        for item_id in sorted(items):
+            while self.item_id_counter <= item_id:
+                self.add_item()
+            data = self.items[item_id]
+            data.update(items[item_id])
+            data['canvas'].itemconfig(data['shape'], fill=data['color'])
+        self.update_item_selector()
+
     # ---------------------- Fonctions d'import de schémas ----------------------
     def import_schema_item(self, item_id, grid_x, grid_y):
         """
         Place un item sur la grille à la position (grid_x, grid_y) selon son type (item_id).
-        Pour les câbles, on commence avec la couleur "gray".
-        Pour les boutons (id 1), on lie l'événement de clic pour permettre l'activation/désactivation.
+        L'item n'est dessiné que s'il se trouve dans la partie visible de la grille.
         """
-        fill = self.items[item_id]['color'] if item_id != 0 else "gray"
-        item = self.canvas.create_oval(
-            grid_x * self.grid_size + 5, grid_y * self.grid_size + 5,
-            (grid_x + 1) * self.grid_size - 5, (grid_y + 1) * self.grid_size - 5,
-            fill=fill, tags='movable'
-        )
-        self.placed_items[item] = {
-            'id': item_id,
-            'active': (item_id == 1),  # Les boutons (id 1) sont activés par défaut
-            'position': (grid_x, grid_y),
-            'previous_state': False,
-            'initialized': False
-        }
-        self.position_index[(grid_x, grid_y)] = item
-        # Pour les boutons, lier le clic pour toggler leur état
-        if item_id == 1:
-            self.canvas.tag_bind(item, "<Button-1>", self.toggle_item_state)
-        if item_id == 2:
-            self.root.after(200, lambda: self.set_switch_initialized(item))
+        cell = self.sim.place_item(item_id, grid_x, grid_y)
+        if cell is not None:
+            self.renderer.add_cell(cell)
+            self.request_settle()
+
+    def import_schema(self, schema, offset_x=0, offset_y=0, count_x=1, count_y=1, stride_x=None, stride_y=None):
+        """
+        Pose un schéma (éventuellement en mosaïque count_x x count_y) en une passe sur le moteur,
+        puis le dessine en un seul lot. Renvoie (cellules créées, refus), voir presets.stamp.
+        """
+        cells, rejected = stamp(self.sim, schema, offset_x, offset_y, count_x, count_y, stride_x, stride_y)
+        self.renderer.add_cells(cells)
+        self.request_settle()
+        return cells, rejected
+
+    def import_preset(self, name, offset_x=0, offset_y=0, count_x=1, count_y=1, stride_x=None, stride_y=None):
+        return self.import_schema(PRESETS[name], offset_x, offset_y, count_x, count_y, stride_x, stride_y)
 
-    def import_schema(self, schema, offset_x=0, offset_y=0):
-        for item_type, rel_x, rel_y in schema:
-            self.import_schema_item(item_type, offset_x + rel_x, offset_y + rel_y)
+    def import_macro(self, name, offset_x=0, offset_y=0, count_x=1, count_y=1, stride_x=None, stride_y=None):
+        """
+        Pose un preset comme import_preset, mais chaque copie complète et isolée est simulée par
+        la table de sa macro (compilée à la première utilisation). Renvoie (cellules, refus, instances) ;
+        lève ValueError si le preset ne peut pas devenir une macro.
+        """
+        if name not in self.macros:
+            self.macros[name] = Macro(name, PRESETS[name])
+        cells, rejected, instances = stamp_macro(self.sim, self.macros[name], offset_x, offset_y,
+                                                 count_x, count_y, stride_x, stride_y)
+        self.renderer.add_cells(cells)
+        self.request_settle()
+        return cells, rejected, instances
 
     def import_and_gate(self, offset_x=0, offset_y=0):
-        schema = [
-            (1, 0, 0),   # Bouton (entrée supérieure)
-            (2, 1, 0),   # Switch à droite du bouton supérieur
-            (1, 0, 2),   # Bouton (entrée inférieure)
-            (2, 1, 2),   # Switch à droite du bouton inférieur
-            (0, 1, 1),   # Cable reliant les deux entrées
-            (2, 2, 1),   # Switch de traitement
-            (3, 3, 1)    # LED en sortie
-        ]
-        self.import_schema(schema, offset_x, offset_y)
+        self.import_preset("Porte AND", offset_x, offset_y)
 
     def import_or_gate(self, offset_x=0, offset_y=0):
-        schema = [
-            (1, 0, 0),
-            (1, 0, 1),
-            (0, 1, 0),
-            (0, 1, 1),
-            (3, 2, 0) 
-        ]
-        self.import_schema(schema, offset_x, offset_y)
-    
+        self.import_preset("Porte OR", offset_x, offset_y)
+
     def import_nand_gate(self, offset_x=0, offset_y=0):
-        schema = [
-            (1, 0, 0),
-            (2, 1, 0),
-            (1, 0, 2),
-            (2, 1, 2),
-            (0, 1, 1),
-            (3, 2, 1)
-        ]
-        self.import_schema(schema, offset_x, offset_y)
-    
+        self.import_preset("Porte NAND", offset_x, offset_y)
+
     def import_nor_gate(self, offset_x=0, offset_y=0):
-        schema = [
-            (1, 0, 0),
-            (0, 1, 0),
-            (1, 0, 1),
-            (0, 1, 1),
-            (2, 2, 0),
-            (3, 3, 0)
-        ]
-        self.import_schema(schema, offset_x, offset_y)
-    
+        self.import_preset("Porte NOR", offset_x, offset_y)
+
     def import_not_gate(self, offset_x=0, offset_y=0):
-        schema = [
-            (1, 0, 0),
-            (2, 1, 0),
-            (3, 2, 0)
-        ]
-        self.import_schema(schema, offset_x, offset_y)
-    
+        self.import_preset("Porte NOT", offset_x, offset_y)
+
     def import_xor_gate(self, offset_x=0, offset_y=0):
-        schema = [
-            (1, 0, 0),
-            (2, 1, 0),
-            (2, 2, 0),
-            (0, 3, 0),
-            (2, 4, 0),
-            (0, 5, 0),
-            (0, 2, 1),
-            (2, 3, 1),
-            (0, 5, 1),
-            (3, 6, 1),
-            (1, 0, 2),
-            (2, 1, 2),
-            (2, 2, 2),
-            (0, 3, 2),
-            (2, 4, 2),
-            (0, 5, 2)
-        ]
-        self.import_schema(schema, offset_x, offset_y)
-        
+        self.import_preset("Porte XOR", offset_x, offset_y)
+
     def import_xnor_gate(self, offset_x=0, offset_y=0):
-        schema = [
-            (1, 0, 0),
-            (2, 1, 0),
-            (2, 2, 0),
-            (0, 3, 0),
-            (2, 4, 0),
-            (0, 5, 0),
-            (0, 2, 1),
-            (2, 3, 1),
-            (0, 5, 1),
-            (3, 6, 1),
-            (1, 0, 2),
-            (2, 1, 2),
-            (2, 2, 2),
-            (0, 3, 2),
-            (2, 4, 2),
-            (0, 5, 2),
-            (2, 6, 1),
-            (3, 7, 1)
-        ]
-        self.import_schema(schema, offset_x, offset_y)
-    
+        self.import_preset("Porte XNOR", offset_x, offset_y)
+
     def import_selected_preset(self):
-        try:
-            offset_x = int(self.offset_x_entry.get())
-            offset_y = int(self.offset_y_entry.get())
-        except ValueError:
-            offset_x, offset_y = 0, 0
+        def read(entry, default):
+            try:
+                return int(entry.get())
+            except ValueError:
+                return default
+        offset_x, offset_y = read(self.offset_x_entry, 0), read(self.offset_y_entry, 0)
+        count_x, count_y = max(1, read(self.count_x_entry, 1)), max(1, read(self.count_y_entry, 1))
+        stride_x, stride_y = read(self.stride_x_entry, None), read(self.stride_y_entry, None)
         preset = self.preset_selector.get()
-        if preset == "Porte AND":
-            self.import_and_gate(offset_x, offset_y)
-        if preset == "Porte OR":
-            self.import_or_gate(offset_x,offset_y)
-        if preset == "Porte NAND":
-            self.import_nand_gate(offset_x,offset_y)
-        if preset == "Porte NOR":
-            self.import_nor_gate(offset_x,offset_y)
-        if preset == "Porte NOT":
-            self.import_not_gate(offset_x,offset_y)
-        if preset == "Porte XOR":
-            self.import_xor_gate(offset_x,offset_y)
-        if preset == "Porte XNOR":
-            self.import_xnor_gate(offset_x,offset_y)
-        # D'autres presets peuvent être ajoutés ici.
+        if preset not in PRESETS:
+            return
+        dx, dy = self.grow_grid(*tile_bounds(PRESETS[preset], offset_x, offset_y, count_x, count_y,
+                                             stride_x, stride_y))
+        offset_x, offset_y = offset_x + dx, offset_y + dy
+        instances = None
+        if self.macro_var.get():
+            try:
+                cells, rejected, instances = self.import_macro(preset, offset_x, offset_y, count_x, count_y,
+                                                               stride_x, stride_y)
+            except ValueError as error:
+                self.preset_report.config(text=str(error), fg="red")
+                return
+        else:
+            cells, rejected = self.import_preset(preset, offset_x, offset_y, count_x, count_y, stride_x, stride_y)
+        report = f"{len(cells)} items posés"
+        if instances is not None:
+            report += f" ({len(instances)} copies en macro)"
+        if rejected:
+            occupied = sum(1 for _, _, reason in rejected if reason == OCCUPIED)
+            report += f", {occupied} cases déjà occupées, {len(rejected) - occupied} hors grille (non posés)"
+        self.preset_report.config(text=report, fg="red" if rejected else "green")
 
     # ---------------------- Gestion des items placés ----------------------
-    def set_switch_initialized(self, item):
-        if item in self.placed_items:
-            self.placed_items[item]['initialized'] = True
-
     def place_item(self, event):
+        """Clic gauche : saisit l'item sous le curseur (un bouton bascule), sinon pose l'item en main."""
+        cell = self.cell_under(event)
+        if cell is not None:
+            self.dragged_cell = cell
+            self.toggle_item_state(cell)
+            return
         if self.selected_item is not None:
-            x, y = event.x // self.grid_size, event.y // self.grid_size
-            color = self.items[self.selected_item]['color']
-            item = self.canvas.create_oval(
-                x * self.grid_size + 5, y * self.grid_size + 5,
-                (x + 1) * self.grid_size - 5, (y + 1) * self.grid_size - 5,
-                fill=color if self.selected_item != 0 else "gray",
-                tags='movable'
-            )
-            self.placed_items[item] = {
-                'id': self.selected_item,
-                'active': (self.selected_item == 1),
-                'position': (x, y),
-                'previous_state': False,
-                'initialized': False
-            }
-            self.position_index[(x, y)] = item
-            self.canvas.tag_bind(item, "<B1-Motion>", self.move_item)
-            if self.selected_item == 1:
-                self.canvas.tag_bind(item, "<Button-1>", self.toggle_item_state)
-            if self.selected_item == 2:
-                self.root.after(200, lambda: self.set_switch_initialized(item))
+            x, y = self.renderer.position_at(event.x, event.y)
+            self.grow_grid(x, y, x, y)
+            cell = self.sim.place_item(self.selected_item, x, y)
+            if cell is None:
+                return
+            self.renderer.add_cell(cell)
+            self.request_settle()
+            self.dragged_cell = cell
             self.update_status_bar()
 
     def move_item(self, event):
-        item = self.canvas.find_withtag(tk.CURRENT)
-        if item:
-            item_id = item[0]
-            if item_id not in self.placed_items:
-                print(f"Erreur : l'élément {item_id} n'existe pas")
-                return
-            old_pos = self.placed_items[item_id]['position']
-            x, y = event.x // self.grid_size, event.y // self.grid_size
-            new_pos = (x, y)
-            if self.position_index.get(old_pos) == item_id:
-                del self.position_index[old_pos]
-            self.position_index[new_pos] = item_id
-            self.placed_items[item_id]['position'] = new_pos
-            self.canvas.coords(
-                item_id,
-                x * self.grid_size + 5, y * self.grid_size + 5,
-                (x + 1) * self.grid_size - 5, (y + 1) * self.grid_size - 5
-            )
+        cell = self.dragged_cell
+        if cell is None:
+            return
+        x, y = self.renderer.position_at(event.x, event.y)
+        new_cell = self.sim.move_item(cell, x, y)
+        if new_cell is not None and new_cell != cell:
+            self.renderer.move_cell(cell, new_cell)
+            self.dragged_cell = new_cell
+            self.request_settle()
+
+    def end_drag(self, event):
+        self.dragged_cell = None
 
     def delete_item(self, event):
-        item = self.canvas.find_withtag(tk.CURRENT)
-        if item:
-            if item[0] in self.placed_items:
-                pos = self.placed_items[item[0]]['position']
-                if self.position_index.get(pos) == item[0]:
-                    del self.position_index[pos]
-                self.canvas.delete(item)
-                del self.placed_items[item[0]]
-
-    def toggle_item_state(self, event):
-        item = self.canvas.find_withtag(tk.CURRENT)
-        if item and item[0] in self.placed_items:
-            item_data = self.placed_items[item[0]]
-            item_id = item_data['id']
-            if item_id == 1:
-                item_data['active'] = not item_data['active']
-                new_color = self.items[item_id]['color'] if item_data['active'] else 'brown'
-                self.canvas.itemconfig(item[0], fill=new_color)
-
-    def update_switches(self):
-        switches = {item: data for item, data in self.placed_items.items() if data['id'] == 2}
-        for item, data in switches.items():
-            if item not in self.placed_items or not data.get('initialized', False):
-                continue
-            x, y = data['position']
-            left_pos = (x - 1, y)
-            left_item = None
-            if left_pos in self.position_index:
-                left_canvas_item = self.position_index[left_pos]
-                left_item = self.placed_items.get(left_canvas_item)
-            new_state = False if (left_item is not None and left_item.get('active', False)) else True
-            if data['active'] != new_state:
-                data['active'] = new_state
-                new_color = "orange" if new_state else "moccasin"
-                self.canvas.itemconfig(item, fill=new_color)
-
-    def update_cables(self):
-        cables = {item: data for item, data in self.placed_items.items() if data['id'] == 0}
-        cable_positions = {data['position'] for data in cables.values()}
-        active_sources = []
-        for item, data in self.placed_items.items():
-            if data.get('active', False) and data['id'] in (1, 2):
-                if data['id'] == 1:
-                    allowed_dirs = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-                elif data['id'] == 2:
-                    allowed_dirs = [(1, 0), (0, -1), (0, 1)]
-                active_sources.append((data['position'], allowed_dirs))
-        reachable = set()
-        frontier = deque()
-        for pos, allowed_dirs in active_sources:
-            x, y = pos
-            for dx, dy in allowed_dirs:
-                neighbor = (x + dx, y + dy)
-                if neighbor in cable_positions and neighbor not in reachable:
-                    reachable.add(neighbor)
-                    frontier.append(neighbor)
-        while frontier:
-            current = frontier.popleft()
-            cx, cy = current
-            for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-                neighbor = (cx + dx, cy + dy)
-                if neighbor in cable_positions and neighbor not in reachable:
-                    reachable.add(neighbor)
-                    frontier.append(neighbor)
-        for cable_item, cable_data in cables.items():
-            if cable_data['position'] in reachable:
-                if not cable_data['active']:
-                    cable_data['active'] = True
-                    self.canvas.itemconfig(cable_item, fill="lime")
-            else:
-                if cable_data['active']:
-                    cable_data['active'] = False
-                    self.canvas.itemconfig(cable_item, fill="forestgreen")
-
-    def update_leds(self):
-        for item, data in self.placed_items.items():
-            if data['id'] == 3:  # LED
-                x, y = data['position']
-                neighbors = [(x-1, y), (x+1, y), (x, y-1), (x, y+1)]
-                active = any((nx, ny) in self.position_index and 
-                             self.placed_items[self.position_index[(nx, ny)]].get('active', False)
-                             for nx, ny in neighbors)
-                if active and not data.get('active', False):
-                    data['active'] = True
-                    on_color = self.items[3].get('on_color', "yellow")
-                    self.canvas.itemconfig(item, fill=on_color)
-                elif not active and data.get('active', False):
-                    data['active'] = False
-                    self.canvas.itemconfig(item, fill="olive")
-                    
-    def update_comparators(self):
-        """Met à jour les comparateurs et applique les règles Redstone de Minecraft."""
-        for item, data in self.placed_items.items():
-            if data['id'] == 4:  # Comparateur
-                x, y = data['position']
-
-                # Définition des positions
-                back_pos = (x - 1, y)   # Arrière (Gauche en 2D)
-                front_pos = (x + 1, y)  # Avant (Droite en 2D)
-                left_pos = (x, y - 1)   # Gauche (Haut en 2D)
-                right_pos = (x, y + 1)  # Droite (Bas en 2D)
-
-                # Vérification des entrées
-                back_active = back_pos in self.position_index and self.placed_items[self.position_index[back_pos]].get('active', False)
-                left_active = left_pos in self.position_index and self.placed_items[self.position_index[left_pos]].get('active', False)
-                right_active = right_pos in self.position_index and self.placed_items[self.position_index[right_pos]].get('active', False)
-
-                # **Application des règles du comparateur**
-                if back_active and not (left_active or right_active):
-                    data['active'] = True  # Transmission du signal arrière
-                else:
-                    data['active'] = False  # Comparateur désactivé si une entrée latérale est active
-
-                # Propagation du signal vers l'avant (Droite)
-                if data['active'] and front_pos in self.position_index:
-                    forward_item = self.placed_items[self.position_index[front_pos]]
-                    if forward_item['id'] == 0:  # Si un câble est en sortie
-                        forward_item['active'] = True
-
-
-    def update_repeaters(self):
-        """Met à jour les répéteurs pour qu'ils prolongent un signal uniquement vers l'avant (droite)."""
-        for item, data in self.placed_items.items():
-            if data['id'] == 5:  # Répéteur
-                x, y = data['position']
-
-                # Position d'entrée (arrière) et de sortie (avant)
-                back_pos = (x - 1, y)  # Entrée arrière (gauche)
-                front_pos = (x + 1, y)  # Sortie avant (droite)
-
-                back_active = back_pos in self.position_index and self.placed_items[self.position_index[back_pos]].get('active', False)
-
-                # Si l'entrée arrière est active, le répéteur s'allume et envoie un signal vers l'avant
-                if back_active:
-                    data['active'] = True
-                    self.canvas.itemconfig(item, fill="blue")  # Répéteur activé
-
-                    # Propage le signal vers l'avant après un léger délai (100ms)
-                    self.root.after(100, lambda: self.propagate_repeater_signal(front_pos))
-                else:
-                    data['active'] = False
-                    self.canvas.itemconfig(item, fill="darkblue")  # Répéteur éteint
-        
-    def propagate_repeater_signal(self, front_pos):
-        """Propage le signal du répéteur à l'élément de sortie après un délai."""
-        if front_pos in self.position_index:
-            front_item = self.placed_items[self.position_index[front_pos]]
-
-            # Si c'est un câble, il devient actif
-            if front_item['id'] == 0:
-                front_item['active'] = True
-                self.canvas.itemconfig(self.position_index[front_pos], fill="green")
-
-            # Si c'est un autre répéteur, il est activé aussi
-            elif front_item['id'] == 5:
-                front_item['active'] = True
-                self.canvas.itemconfig(self.position_index[front_pos], fill="blue")
-
-            # Si c'est un switch ou une LED, ils s'activent aussi
-            elif front_item['id'] in [2, 3]:  
-                front_item['active'] = True
-                color = "orange" if front_item['id'] == 2 else "yellow"  # Switch ou LED
-                self.canvas.itemconfig(self.position_index[front_pos], fill=color)
+        cell = self.cell_under(event)
+        if cell is not None:
+            self.sim.delete_item(cell)
+            self.renderer.remove_cell(cell)
+            self.request_settle()
+            if cell == self.dragged_cell:
+                self.dragged_cell = None
+
+    def toggle_item_state(self, cell):
+        if self.sim.toggle_item_state(cell):
+            self.render_cells(self.sim.collect_changes())
+            self.request_settle()
 
     # ---------------------- Ajout d'items ----------------------
     def add_item(self):
@@ -0,0 +1,358 @@
+"""Compilation de la grille en netlist et évaluation topologique.
+
+Les items placés forment un petit réseau logique. La compilation en fait une
+netlist : chaque réseau de câbles devient un fil (OU de ses sources), chaque
+switch une porte NON, chaque LED une porte OU de ses voisines, chaque
+comparateur une porte « arrière ET NON (haut OU bas) » et chaque répéteur un
+tampon. Un groupe de LED adjacentes est un verrou : une fois allumées, elles se
+maintiennent mutuellement.
+
+La partie acyclique de la netlist est évaluée en une seule passe, dans l'ordre
+topologique : settle() écrit directement dans le moteur l'état stable que les
+ticks auraient atteint, au lieu de laisser le signal traverser une porte par
+tick. Restent simulés tick par tick, avec tout ce qui en dépend :
+
+- les boucles (horloges, bascules) ;
+- les switches en chauffe ;
+- les cases qu'un répéteur actif (ou, en mode séquentiel, un comparateur actif
+  devant un câble) force à l'état actif alors que leur règle les éteint.
+
+L'état stable est calculé sans les impulsions transitoires qu'un changement
+d'entrée provoque pendant les ticks : les signaux de répéteurs encore en route
+vers une case que la stabilisation éteint sont annulés, et un groupe de LED
+n'est allumé que si ses entrées le sont une fois le circuit stabilisé.
+"""
+from collections import deque
+
+from engine import TimingWheel, CABLE, BUTTON, SWITCH, LED, COMPARATOR, REPEATER, EMPTY, REPEATER_OUTPUT
+
+# Opérations des nœuds de la netlist
+CONSTANT = 0  # case vide : toujours inactive
+INPUT = 1  # bouton : état actuel
+OR = 2  # réseau de câbles, LED isolée, câble en sortie d'un comparateur ou d'un répéteur
+NOT = 3  # switch (entrée à gauche)
+COMPARE = 4  # comparateur : arrière ET NON (haut OU bas)
+BUFFER = 5  # répéteur (entrée à gauche)
+LATCH = 6  # groupe de LED adjacentes : OU de ses entrées et de son état actuel
+
+REPEATER_FRONTS = (CABLE, REPEATER, SWITCH, LED)  # Cases activées par la sortie d'un répéteur
+
+MAX_TRUTH_INPUTS = 24  # Nombre maximal de boutons d'une table de vérité (2**24 combinaisons)
+BLOCK_BITS = 16  # Une évaluation couvre au plus 2**16 combinaisons (entiers de 8 Ko par nœud)
+
+
+class Netlist:
+    """
+    Netlist compilée à partir de la disposition d'un moteur (Simulation ou NumpySimulation).
+    Elle ne dépend pas des états : elle reste valable tant que is_stale() est faux, quels que
+    soient les boutons basculés entre-temps.
+    """
+    def __init__(self, sim):
+        self.sim = sim
+        self.revision = sim.revision
+        self.ops = [CONSTANT]  # Le nœud 0 représente les cases vides
+        self.inputs = [()]  # nœuds lus par l'opération (arrière, haut, bas pour un comparateur)
+        self.cells = [[]]  # cellules du moteur qui portent la valeur du nœud
+        self.forcers = [()]  # nœuds qui peuvent forcer une de ces cellules à l'état actif
+        self.node_of = {}  # cellule -> nœud
+        self.compile()
+        self.order, self.cyclic = self.sort()
+
+    def is_stale(self):
+        """Vrai si la grille a été éditée (ou le mode de tick changé) depuis la compilation."""
+        return self.sim.revision != self.revision
+
+    # ---------------------- Compilation ----------------------
+    def add_node(self, op, cells):
+        node = len(self.ops)
+        self.ops.append(op)
+        self.inputs.append(())
+        self.cells.append(cells)
+        self.forcers.append(())
+        for cell in cells:
+            self.node_of[cell] = node
+        return node
+
+    def components(self, item_id):
+        """Composantes 4-connexes des cellules d'un type donné."""
+        sim = self.sim
+        kind, offsets = sim.kind, sim.offsets
+        seen = set()
+        for start in sim.cells_of_type(item_id):
+            if start in seen:
+                continue
+            seen.add(start)
+            component = [start]
+            frontier = deque([start])
+            while frontier:
+                current = frontier.popleft()
+                for offset in offsets:
+                    neighbor = current + offset
+                    if kind[neighbor] == item_id and neighbor not in seen:
+                        seen.add(neighbor)
+                        component.append(neighbor)
+                        frontier.append(neighbor)
+            yield component
+
+    def compile(self):
+        sim = self.sim
+        kind, offsets = sim.kind, sim.offsets
+        node_of = self.node_of
+        networks = {}  # nœud d'un réseau de câbles -> tous ses câbles
+        driven_networks = {}  # nœud d'un câble piloté -> nœud de son réseau
+
+        # Un nœud par réseau de câbles ; un câble piloté par la case à sa gauche a son propre nœud
+        for component in self.components(CABLE):
+            driven = [cable for cable in component if kind[cable - 1] in (COMPARATOR, REPEATER)]
+            network = self.add_node(OR, [cable for cable in component if cable not in driven])
+            networks[network] = component
+            for cable in driven:
+                driven_networks[self.add_node(OR, [cable])] = network
+        for component in self.components(LED):
+            self.add_node(OR if len(component) == 1 else LATCH, component)
+        for item_id, op in ((BUTTON, INPUT), (SWITCH, NOT), (COMPARATOR, COMPARE), (REPEATER, BUFFER)):
+            for cell in sim.cells_of_type(item_id):
+                self.add_node(op, [cell])
+
+        def node_at(cell):
+            return node_of.get(cell, 0)
+
+        for node in range(1, len(self.ops)):
+            op, cells = self.ops[node], self.cells[node]
+            if node in driven_networks:
+                # Câble piloté : en mode bufferisé, la phase câbles l'alimente avec son réseau
+                # si la case de gauche est active ; en mode séquentiel, elle ne fait que le forcer
+                cable = cells[0]
+                driver = node_at(cable - 1)
+                network = driven_networks[node]
+                self.inputs[node] = (network, driver) if sim.buffered else (network,)
+                if kind[cable - 1] == REPEATER or not sim.buffered:
+                    self.forcers[node] = (driver,)
+                continue
+            if node in networks:
+                # Réseau : sources actives (bouton, ou switch hors de sa gauche) au contact d'un câble
+                sources = set()
+                for cable in networks[node]:
+                    for offset in offsets:
+                        source = cable + offset
+                        if kind[source] == BUTTON or (kind[source] == SWITCH and offset != 1):
+                            sources.add(node_of[source])
+                self.inputs[node] = tuple(sorted(sources))
+            elif op == OR or op == LATCH:
+                members = set(cells)
+                self.inputs[node] = tuple(sorted({node_of[cell + offset] for cell in cells for offset in offsets
+                                                  if kind[cell + offset] != EMPTY and cell + offset not in members}))
+            elif op == NOT or op == BUFFER:
+                self.inputs[node] = (node_at(cells[0] - 1),)
+            elif op == COMPARE:
+                cell, stride = cells[0], sim.stride
+                self.inputs[node] = (node_at(cell - 1), node_at(cell - stride), node_at(cell + stride))
+            if op != INPUT:
+                forcers = {node_of[cell - 1] for cell in cells
+                           if kind[cell - 1] == REPEATER and kind[cell] in REPEATER_FRONTS}
+                self.forcers[node] = tuple(sorted(forcers))
+
+    def sort(self):
+        """
+        Ordre topologique (algorithme de Kahn) des nœuds qui ne dépendent d'aucune boucle.
+        Renvoie (ordre, nœuds restants) : les restants sont dans une boucle ou en aval d'une boucle.
+        """
+        count = len(self.ops)
+        dependents = [[] for _ in range(count)]
+        missing = [0] * count
+        for node in range(count):
+            dependencies = set(self.inputs[node]) | set(self.forcers[node])
+            missing[node] = len(dependencies)
+            for dependency in dependencies:
+                dependents[dependency].append(node)
+        order = [node for node in range(count) if not missing[node]]
+        position = 0
+        while position < len(order):
+            for dependent in dependents[order[position]]:
+                missing[dependent] -= 1
+                if not missing[dependent]:
+                    order.append(dependent)
+            position += 1
+        return order, [node for node in range(count) if missing[node]]
+
+    # ---------------------- Évaluation ----------------------
+    def propagate(self, mask=1, patterns=None):
+        """
+        Évalue la netlist dans l'ordre topologique sur plusieurs combinaisons d'entrées à la fois :
+        chaque valeur est un ensemble de bits (entier Python), un bit par combinaison, et mask a un
+        bit à 1 par combinaison. patterns impose les bits de certains boutons (nœud -> bits) ; les
+        autres nœuds d'entrée gardent leur état actuel. Renvoie (valeurs, inconnus), où inconnus
+        marque pour chaque nœud les combinaisons dans lesquelles il est laissé aux ticks.
+        """
+        sim = self.sim
+        active, initialized = sim.active, sim.initialized
+        ops, inputs, cells, forcers = self.ops, self.inputs, self.cells, self.forcers
+        patterns = patterns or {}
+        values = [0] * len(ops)
+        unknown = [mask] * len(ops)  # Les nœuds des boucles restent entièrement inconnus
+        for node in self.order:
+            sources = inputs[node]
+            lost = 0
+            for source in sources:
+                lost |= unknown[source]
+            op = ops[node]
+            if op == CONSTANT:
+                value = 0
+            elif op == INPUT:
+                value = patterns.get(node, mask if active[cells[node][0]] else 0)
+            elif op == OR:
+                value = 0
+                for source in sources:
+                    value |= values[source]
+            elif op == NOT:
+                cell = cells[node][0]
+                if initialized[cell]:
+                    value = mask ^ values[sources[0]]
+                elif cell in sim.warming:
+                    value, lost = 0, mask
+                else:
+                    value, lost = (mask if active[cell] else 0), 0  # Switch jamais initialisé : état figé
+            elif op == COMPARE:
+                back, up, down = sources
+                value = values[back] & ~(values[up] | values[down])
+            elif op == BUFFER:
+                value = values[sources[0]]
+            else:
+                value = mask if any(active[cell] for cell in cells[node]) else 0
+                for source in sources:
+                    value |= values[source]
+            # Une case forcée à l'état actif alors que sa règle l'éteint ne se stabilise pas
+            forced = 0
+            for forcer in forcers[node]:
+                forced |= values[forcer] | unknown[forcer]
+            values[node] = value
+            unknown[node] = lost | (forced & ~value & mask)
+        return values, unknown
+
+    def evaluate(self):
+        """
+        Évalue la netlist à partir de l'état actuel du moteur. Renvoie la valeur stable (0 ou 1)
+        de chaque nœud, ou None pour un nœud laissé aux ticks.
+        """
+        values, unknown = self.propagate()
+        return [None if lost else value for value, lost in zip(values, unknown)]
+
+    def settle(self):
+        """
+        Écrit dans le moteur l'état stable des nœuds évaluables et renvoie (cellules stabilisées,
+        cellules laissées aux ticks). Les cellules modifiées sont réévaluées au tick suivant et
+        renvoyées par collect_changes() comme tout autre changement.
+        """
+        sim = self.sim
+        active = sim.active
+        values = self.evaluate()
+        sim.inputs += 1  # État imposé de l'extérieur (voir cycles.py)
+        settled = remaining = 0
+        for node, value in enumerate(values):
+            cells = self.cells[node]
+            if value is None:
+                remaining += len(cells)
+                continue
+            settled += len(cells)
+            for cell in cells:
+                if active[cell] != value:
+                    sim.set_active(cell, value)
+        self.cancel_signals(values)
+        return settled, remaining
+
+    def cancel_signals(self, values):
+        """Annule les signaux de répéteurs en route vers une case que la stabilisation a éteinte."""
+        sim = self.sim
+        kind, node_of = sim.kind, self.node_of
+        kept, cancelled = [], False
+        for tick, action, arg in sim.pending_events():
+            if action == REPEATER_OUTPUT and kind[arg] in REPEATER_FRONTS and values[node_of[arg]] == 0:
+                cancelled = True
+            else:
+                kept.append((tick, action, arg))
+        if cancelled:
+            sim.events = TimingWheel(sim.events.current, sim.events.size)
+            for tick, action, arg in kept:
+                sim.events.schedule(tick, action, arg)
+
+    # ---------------------- Tables de vérité ----------------------
+    def truth_table(self, inputs=None, block_bits=BLOCK_BITS):
+        """
+        Table de vérité des LED sur toutes les combinaisons des boutons inputs (cellules ; par
+        défaut tous les boutons, dans l'ordre de la grille) : la combinaison k donne au bouton
+        inputs[i] l'état du bit i de k. Toutes les combinaisons sont évaluées en même temps, un bit
+        par combinaison, par blocs de 2**block_bits. Renvoie {cellule de LED: (bits, inconnus)} :
+        le bit k de bits est l'état stable de la LED pour la combinaison k, celui de inconnus
+        indique que la LED ne se stabilise pas (boucle, switch en chauffe) pour cette combinaison.
+        """
+        sim = self.sim
+        inputs = sorted(sim.cells_of_type(BUTTON)) if inputs is None else list(inputs)
+        if len(inputs) > MAX_TRUTH_INPUTS:
+            raise ValueError(f"Trop d'entrées pour une table de vérité : {len(inputs)} (maximum {MAX_TRUTH_INPUTS})")
+        if len(set(inputs)) != len(inputs) or any(sim.kind[cell] != BUTTON for cell in inputs):
+            raise ValueError("Les entrées d'une table de vérité doivent être des boutons distincts")
+        nodes = [self.node_of[cell] for cell in inputs]
+        leds = sorted(sim.cells_of_type(LED))
+        low = min(len(nodes), block_bits)
+        width = 1 << low
+        mask = (1 << width) - 1
+        low_patterns = {node: input_pattern(i, width) for i, node in enumerate(nodes[:low])}
+        blocks = {led: ([], []) for led in leds}
+        for block in range(1 << (len(nodes) - low)):
+            # Les entrées de poids fort sont constantes sur un bloc
+            patterns = dict(low_patterns)
+            for i, node in enumerate(nodes[low:]):
+                patterns[node] = mask if block >> i & 1 else 0
+            values, unknown = self.propagate(mask, patterns)
+            for led in leds:
+                node = self.node_of[led]
+                blocks[led][0].append(values[node])
+                blocks[led][1].append(unknown[node])
+        return {led: (join_blocks(bits, width), join_blocks(lost, width)) for led, (bits, lost) in blocks.items()}
+
+
+def input_pattern(i, width):
+    """Bits de l'entrée i sur width combinaisons : le bit k vaut le bit i de k."""
+    half = 1 << i
+    pattern = ((1 << half) - 1) << half  # Une période : half zéros puis half uns
+    length = 2 * half
+    while length < width:
+        pattern |= pattern << length
+        length *= 2
+    return pattern
+
+
+def join_blocks(blocks, width):
+    """Concatène des blocs de width bits (le premier bloc en poids faible)."""
+    if len(blocks) == 1:
+        return blocks[0]
+    if width % 8:
+        return sum(block << (i * width) for i, block in enumerate(blocks))
+    size = width // 8
+    return int.from_bytes(b''.join(block.to_bytes(size, 'little') for block in blocks), 'little')
+
+
+def format_truth_table(sim, inputs, tables, limit=256):
+    """
+    Met en forme une table de vérité (voir Netlist.truth_table) : une colonne par bouton puis
+    par LED, repérés par leur position, et une ligne par combinaison ('?' : ne se stabilise pas).
+    Au-delà de limit combinaisons, seul le nombre de combinaisons allumant chaque LED est donné.
+    """
+    leds = sorted(tables)
+    names = [f"B{sim.position(cell)}" for cell in inputs] + [f"L{sim.position(cell)}" for cell in leds]
+    combinations = 1 << len(inputs)
+    if combinations > limit:
+        lines = [f"{combinations} combinaisons de {len(inputs)} boutons"]
+        for led in leds:
+            bits, lost = tables[led]
+            lines.append(f"L{sim.position(led)} : allumée pour {bin(bits & ~lost).count('1')} combinaisons, "
+                         f"instable pour {bin(lost).count('1')}")
+        return '\n'.join(lines)
+    lines = [' '.join(names)]
+    for k in range(combinations):
+        row = [str(k >> i & 1) for i in range(len(inputs))]
+        for led in leds:
+            bits, lost = tables[led]
+            row.append('?' if lost >> k & 1 else str(bits >> k & 1))
+        lines.append(' '.join(value.center(len(name)) for value, name in zip(row, names)).rstrip())
+    return '\n'.join(lines)
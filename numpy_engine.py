@@ -0,0 +1,336 @@
+"""Moteur de simulation vectorisé avec NumPy, pour les grandes grilles denses.
+
+NumpySimulation partage les plans de Simulation (vues NumPy sans copie sur les
+bytearray) et calcule chaque phase d'un tick avec des opérations sur tableaux,
+en reproduisant exactement les règles de engine.py, y compris l'ordre de la
+grille (ligne par ligne) dans lequel les cellules d'une phase sont évaluées :
+
+- switches et répéteurs : une chaîne horizontale est résolue en une passe
+  (parité de la position dans la chaîne pour les switches, copie pour les répéteurs) ;
+- câbles : étiquetage des composantes connexes (scipy.ndimage.label si SciPy est
+  installé, sinon union-find vectorisé) puis OU des sources par composante ;
+- LED : fermeture du OU vers la droite et vers le bas jusqu'à stabilité ;
+- comparateurs : itération jusqu'au point fixe sur leurs dépendances arrière et haute.
+
+En mode bufferisé, chaque phase lit une copie de l'état du début du tick et ces
+résolutions de chaînes deviennent inutiles : une règle = une opération sur tableaux.
+
+NumPy est une dépendance optionnelle : seul ce module l'importe.
+"""
+from engine import (Simulation, CABLE, BUTTON, SWITCH, LED, COMPARATOR, REPEATER, EMPTY, PHASES, REPEATER_DELAY,
+                    REPEATER_OUTPUT)
+
+try:
+    import numpy as np
+except ImportError:  # NumPy est optionnel
+    np = None
+
+try:
+    from scipy import ndimage
+except ImportError:  # SciPy est optionnel, l'étiquetage se fait alors en NumPy pur
+    ndimage = None
+
+
+def label_components(mask, stride):
+    """
+    Étiquette les composantes 4-connexes d'un masque à plat (grille bordée de cases vides).
+    Renvoie pour chaque case la plus petite case de sa composante.
+    """
+    size = mask.size
+    if ndimage is not None:
+        labels, _ = ndimage.label(mask.reshape(-1, stride))
+        labels = labels.ravel()
+        cells = np.flatnonzero(mask)
+        # Représentant d'une étiquette : sa plus petite case (la première dans l'ordre à plat)
+        first = np.full(labels.max() + 1, size, dtype=np.int64)
+        np.minimum.at(first, labels[cells], cells)
+        parent = np.arange(size)
+        parent[cells] = first[labels[cells]]
+        return parent
+    parent = np.arange(size)
+    cells = np.flatnonzero(mask)
+    right = cells[mask[cells + 1]]
+    down = cells[mask[cells + stride]]
+    u = np.concatenate((right, down))
+    w = np.concatenate((right + 1, down + stride))
+    while u.size:
+        # Accrochage : chaque racine rejoint la plus petite racine voisine
+        pu, pw = parent[u], parent[w]
+        crossing = pu != pw
+        u, w, pu, pw = u[crossing], w[crossing], pu[crossing], pw[crossing]
+        if not u.size:
+            break
+        np.minimum.at(parent, np.maximum(pu, pw), np.minimum(pu, pw))
+        # Saut de pointeurs jusqu'à compression complète
+        while True:
+            grand = parent[parent]
+            if np.array_equal(grand, parent):
+                break
+            parent = grand
+    return parent
+
+
+def run_heads(cells):
+    """Pour des cases triées, renvoie l'indice de la tête de la chaîne horizontale de chaque case."""
+    starts = np.ones(cells.size, dtype=bool)
+    starts[1:] = cells[1:] != cells[:-1] + 1
+    head = np.maximum.accumulate(np.where(starts, np.arange(cells.size), 0))
+    return cells[head]
+
+
+class NumpySimulation(Simulation):
+    def __init__(self, rows=8, cols=8, buffered=False):
+        if np is None:
+            raise ImportError("NumpySimulation nécessite NumPy (pip install numpy)")
+        self.layout = None
+        self.baseline = None  # (cellules occupées, leurs états) au début des ticks non encore collectés
+        super().__init__(rows, cols, buffered)
+
+    def allocate(self, rows, cols):
+        super().allocate(rows, cols)
+        # Vues sans copie sur les plans du moteur
+        self.kind_np = np.frombuffer(self.kind, dtype=np.uint8)
+        self.active_np = np.frombuffer(self.active, dtype=np.uint8)
+        self.initialized_np = np.frombuffer(self.initialized, dtype=np.uint8)
+        self.layout = None
+        self.baseline = None
+
+    # ---------------------- Édition : seule la disposition est invalidée ----------------------
+    def attach(self, cell):
+        self.layout = None
+
+    def detach(self, cell):
+        self.kind[cell] = EMPTY
+        self.active[cell] = 0
+        self.initialized[cell] = 0
+        self.layout = None
+
+    def touch(self, cell):
+        pass  # Chaque tick recalcule toute la grille
+
+    def enqueue(self, cell, item_id):
+        pass
+
+    def feed_cables(self, cell, delta):
+        pass
+
+    def invalidate(self, item_ids=()):
+        pass
+
+    def add_macro(self, instance):
+        raise ValueError("Les macros ne sont pas prises en charge par NumpySimulation")
+
+    def rebuild(self):
+        self.revision += 1
+        self.count_types()
+        self.layout = None
+        self.baseline = None
+
+    @staticmethod
+    def event_cells(arg):
+        return np.atleast_1d(arg).tolist()
+
+    @staticmethod
+    def event_arg(arg, cells):
+        # Les sorties de répéteurs d'un tick sont un tableau, les fins de chauffe une seule cellule
+        return np.array(cells, dtype=np.int64) if isinstance(arg, np.ndarray) else cells[0]
+
+    def pending_events(self):
+        # Les sorties de répéteurs d'un tick forment un seul événement (tableau de cellules)
+        for tick, action, arg in super().pending_events():
+            for cell in np.atleast_1d(arg).tolist():
+                yield tick, action, cell
+
+    def build_layout(self):
+        """Précalcule les index par type et les composantes de câbles pour la disposition courante."""
+        kind, stride = self.kind_np, self.stride
+        layout = {item_id: np.flatnonzero(kind == item_id)
+                  for item_id in (CABLE, BUTTON, SWITCH, LED, COMPARATOR, REPEATER)}
+        layout['occupied'] = np.flatnonzero(kind != EMPTY)
+        cables = layout[CABLE]
+        roots = label_components(kind == CABLE, stride)[cables]
+        _, layout['cable_network'] = np.unique(roots, return_inverse=True)
+        layout['network_count'] = int(roots.size and layout['cable_network'].max() + 1)
+
+        # LED : chaînes horizontales (ordre à plat) et verticales (ordre colonne par colonne)
+        leds = layout[LED]
+        is_led = kind == LED
+        layout['led_left'] = is_led[leds - 1]
+        layout['led_up'] = is_led[leds - stride]
+        column_order = np.lexsort((leds // stride, leds % stride))
+        layout['led_columns'] = column_order
+        column_cells = leds[column_order]
+        vertical_starts = np.ones(leds.size, dtype=bool)
+        vertical_starts[1:] = column_cells[1:] != column_cells[:-1] + stride
+        layout['led_vertical_starts'] = vertical_starts
+        horizontal_starts = np.ones(leds.size, dtype=bool)
+        horizontal_starts[1:] = leds[1:] != leds[:-1] + 1
+        layout['led_horizontal_starts'] = horizontal_starts
+
+        # Comparateurs : position de chaque comparateur dans la liste, pour les dépendances
+        comparators = layout[COMPARATOR]
+        slot = np.full(kind.size, -1, dtype=np.int64)
+        slot[comparators] = np.arange(comparators.size)
+        is_cable = kind == CABLE
+        for name, offset in (('back', 1), ('up', stride)):
+            source = comparators - offset
+            layout[name + '_comparator'] = slot[source]
+            # Câble d'entrée forcé par le comparateur situé juste derrière lui
+            layout[name + '_forcing'] = np.where(is_cable[source], slot[source - 1], -1)
+        layout['comparator_front_cable'] = is_cable[comparators + 1]
+
+        layout['repeater_heads'] = run_heads(layout[REPEATER])
+        self.layout = layout
+
+    # ---------------------- Boucle de simulation ----------------------
+    def advance(self):
+        if self.layout is None:
+            self.build_layout()
+        if self.baseline is None:
+            # Seules les cases occupées sont comparées : le coût suit le nombre d'items, pas la taille
+            occupied = self.layout['occupied']
+            self.baseline = (occupied, self.active_np[occupied])
+        self.tick += 1
+        self.fire_due_events()
+        active = self.active_np
+        # En mode bufferisé, toutes les phases lisent l'état figé au début du tick
+        state = active.copy() if self.buffered else active
+        self.update_switches(state)
+        self.update_cables(state)
+        self.update_leds(state)
+        self.update_comparators(state)
+        self.update_repeaters(state)
+
+    def visited(self, phase, state):
+        # Les phases vectorisées évaluent toutes les cellules du type, sales ou non
+        return len(self.layout[PHASES[phase]])
+
+    def propagate_repeater_signals(self, front_cells):
+        fronts = np.concatenate([np.atleast_1d(cells) for cells in front_cells])
+        signals = fronts.size
+        fronts = fronts[np.isin(self.kind_np[fronts], (CABLE, REPEATER, SWITCH, LED))]
+        self.active_np[fronts] = 1
+        return signals
+
+    def collect_changes(self):
+        active = self.active_np
+        if self.baseline is None:
+            changed = set()
+        else:
+            occupied, before = self.baseline
+            changed = set(occupied[(active[occupied] != before) & (self.kind_np[occupied] != EMPTY)].tolist())
+            self.baseline = None
+        # Les modifications faites entre deux ticks (boutons) gardent leur état d'origine
+        for cell, before in self.changes.items():
+            if self.kind[cell] != EMPTY and active[cell] != before:
+                changed.add(cell)
+            else:
+                changed.discard(cell)
+        self.changes = {}
+        return changed
+
+    # ---------------------- Règles de propagation vectorisées ----------------------
+    def update_switches(self, state):
+        switches = self.layout[SWITCH]
+        switches = switches[self.initialized_np[switches] == 1]
+        if not switches.size:
+            return
+        if self.buffered:
+            self.active_np[switches] = 1 - state[switches - 1]
+            return
+        # Dans une chaîne de switches prêts, le k-ième vaut l'entrée de la chaîne inversée si k est pair
+        heads = run_heads(switches)
+        entry = self.active_np[heads - 1]
+        self.active_np[switches] = entry ^ (1 - (switches - heads) % 2).astype(np.uint8)
+
+    def update_cables(self, state):
+        cables = self.layout[CABLE]
+        if not cables.size:
+            return
+        kind, stride = self.kind_np, self.stride
+        buttons = (kind == BUTTON) & (state == 1)
+        switches = (kind == SWITCH) & (state == 1)
+        # Un switch alimente sa droite, son haut et son bas : le câble ne doit pas être à sa gauche
+        contact = (buttons[cables - 1] | buttons[cables + 1] | buttons[cables - stride] | buttons[cables + stride] |
+                   switches[cables - 1] | switches[cables - stride] | switches[cables + stride])
+        powered = np.zeros(self.layout['network_count'], dtype=bool)
+        powered[self.layout['cable_network'][contact]] = True
+        powered = powered[self.layout['cable_network']]
+        if self.buffered:
+            back = cables - 1
+            powered |= ((kind[back] == COMPARATOR) | (kind[back] == REPEATER)) & (state[back] == 1)
+        self.active_np[cables] = powered
+
+    def update_leds(self, state):
+        leds = self.layout[LED]
+        if not leds.size:
+            return
+        active, stride, layout = self.active_np, self.stride, self.layout
+        if self.buffered:
+            active[leds] = state[leds - 1] | state[leds + 1] | state[leds - stride] | state[leds + stride]
+            return
+        # Les LED à gauche et en haut sont déjà évaluées dans l'ordre de la grille : elles ne
+        # comptent qu'à travers la fermeture ci-dessous ; les autres voisins gardent leur valeur.
+        lit = ((active[leds - 1] & ~layout['led_left']) | (active[leds - stride] & ~layout['led_up']) |
+               active[leds + 1] | active[leds + stride]).astype(bool)
+        columns = layout['led_columns']
+        while True:
+            previous = lit
+            lit = self.spread(lit, layout['led_horizontal_starts'])
+            lit[columns] = self.spread(lit[columns], layout['led_vertical_starts'])
+            if np.array_equal(lit, previous):
+                break
+        active[leds] = lit
+
+    @staticmethod
+    def spread(lit, starts):
+        """Propage un état allumé vers la suite de sa chaîne (OU cumulé par segment)."""
+        positions = np.arange(lit.size)
+        segment_start = np.maximum.accumulate(np.where(starts, positions, 0))
+        last_lit = np.maximum.accumulate(np.where(lit, positions, -1))
+        return last_lit >= segment_start
+
+    def update_comparators(self, state):
+        comparators = self.layout[COMPARATOR]
+        if not comparators.size:
+            return
+        active, stride, layout = self.active_np, self.stride, self.layout
+        back_value = state[comparators - 1].astype(bool)
+        up_value = state[comparators - stride].astype(bool)
+        down_value = state[comparators + stride].astype(bool)
+        if self.buffered:
+            # Le câble de sortie est alimenté par la phase câbles du tick suivant
+            active[comparators] = back_value & ~(up_value | down_value)
+            return
+        # Les dépendances (comparateur ou câble forcé, à gauche ou au-dessus) sont toujours déjà
+        # évaluées dans l'ordre de la grille : on itère jusqu'au point fixe de ce système triangulaire.
+        state = active[comparators].astype(bool)
+        while True:
+            back = self.comparator_input(state, back_value, layout['back_comparator'], layout['back_forcing'])
+            up = self.comparator_input(state, up_value, layout['up_comparator'], layout['up_forcing'])
+            new_state = back & ~(up | down_value)
+            if np.array_equal(new_state, state):
+                break
+            state = new_state
+        active[comparators] = state
+        active[comparators[state & layout['comparator_front_cable']] + 1] = 1
+
+    @staticmethod
+    def comparator_input(state, value, comparator, forcing):
+        padded = np.append(state, False)  # l'index -1 désigne "aucun comparateur"
+        return np.where(comparator >= 0, padded[comparator], value | padded[forcing])
+
+    def update_repeaters(self, state):
+        repeaters = self.layout[REPEATER]
+        if not repeaters.size:
+            return
+        if self.buffered:
+            back_active = state[repeaters - 1]
+        else:
+            # Une chaîne de répéteurs recopie en une passe l'entrée de sa tête
+            back_active = state[self.layout['repeater_heads'] - 1]
+        self.active_np[repeaters] = back_active
+        fronts = repeaters[back_active == 1] + 1
+        if fronts.size:
+            # Un seul événement par tick pour toutes les sorties de répéteurs
+            self.schedule(REPEATER_DELAY, REPEATER_OUTPUT, fronts)
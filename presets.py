@@ -0,0 +1,122 @@
+"""Schémas préconfigurés (portes logiques) et pose en lot sur la grille du moteur.
+
+Un schéma est une liste de (type d'item, x relatif, y relatif). stamp() le pose
+en mosaïque (count_x x count_y copies espacées d'un pas donné) en une seule
+passe sur le moteur, sans dépendance à tkinter : les cases déjà occupées ne
+sont jamais écrasées mais signalées.
+"""
+from engine import CABLE, BUTTON, SWITCH, LED
+
+PRESETS = {
+    "Porte AND": [
+        (BUTTON, 0, 0),  # Bouton (entrée supérieure)
+        (SWITCH, 1, 0),  # Switch à droite du bouton supérieur
+        (BUTTON, 0, 2),  # Bouton (entrée inférieure)
+        (SWITCH, 1, 2),  # Switch à droite du bouton inférieur
+        (CABLE, 1, 1),  # Cable reliant les deux entrées
+        (SWITCH, 2, 1),  # Switch de traitement
+        (LED, 3, 1)  # LED en sortie
+    ],
+    "Porte OR": [
+        (BUTTON, 0, 0),
+        (BUTTON, 0, 1),
+        (CABLE, 1, 0),
+        (CABLE, 1, 1),
+        (LED, 2, 0)
+    ],
+    "Porte NAND": [
+        (BUTTON, 0, 0),
+        (SWITCH, 1, 0),
+        (BUTTON, 0, 2),
+        (SWITCH, 1, 2),
+        (CABLE, 1, 1),
+        (LED, 2, 1)
+    ],
+    "Porte NOR": [
+        (BUTTON, 0, 0),
+        (CABLE, 1, 0),
+        (BUTTON, 0, 1),
+        (CABLE, 1, 1),
+        (SWITCH, 2, 0),
+        (LED, 3, 0)
+    ],
+    "Porte NOT": [
+        (BUTTON, 0, 0),
+        (SWITCH, 1, 0),
+        (LED, 2, 0)
+    ],
+    "Porte XOR": [
+        (BUTTON, 0, 0),
+        (SWITCH, 1, 0),
+        (SWITCH, 2, 0),
+        (CABLE, 3, 0),
+        (SWITCH, 4, 0),
+        (CABLE, 5, 0),
+        (CABLE, 2, 1),
+        (SWITCH, 3, 1),
+        (CABLE, 5, 1),
+        (LED, 6, 1),
+        (BUTTON, 0, 2),
+        (SWITCH, 1, 2),
+        (SWITCH, 2, 2),
+        (CABLE, 3, 2),
+        (SWITCH, 4, 2),
+        (CABLE, 5, 2)
+    ],
+    "Porte XNOR": [
+        (BUTTON, 0, 0),
+        (SWITCH, 1, 0),
+        (SWITCH, 2, 0),
+        (CABLE, 3, 0),
+        (SWITCH, 4, 0),
+        (CABLE, 5, 0),
+        (CABLE, 2, 1),
+        (SWITCH, 3, 1),
+        (CABLE, 5, 1),
+        (BUTTON, 0, 2),
+        (SWITCH, 1, 2),
+        (SWITCH, 2, 2),
+        (CABLE, 3, 2),
+        (SWITCH, 4, 2),
+        (CABLE, 5, 2),
+        (SWITCH, 6, 1),  # Inverse la sortie du XOR
+        (LED, 7, 1)
+    ],
+}
+
+
+def schema_size(schema):
+    """Renvoie (largeur, hauteur) du rectangle occupé par un schéma."""
+    return (max(x for _, x, _ in schema) + 1, max(y for _, _, y in schema) + 1) if schema else (0, 0)
+
+
+def tile_placements(schema, offset_x=0, offset_y=0, count_x=1, count_y=1, stride_x=None, stride_y=None):
+    """
+    Liste les (type d'item, x, y) d'un schéma répété count_x x count_y fois à partir de
+    (offset_x, offset_y). Le pas par défaut laisse une case vide entre deux copies, pour
+    qu'elles ne soient pas reliées électriquement.
+    """
+    width, height = schema_size(schema)
+    stride_x = width + 1 if stride_x is None else stride_x
+    stride_y = height + 1 if stride_y is None else stride_y
+    return [(item_id, offset_x + i * stride_x + x, offset_y + j * stride_y + y)
+            for j in range(count_y) for i in range(count_x) for item_id, x, y in schema]
+
+
+def tile_bounds(schema, offset_x=0, offset_y=0, count_x=1, count_y=1, stride_x=None, stride_y=None):
+    """Rectangle (x0, y0, x1, y1) couvert par la mosaïque de tile_placements, bords inclus."""
+    width, height = schema_size(schema)
+    stride_x = width + 1 if stride_x is None else stride_x
+    stride_y = height + 1 if stride_y is None else stride_y
+    xs = (offset_x, offset_x + (count_x - 1) * stride_x)
+    ys = (offset_y, offset_y + (count_y - 1) * stride_y)
+    return min(xs), min(ys), max(xs) + width - 1, max(ys) + height - 1
+
+
+def stamp(sim, schema, offset_x=0, offset_y=0, count_x=1, count_y=1, stride_x=None, stride_y=None, atomic=False):
+    """
+    Pose un schéma en mosaïque sur le moteur et renvoie (cellules créées, refus), voir
+    Simulation.place_items. Avec atomic=True, rien n'est posé si une case est refusée.
+    """
+    placements = tile_placements(schema, offset_x, offset_y, count_x, count_y, stride_x, stride_y)
+    return sim.place_items(placements, atomic)
@@ -0,0 +1,178 @@
+"""Profilage des ticks du moteur, sans dépendance à tkinter.
+
+Le profileur remplace, sur une instance du moteur, la méthode de chaque phase
+du tick par une version chronométrée. Chaque tick produit un enregistrement :
+durée totale, durée et nombre de cellules évaluées par phase, nombre et durée
+des événements temporisés déclenchés (chauffe des switches, signaux des
+répéteurs, sorties des macros) et durée de la collecte des changements.
+L'interface y ajoute la durée de sa boucle et le nombre d'ovales reconfigurés
+(itemconfig) par la frame suivante.
+
+Les derniers enregistrements sont gardés dans un tampon circulaire : le
+profileur peut rester actif en permanence et, quand une grille saccade, on
+écrit le tampon dans un fichier JSON (dump) pour voir quelle phase est en
+cause. Un tick dont la durée dépasse le budget (l'intervalle de la boucle de
+l'interface) est marqué en dépassement.
+"""
+import json
+import time
+from collections import deque
+
+PHASE_NAMES = ('switches', 'cables', 'leds', 'comparators', 'repeaters')  # Ordre des phases du moteur
+DEFAULT_CAPACITY = 600  # Ticks gardés dans le tampon : une minute à 100 ms par tick
+FORMAT_VERSION = 1
+
+
+class TickProfiler:
+    def __init__(self, capacity=DEFAULT_CAPACITY, budget=None):
+        self.records = deque(maxlen=capacity)  # Tampon circulaire des derniers ticks
+        self.budget = budget  # Durée maximale d'un tick en secondes (None : pas de dépassement)
+        self.sim = None
+        self.current = None  # Enregistrement du dernier tick calculé
+        self.unfinished = None  # Enregistrement en attente de la durée mesurée par l'interface (end_tick)
+        self.ticks = 0  # Ticks profilés depuis la création, y compris ceux sortis du tampon
+        self.overruns = 0
+        self.totals = dict.fromkeys(PHASE_NAMES + ('events', 'collect'), 0.0)  # Cumul en secondes
+
+    # ---------------------- Instrumentation du moteur ----------------------
+    def attach(self, sim):
+        """Chronomètre les phases de sim (les méthodes sont remplacées sur l'instance)."""
+        self.detach()
+        self.sim = sim
+        for phase, name in enumerate(PHASE_NAMES):
+            setattr(sim, 'update_' + name, self.timed_phase(phase, getattr(sim, 'update_' + name)))
+        sim.fire_due_events = self.timed_events(sim.fire_due_events)
+        sim.collect_changes = self.timed_collect(sim.collect_changes)
+        sim.advance = self.timed_tick(sim.advance)
+
+    def detach(self):
+        """Rend au moteur ses méthodes d'origine."""
+        if self.sim is None:
+            return
+        for name in [f'update_{name}' for name in PHASE_NAMES] + ['fire_due_events', 'collect_changes', 'advance']:
+            self.sim.__dict__.pop(name, None)
+        self.sim = None
+
+    def timed_tick(self, advance):
+        def wrapper():
+            self.current = self.unfinished = record = new_record(self.sim.tick + 1)
+            start = time.perf_counter()
+            advance()
+            record['seconds'] += time.perf_counter() - start
+            self.records.append(record)
+            self.ticks += 1
+        return wrapper
+
+    def timed_phase(self, phase, update):
+        name = PHASE_NAMES[phase]
+
+        def wrapper(cells):
+            visited = self.sim.visited(phase, cells)
+            start = time.perf_counter()
+            result = update(cells)
+            seconds = time.perf_counter() - start
+            record = self.current
+            record['phases'][name] += seconds
+            record['cells'][name] += visited
+            self.totals[name] += seconds
+            return result
+        return wrapper
+
+    def timed_events(self, fire_due_events):
+        def wrapper():
+            start = time.perf_counter()
+            fired = fire_due_events()
+            seconds = time.perf_counter() - start
+            self.current['events'] += fired
+            self.current['events_seconds'] += seconds
+            self.totals['events'] += seconds
+            return fired
+        return wrapper
+
+    def timed_collect(self, collect_changes):
+        def wrapper():
+            start = time.perf_counter()
+            changed = collect_changes()
+            seconds = time.perf_counter() - start
+            if self.current is not None:
+                self.current['collect_seconds'] += seconds
+                self.current['seconds'] += seconds
+            self.totals['collect'] += seconds
+            return changed
+        return wrapper
+
+    # ---------------------- Mesures de l'interface ----------------------
+    def end_tick(self, seconds):
+        """
+        Remplace la durée du dernier tick par celle mesurée par la boucle qui l'a lancé (stabilisation
+        et préparation du rendu comprises) et renvoie l'enregistrement s'il dépasse le budget, sinon None.
+        Sans tick calculé depuis le dernier appel (tick sauté, voir cycles.py), il n'y a rien à mesurer.
+        """
+        record, self.unfinished = self.unfinished, None
+        if record is None:
+            return None
+        record['seconds'] = seconds
+        if self.budget is not None and seconds > self.budget:
+            record['overrun'] = True
+            self.overruns += 1
+            return record
+        return None
+
+    def record_frame(self, redrawn, seconds):
+        """Attribue une frame dessinée (ovales reconfigurés, durée) au dernier tick calculé."""
+        if self.current is not None:
+            self.current['redrawn'] += redrawn
+            self.current['draw_seconds'] += seconds
+
+    # ---------------------- Lecture et export ----------------------
+    def clear(self):
+        self.records.clear()
+        self.current = self.unfinished = None
+        self.ticks = self.overruns = 0
+        self.totals = dict.fromkeys(self.totals, 0.0)
+
+    def summary(self):
+        """Moyenne et maximum, sur le tampon, de la durée de chaque phase et du tick entier (secondes)."""
+        records = self.records
+        if not records:
+            return {}
+        columns = {name: [record['phases'][name] for record in records] for name in PHASE_NAMES}
+        columns['events'] = [record['events_seconds'] for record in records]
+        columns['collect'] = [record['collect_seconds'] for record in records]
+        columns['draw'] = [record['draw_seconds'] for record in records]
+        columns['tick'] = [record['seconds'] for record in records]
+        return {name: {'mean': sum(values) / len(values), 'max': max(values)} for name, values in columns.items()}
+
+    def dump(self, path):
+        """Écrit le tampon et son résumé dans un fichier JSON."""
+        report = {
+            'format': FORMAT_VERSION,
+            'budget': self.budget,
+            'ticks': self.ticks,
+            'overruns': self.overruns,
+            'summary': self.summary(),
+            'records': list(self.records),
+        }
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=1)
+
+
+def new_record(tick):
+    return {
+        'tick': tick,
+        'seconds': 0.0,
+        'phases': dict.fromkeys(PHASE_NAMES, 0.0),
+        'cells': dict.fromkeys(PHASE_NAMES, 0),  # Cellules évaluées par phase
+        'events': 0,  # Événements temporisés déclenchés
+        'events_seconds': 0.0,
+        'collect_seconds': 0.0,
+        'redrawn': 0,  # Ovales reconfigurés (itemconfig) par la frame qui suit le tick
+        'draw_seconds': 0.0,
+        'overrun': False,
+    }
+
+
+def slowest_phase(record):
+    """Nom et durée de la phase la plus lente d'un enregistrement."""
+    name = max(PHASE_NAMES, key=record['phases'].get)
+    return name, record['phases'][name]
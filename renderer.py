@@ -0,0 +1,248 @@
+"""Rendu des cellules du moteur sur le canvas tkinter.
+
+Le rendu est séparé de la simulation : le moteur signale à chaque tick les
+cellules modifiées, le renderer les accumule et les dessine en un seul lot par
+frame. Il mémorise la couleur affichée de chaque ovale et ne reconfigure que
+ceux dont la couleur change réellement ; quand plusieurs ticks s'écoulent entre
+deux frames, les basculements intermédiaires sont ignorés et seule la couleur
+finale est dessinée.
+
+Le canvas n'affiche qu'une fenêtre de la grille (défilement et zoom) : seules
+les cellules visibles ont un ovale et seules les lignes visibles sont tracées.
+Quand les cases deviennent trop petites, la fenêtre passe en vue d'ensemble :
+une seule image où chaque case est un bloc de pixels de la couleur de son item
+(ou, en dessous d'un pixel par case, où chaque pixel montre une case sur
+sampling). Le moteur, lui, simule toujours toute la grille.
+"""
+import tkinter as tk
+
+from engine import EMPTY
+
+BACKGROUND = 'white'
+PROBE_OUTLINE = 'red'  # Contour des cases sondées (voir waveform.py)
+OVERVIEW_CELL_SIZE = 6  # En dessous de cette taille de case (pixels), vue d'ensemble
+OVERVIEW_REPAINT_LIMIT = 4096  # Au-delà de ce nombre de cases modifiées, l'image est refaite en entier
+
+
+class CanvasRenderer:
+    def __init__(self, canvas, sim, color_for, cell_size=50, width=400, height=400):
+        self.canvas = canvas
+        self.sim = sim
+        self.color_for = color_for  # (type d'item, état actif) -> couleur à afficher
+        self.cell_size = cell_size  # Taille d'une case en pixels (niveau de zoom)
+        self.sampling = 1  # Vue d'ensemble très réduite : nombre de cases par pixel
+        self.width = width  # Taille de la fenêtre d'affichage en pixels
+        self.height = height
+        self.view_x = 0  # Première colonne visible
+        self.view_y = 0  # Première ligne visible
+        self.shapes = {}  # cellule du moteur -> id canvas (cellules visibles uniquement)
+        self.drawn = {}  # id canvas -> couleur actuellement affichée
+        self.pending = set()  # cellules modifiées depuis la dernière frame
+        self.overview = None  # Image de la vue d'ensemble (PhotoImage), None en vue détaillée
+        self.outlined = set()  # Positions (x, y) dont l'ovale est cerclé de PROBE_OUTLINE (sondes)
+
+    # ---------------------- Fenêtre d'affichage ----------------------
+    def is_overview(self):
+        return self.cell_size < OVERVIEW_CELL_SIZE
+
+    def scale(self):
+        """Taille d'une case en pixels, éventuellement inférieure à 1."""
+        return self.cell_size / self.sampling
+
+    def cells_across(self, pixels):
+        """Nombre de cases (même partiellement) couvertes par une longueur en pixels."""
+        return -(-pixels * self.sampling // self.cell_size)
+
+    def visible_range(self):
+        """Renvoie (x0, y0, x1, y1) : colonnes x0..x1-1 et lignes y0..y1-1 visibles."""
+        x1 = min(self.sim.cols, self.view_x + self.cells_across(self.width))
+        y1 = min(self.sim.rows, self.view_y + self.cells_across(self.height))
+        return self.view_x, self.view_y, x1, y1
+
+    def is_visible(self, x, y):
+        x0, y0, x1, y1 = self.visible_range()
+        return x0 <= x < x1 and y0 <= y < y1
+
+    def position_at(self, px, py):
+        """Position de grille (éventuellement hors grille) sous le pixel (px, py) du canvas."""
+        return (self.view_x + int(px) * self.sampling // self.cell_size,
+                self.view_y + int(py) * self.sampling // self.cell_size)
+
+    def cell_bbox(self, x, y):
+        size = self.cell_size
+        margin = size // 10
+        left, top = (x - self.view_x) * size, (y - self.view_y) * size
+        return left + margin, top + margin, left + size - margin, top + size - margin
+
+    def clamp_view(self):
+        # La dernière colonne (ligne) pleinement visible ne dépasse pas le bord de la grille
+        full_x = max(1, self.width * self.sampling // self.cell_size)
+        full_y = max(1, self.height * self.sampling // self.cell_size)
+        self.view_x = max(0, min(self.view_x, self.sim.cols - full_x))
+        self.view_y = max(0, min(self.view_y, self.sim.rows - full_y))
+
+    def scroll_to(self, x, y):
+        """Place la case (x, y) en haut à gauche de la fenêtre."""
+        self.view_x, self.view_y = x, y
+        self.clamp_view()
+        self.redraw()
+
+    def set_scale(self, scale):
+        if scale >= 1:
+            self.cell_size, self.sampling = max(1, round(scale)), 1
+        else:
+            self.cell_size, self.sampling = 1, max(1, round(1 / scale))
+
+    def zoom(self, scale, px=0, py=0):
+        """Change la taille des cases (en pixels, < 1 possible) en gardant sous le pixel (px, py) la même case."""
+        x, y = self.position_at(px, py)
+        self.set_scale(scale)
+        self.view_x = x - int(px) * self.sampling // self.cell_size
+        self.view_y = y - int(py) * self.sampling // self.cell_size
+        self.clamp_view()
+        self.redraw()
+
+    def resize(self, width, height):
+        self.width, self.height = max(1, width), max(1, height)
+        self.clamp_view()
+        self.redraw()
+
+    # ---------------------- Dessin complet de la fenêtre ----------------------
+    def redraw(self):
+        """Recrée les objets canvas de la partie visible de la grille."""
+        self.canvas.delete("all")
+        self.shapes.clear()
+        self.drawn.clear()
+        self.pending.clear()
+        self.overview = None
+        if self.is_overview():
+            self.draw_overview()
+            return
+        x0, y0, x1, y1 = self.visible_range()
+        size = self.cell_size
+        right, bottom = (x1 - x0) * size, (y1 - y0) * size
+        for i in range(x1 - x0 + 1):
+            self.canvas.create_line(i * size, 0, i * size, bottom, tags="grid_line")
+        for j in range(y1 - y0 + 1):
+            self.canvas.create_line(0, j * size, right, j * size, tags="grid_line")
+        kind, index = self.sim.kind, self.sim.index
+        for y in range(y0, y1):
+            start = index(x0, y)
+            for cell in range(start, start + x1 - x0):
+                if kind[cell] != EMPTY:
+                    self.create_shape(cell)
+
+    def draw_overview(self):
+        x0, y0, x1, y1 = self.visible_range()
+        size, sampling = self.cell_size, self.sampling
+        columns, lines = -(-(x1 - x0) // sampling), -(-(y1 - y0) // sampling)
+        image = tk.PhotoImage(width=max(1, columns * size), height=max(1, lines * size))
+        palette = {}
+        rows = []
+        kind, active, index = self.sim.kind, self.sim.active, self.sim.index
+        for y in range(y0, y1, sampling):
+            start = index(x0, y)
+            pixels = []
+            for cell in range(start, start + x1 - x0, sampling):
+                key = (kind[cell], active[cell])
+                block = palette.get(key)
+                if block is None:
+                    block = palette[key] = ' '.join([self.color_of(cell)] * size)
+                pixels.append(block)
+            rows.extend(['{' + ' '.join(pixels) + '}'] * size)
+        if rows:
+            image.put(' '.join(rows), to=(0, 0))
+        self.canvas.create_image(0, 0, image=image, anchor='nw')
+        self.overview = image  # Garder une référence, sinon tkinter libère l'image
+
+    # ---------------------- Cellules ----------------------
+    def color_of(self, cell):
+        item_id = self.sim.kind[cell]
+        return BACKGROUND if item_id == EMPTY else self.color_for(item_id, self.sim.active[cell])
+
+    def create_shape(self, cell):
+        color = self.color_of(cell)
+        position = self.sim.position(cell)
+        outline = {'outline': PROBE_OUTLINE, 'width': 3} if position in self.outlined else {}
+        shape = self.canvas.create_oval(*self.cell_bbox(*position), fill=color, tags='cell', **outline)
+        self.shapes[cell] = shape
+        self.drawn[shape] = color
+
+    def paint_overview(self, cell):
+        x, y = self.sim.position(cell)
+        dx, dy, sampling = x - self.view_x, y - self.view_y, self.sampling
+        if dx % sampling or dy % sampling:
+            return  # Case non échantillonnée dans la vue très réduite
+        size = self.cell_size
+        left, top = dx // sampling * size, dy // sampling * size
+        self.overview.put(self.color_of(cell), to=(left, top, left + size, top + size))
+
+    def add_cell(self, cell):
+        """Affiche une cellule qui vient d'être posée, si elle est visible."""
+        if not self.is_visible(*self.sim.position(cell)):
+            return
+        if self.overview is not None:
+            self.paint_overview(cell)
+        elif cell not in self.shapes:
+            self.create_shape(cell)
+
+    def add_cells(self, cells):
+        """Affiche un lot de cellules posées (un seul redessin de la vue d'ensemble s'il est gros)."""
+        if self.overview is not None and len(cells) > OVERVIEW_REPAINT_LIMIT:
+            self.redraw()
+            return
+        for cell in cells:
+            self.add_cell(cell)
+
+    def remove_cell(self, cell):
+        """Efface une cellule supprimée (ou l'ancienne case d'une cellule déplacée)."""
+        self.pending.discard(cell)
+        shape = self.shapes.pop(cell, None)
+        if shape is not None:
+            del self.drawn[shape]
+            self.canvas.delete(shape)
+        elif self.overview is not None and self.is_visible(*self.sim.position(cell)):
+            self.paint_overview(cell)
+
+    def move_cell(self, cell, new_cell):
+        self.remove_cell(cell)
+        self.add_cell(new_cell)
+
+    # ---------------------- Frames ----------------------
+    def mark(self, cells):
+        """Ajoute les cellules modifiées par un tick à la prochaine frame."""
+        self.pending.update(cells)
+
+    def flush(self):
+        """Dessine la frame : ne reconfigure que les ovales dont la couleur a changé."""
+        if self.overview is not None:
+            return self.flush_overview()
+        shapes, drawn, canvas = self.shapes, self.drawn, self.canvas
+        redrawn = 0
+        for cell in self.pending:
+            shape = shapes.get(cell)
+            if shape is None:
+                continue  # Cellule hors de la fenêtre
+            color = self.color_of(cell)
+            if drawn[shape] != color:
+                drawn[shape] = color
+                canvas.itemconfig(shape, fill=color)
+                redrawn += 1
+        self.pending.clear()
+        return redrawn
+
+    def flush_overview(self):
+        x0, y0, x1, y1 = self.visible_range()
+        position = self.sim.position
+        visible = []
+        for cell in self.pending:
+            x, y = position(cell)
+            if x0 <= x < x1 and y0 <= y < y1:
+                visible.append(cell)
+        self.pending.clear()
+        if len(visible) > OVERVIEW_REPAINT_LIMIT:
+            self.redraw()
+        else:
+            for cell in visible:
+                self.paint_overview(cell)
+        return len(visible)
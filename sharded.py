@@ -0,0 +1,416 @@
+"""Simulation d'une grande grille découpée en régions calculées en parallèle.
+
+La grille est partagée en régions rectangulaires, une par processus de calcul
+(multiprocessing). Chaque processus fait tourner le moteur de engine.py sur sa
+région entourée d'un halo : les cases des régions voisines que ses règles
+lisent. Seul le mode bufferisé se découpe ainsi : un tick n'y lit que l'état
+figé au début du tick, si bien qu'une région n'a besoin de ses voisines qu'une
+fois par tick, et non au fil des phases.
+
+À chaque tick, après les événements temporisés et avant les phases, chaque
+région écrit l'état de sa bande de bord dans un plan d'états en mémoire
+partagée, puis relit son halo dans ce même plan : seules ces cases circulent
+entre processus. Le halo a deux colonnes de large, car un répéteur de la
+première colonne lit la seconde pour programmer le signal qui entre dans la
+région ; une ligne suffit en haut et en bas.
+
+Un réseau de câbles qui traverse une frontière n'est vu qu'en morceaux par
+chaque région. Un câble est alimenté si son réseau touche une source active
+n'importe où : chaque région publie, pour les réseaux partagés, si son
+morceau touche une source, et chacune applique le OU de toutes les régions.
+
+Le résultat est identique, tick pour tick, à celui d'un seul processus
+(Simulation avec buffered=True) ; les macros ne sont pas prises en charge.
+"""
+import multiprocessing
+import os
+import traceback
+from multiprocessing import shared_memory
+
+from engine import Simulation, TimingWheel, CABLE, BUTTON, PHASES, CABLE_PHASE
+
+HALO_X = 2  # Colonnes de halo à gauche et à droite d'une région
+HALO_Y = 1  # Lignes de halo en haut et en bas
+
+
+# ---------------------- Découpage de la grille ----------------------
+def partition(rows, cols, count):
+    """
+    Découpe une grille rows x cols en count régions rectangulaires (x0, y0, x1, y1), bornes comprises.
+    Parmi les découpages en colonnes x lignes, garde celui qui échange le moins de cases par tick.
+    """
+    best = None
+    for shards_y in range(1, count + 1):
+        shards_x, remainder = divmod(count, shards_y)
+        if remainder or shards_x > cols or shards_y > rows:
+            continue
+        exchanged = (shards_x - 1) * rows * HALO_X + (shards_y - 1) * cols * HALO_Y
+        if best is None or exchanged < best[0]:
+            best = (exchanged, shards_x, shards_y)
+    if best is None:
+        raise ValueError(f"Impossible de découper une grille {cols} x {rows} en {count} régions")
+    _, shards_x, shards_y = best
+    return [(x0, y0, x1, y1) for y0, y1 in split(rows, shards_y) for x0, x1 in split(cols, shards_x)]
+
+
+def split(size, count):
+    """Bornes (début, fin comprise) de count intervalles de tailles égales à une case près."""
+    return [(size * i // count, size * (i + 1) // count - 1) for i in range(count)]
+
+
+def halo_window(region, rows, cols):
+    """Région agrandie de son halo, limitée à la grille."""
+    x0, y0, x1, y1 = region
+    return max(0, x0 - HALO_X), max(0, y0 - HALO_Y), min(cols - 1, x1 + HALO_X), min(rows - 1, y1 + HALO_Y)
+
+
+def merge_runs(runs):
+    """Fusionne des intervalles [a, b] qui se chevauchent ou se touchent."""
+    merged = []
+    for a, b in sorted(runs):
+        if merged and a <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], b)
+        else:
+            merged.append([a, b])
+    return merged
+
+
+# ---------------------- Processus de calcul ----------------------
+class Shard(Simulation):
+    """Moteur d'une région et de son halo, dans un processus de calcul."""
+    def __init__(self, spec, barrier, plane, flags):
+        wx0, wy0, wx1, wy1 = self.window = spec['window']
+        super().__init__(wy1 - wy0 + 1, wx1 - wx0 + 1, buffered=True)
+        self.region = spec['region']
+        self.global_stride = spec['stride']
+        self.barrier = barrier
+        self.plane = plane  # Plan d'états de toute la grille (mémoire partagée)
+        self.flags = flags  # Par région et par réseau partagé : 1 si le morceau local touche une source active
+        width = self.cols
+        for row in range(self.rows):
+            start = self.index(0, row)
+            for name in ('kind', 'active', 'initialized'):
+                getattr(self, name)[start:start + width] = spec[name][row * width:(row + 1) * width]
+        self.rebuild()
+        self.tick = spec['tick']
+        self.events = TimingWheel(self.tick)
+        for tick, action, cell in spec['events']:
+            self.events.schedule(tick, action, self.local(cell))
+        self.warming = {self.local(cell): tick for cell, tick in spec['warming']}
+        self.dirty = [{self.local(cell) for cell in cells} for cells in spec['dirty']]
+        self.dirty[CABLE_PHASE].update(self.network_state)  # Réseaux recréés par rebuild : à rafraîchir
+        self.changes = {}
+        # Segments (début dans le plan partagé, début local, longueur) échangés à chaque tick
+        self.outgoing = [(start, self.local(start), length) for start, length in spec['outgoing']]
+        self.incoming = [(start, self.local(start), length) for start, length in spec['incoming']]
+        # Réseaux partagés : (case de ce processus dans flags, racines locales, cases de toutes les régions)
+        self.shared_networks = []
+        for slot, cables, readers in spec['networks']:
+            roots = sorted({self.find_network(self.local(cable)) for cable in cables})
+            self.shared_networks.append((spec['row'] + slot, roots, readers))
+        self.external = dict.fromkeys((root for _, roots, _ in self.shared_networks for root in roots), 0)
+
+    def local(self, cell):
+        """Cellule locale correspondant à une cellule de la grille entière."""
+        y, x = divmod(cell, self.global_stride)
+        return (y - self.window[1]) * self.stride + x - self.window[0]
+
+    def global_cell(self, cell):
+        y, x = divmod(cell, self.stride)
+        return (y + self.window[1]) * self.global_stride + x + self.window[0]
+
+    def owns(self, cell):
+        """True si la cellule locale appartient à la région (et non au halo)."""
+        x, y = self.position(cell)
+        x0, y0, x1, y1 = self.region
+        return x0 <= x + self.window[0] <= x1 and y0 <= y + self.window[1] <= y1
+
+    def fire_due_events(self):
+        fired = super().fire_due_events()
+        self.exchange()
+        return fired
+
+    def exchange(self):
+        """
+        Publie la bande de bord de la région, relit le halo écrit par les voisines puis met en commun
+        les sources des réseaux partagés. Appelé au début de chaque tick, après les événements.
+        """
+        plane, active = self.plane, self.active
+        for start, local, length in self.outgoing:
+            plane[start:start + length] = active[local:local + length]
+        self.barrier.wait()
+        for start, local, length in self.incoming:
+            values = plane[start:start + length]
+            if values != active[local:local + length]:
+                for cell, value in enumerate(values, local):
+                    if active[cell] != value:
+                        self.set_active(cell, value)
+        flags, sources, external = self.flags, self.network_sources, self.external
+        for slot, roots, _ in self.shared_networks:
+            flags[slot] = any(sources[root] > external[root] for root in roots)
+        self.barrier.wait()
+        for _, roots, readers in self.shared_networks:
+            powered = any(flags[slot] for slot in readers)
+            for root in roots:
+                if external[root] != powered:
+                    sources[root] += powered - external[root]
+                    external[root] = powered
+                    self.enqueue(root, CABLE)
+
+    def owned_changes(self):
+        """Cellules de la région (en numérotation globale) modifiées depuis la dernière collecte."""
+        return [self.global_cell(cell) for cell in self.collect_changes() if self.owns(cell)]
+
+    def export(self):
+        """État de la région, pour le recopier dans le moteur de la grille entière (voir ShardedSimulation.sync)."""
+        x0, y0, x1, y1 = self.region
+        rows = []
+        for y in range(y0, y1 + 1):
+            start = self.index(x0 - self.window[0], y - self.window[1])
+            rows.append((bytes(self.active[start:start + x1 - x0 + 1]),
+                         bytes(self.initialized[start:start + x1 - x0 + 1])))
+        return {
+            'rows': rows,
+            'events': [(tick, action, self.global_cell(cell)) for tick, action, cell in self.pending_events()
+                       if self.owns(cell)],
+            'warming': [(self.global_cell(cell), tick) for cell, tick in self.warming.items() if self.owns(cell)],
+            'dirty': [[self.global_cell(cell) for cell in cells if self.owns(cell)] for cells in self.dirty],
+        }
+
+
+def serve(spec, conn, barrier):
+    """Boucle d'un processus de calcul : exécute les commandes reçues de ShardedSimulation."""
+    plane = shared_memory.SharedMemory(name=spec['plane'])
+    flags = shared_memory.SharedMemory(name=spec['flags'])
+    shard = Shard(spec, barrier, plane.buf, flags.buf)
+    try:
+        while True:
+            command, arg = conn.recv()
+            if command == 'close':
+                break
+            try:
+                if command == 'run':
+                    toggles, ticks = arg
+                    for cell in toggles:
+                        shard.toggle_item_state(shard.local(cell))
+                    for _ in range(ticks):
+                        shard.advance()
+                    conn.send(('ok', shard.owned_changes()))
+                elif command == 'export':
+                    conn.send(('ok', shard.export()))
+            except Exception:
+                barrier.abort()  # Les autres régions ne doivent pas attendre ce processus indéfiniment
+                conn.send(('error', traceback.format_exc()))
+    finally:
+        shard.plane = shard.flags = None
+        plane.close()
+        flags.close()
+
+
+# ---------------------- Pilotage ----------------------
+class ShardedSimulation:
+    """
+    Calcule une grille en parallèle, région par région. Reçoit un moteur en mode bufferisé (sa
+    disposition ne doit plus changer tant que la simulation découpée est ouverte) ; sync() lui
+    recopie l'état atteint. S'utilise comme un moteur : run, step, toggle_item_state.
+    """
+    def __init__(self, sim, shards=None):
+        if type(sim) is not Simulation:
+            raise ValueError("Seul le moteur Python (engine.Simulation) peut être découpé")
+        if not sim.buffered:
+            raise ValueError("La simulation découpée exige le mode bufferisé")
+        if sim.macros:
+            raise ValueError("La simulation découpée ne prend pas en charge les macros")
+        self.sim = sim
+        self.tick = sim.tick
+        self.regions = partition(sim.rows, sim.cols, shards or os.cpu_count() or 1)
+        self.windows = [halo_window(region, sim.rows, sim.cols) for region in self.regions]
+        self.toggles = [[] for _ in self.regions]  # Bascules de boutons envoyées avec le prochain calcul
+        networks = self.shared_networks()
+        count = len(self.regions)
+        self.plane = shared_memory.SharedMemory(create=True, size=len(sim.active))
+        self.plane.buf[:len(sim.active)] = sim.active
+        self.flags = shared_memory.SharedMemory(create=True, size=max(1, count * len(networks)))
+        context = multiprocessing.get_context()
+        barrier = context.Barrier(count)
+        self.pipes, self.processes = [], []
+        for rank in range(count):
+            parent, child = context.Pipe()
+            process = context.Process(target=serve, args=(self.spec(rank, networks), child, barrier), daemon=True)
+            process.start()
+            child.close()
+            self.pipes.append(parent)
+            self.processes.append(process)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def owner(self, cell):
+        """Rang de la région qui contient la cellule."""
+        x, y = self.sim.position(cell)
+        for rank, (x0, y0, x1, y1) in enumerate(self.regions):
+            if x0 <= x <= x1 and y0 <= y <= y1:
+                return rank
+        raise ValueError(f"Cellule hors de la grille : {cell}")
+
+    def window_runs(self, rank):
+        """Pour chaque ligne du halo de la région rank, les intervalles de colonnes lus chez les voisines."""
+        x0, y0, x1, y1 = self.regions[rank]
+        wx0, wy0, wx1, wy1 = self.windows[rank]
+        for y in range(wy0, wy1 + 1):
+            if y0 <= y <= y1:
+                runs = ([(wx0, x0 - 1)] if wx0 < x0 else []) + ([(x1 + 1, wx1)] if x1 < wx1 else [])
+            else:
+                runs = [(wx0, wx1)]
+            yield y, runs
+
+    def border_runs(self, rank):
+        """Pour chaque ligne de la région rank, les intervalles de colonnes que lisent les voisines."""
+        x0, y0, x1, y1 = self.regions[rank]
+        for y in range(y0, y1 + 1):
+            runs = []
+            for other, (wx0, wy0, wx1, wy1) in enumerate(self.windows):
+                if other != rank and wy0 <= y <= wy1 and wx0 <= x1 and x0 <= wx1:
+                    runs.append((max(x0, wx0), min(x1, wx1)))
+            yield y, merge_runs(runs)
+
+    def shared_networks(self):
+        """
+        Réseaux de câbles présents dans plusieurs régions (avec leur halo) : ce sont ceux qui ont un
+        câble dans un halo. Renvoie {racine : (numéro, {rang : câbles du halo ou de la bande de bord})}.
+        """
+        sim, kind = self.sim, self.sim.kind
+        networks = {}
+        for runs in (self.window_runs, self.border_runs):
+            for rank in range(len(self.regions)):
+                for y, row_runs in runs(rank):
+                    for a, b in row_runs:
+                        for cell in range(sim.index(a, y), sim.index(b, y) + 1):
+                            if kind[cell] == CABLE:
+                                root = sim.find_network(cell)
+                                if runs == self.window_runs and root not in networks:
+                                    networks[root] = (len(networks), {})
+                                if root in networks:
+                                    networks[root][1].setdefault(rank, []).append(cell)
+        return networks
+
+    def spec(self, rank, networks):
+        """Description de la région rank transmise à son processus (état initial et segments échangés)."""
+        sim = self.sim
+        wx0, wy0, wx1, wy1 = window = self.windows[rank]
+        width = wx1 - wx0 + 1
+        planes = {name: bytearray() for name in ('kind', 'active', 'initialized')}
+        for y in range(wy0, wy1 + 1):
+            start = sim.index(wx0, y)
+            for name, plane in planes.items():
+                plane += getattr(sim, name)[start:start + width]
+
+        def inside(cell):
+            x, y = sim.position(cell)
+            return wx0 <= x <= wx1 and wy0 <= y <= wy1
+
+        def segments(runs):
+            return [(sim.index(a, y), b - a + 1) for y, row_runs in runs for a, b in row_runs]
+
+        return dict(
+            planes,
+            region=self.regions[rank],
+            window=window,
+            stride=sim.stride,
+            tick=sim.tick,
+            events=[(tick, action, cell) for tick, action, cell in sim.pending_events() if inside(cell)],
+            warming=[(cell, tick) for cell, tick in sim.warming.items() if inside(cell)],
+            dirty=[[cell for cell in cells if inside(cell)] for cells in sim.dirty],
+            outgoing=segments(self.border_runs(rank)),
+            incoming=segments(self.window_runs(rank)),
+            row=rank * len(networks),
+            networks=[(slot, cables[rank], [other * len(networks) + slot for other in cables])
+                      for slot, cables in networks.values() if rank in cables],
+            plane=self.plane.name,
+            flags=self.flags.name,
+        )
+
+    def request(self, commands):
+        """Envoie une commande par processus et renvoie leurs réponses, dans l'ordre des régions."""
+        for pipe, command in zip(self.pipes, commands):
+            pipe.send(command)
+        replies = [pipe.recv() for pipe in self.pipes]
+        for rank, (status, payload) in enumerate(replies):
+            if status == 'error':
+                raise RuntimeError(f"Région {rank} :\n{payload}")
+        return [payload for _, payload in replies]
+
+    # ---------------------- Simulation ----------------------
+    def toggle_item_state(self, cell):
+        """Inverse l'état d'un bouton au début du prochain calcul. Renvoie False si la cellule n'est pas un bouton."""
+        if self.sim.kind[cell] != BUTTON:
+            return False
+        self.toggles[self.owner(cell)].append(cell)
+        return True
+
+    def run(self, n_ticks):
+        """Calcule n_ticks ticks et renvoie les cellules dont l'état final a changé."""
+        commands = [('run', (toggles, n_ticks)) for toggles in self.toggles]
+        self.toggles = [[] for _ in self.regions]
+        changed = set()
+        for cells in self.request(commands):
+            changed.update(cells)
+        self.tick += n_ticks
+        return changed
+
+    def step(self):
+        return self.run(1)
+
+    def cells_of_type(self, item_id):
+        return self.sim.cells_of_type(item_id)
+
+    def cell_count(self):
+        return self.sim.cell_count()
+
+    def sync(self):
+        """Recopie dans le moteur d'origine l'état atteint par les régions et le renvoie."""
+        if any(self.toggles):
+            self.run(0)
+        sim = self.sim
+        states = self.request([('export', None)] * len(self.regions))
+        sim.tick = self.tick
+        sim.events = TimingWheel(self.tick)
+        sim.warming = {}
+        dirty = [set() for _ in PHASES]
+        for (x0, y0, x1, _), state in zip(self.regions, states):
+            for y, (active, initialized) in enumerate(state['rows'], y0):
+                start = sim.index(x0, y)
+                sim.active[start:start + x1 - x0 + 1] = active
+                sim.initialized[start:start + x1 - x0 + 1] = initialized
+            for tick, action, cell in state['events']:
+                sim.events.schedule(tick, action, cell)
+            sim.warming.update(state['warming'])
+            for phase, cells in enumerate(state['dirty']):
+                dirty[phase].update(cells)
+        sim.rebuild()
+        dirty[CABLE_PHASE].update(sim.network_state)
+        sim.dirty = dirty
+        sim.changes = {}
+        return sim
+
+    def close(self):
+        """Arrête les processus de calcul et libère la mémoire partagée (sans recopier l'état, voir sync)."""
+        if not self.processes:
+            return
+        for pipe in self.pipes:
+            try:
+                pipe.send(('close', None))
+            except OSError:
+                pass
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self.processes, self.pipes = [], []
+        self.plane.close()
+        self.plane.unlink()
+        self.flags.close()
+        self.flags.unlink()
@@ -0,0 +1,386 @@
+"""Vérification croisée du moteur, sans affichage (python -m unittest test_engine).
+
+Le moteur ne réévalue que les cellules sales ; sur des grilles aléatoires,
+éditées et dont les boutons sont basculés entre les ticks, ses états doivent
+rester identiques à ceux des chemins de référence après chaque tick, en mode
+séquentiel comme en mode bufferisé :
+
+- le même moteur réévaluant toute la grille à chaque tick (invalidate) ;
+- le moteur NumPy (numpy_engine.py), si NumPy est installé.
+
+Les modules construits sur le moteur sont vérifiés de même, le plus souvent contre les ticks :
+
+- la stabilisation de la netlist (netlist.py) sur les presets de portes ;
+- leurs tables de vérité, y compris découpées en blocs de moins d'un octet ;
+- les tables des macros (macro.py) et les instances qui remplacent les cellules ;
+- les grilles sauvegardées puis rechargées (boardfile.py), en plusieurs chunks ;
+- les retours en arrière de l'historique (history.py), boutons basculés entre les ticks ;
+- les traces des sondes (waveform.py), relues par blocs puis exportées en VCD ;
+- la simulation découpée en régions (sharded.py), face au moteur bufferisé ;
+- les codes de sortie de la ligne de commande (cli.py).
+"""
+import io
+import json
+import os
+import random
+import tempfile
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+
+import cli
+from boardfile import save_board, load_board
+from engine import Simulation, BUTTON, LED, SWITCH_INIT_DELAY
+from history import History
+from macro import Macro, collapse
+from netlist import Netlist
+from presets import PRESETS, schema_size, stamp
+from sharded import ShardedSimulation
+from waveform import TraceRecorder, TraceReader, write_vcd
+
+try:
+    from numpy_engine import NumpySimulation, np
+except ImportError:
+    np = None
+
+TRIALS = 150  # Grilles aléatoires par mode et par référence
+TICKS = 60  # Ticks simulés par grille
+SHARDED_TRIALS = 40  # Grilles découpées (chacune démarre ses processus)
+SETTLE_TICKS = 200  # Ticks laissés à un preset pour se stabiliser
+
+
+class FullRecompute(Simulation):
+    """Chemin de référence : toute la grille est réévaluée à chaque tick."""
+    def advance(self):
+        self.invalidate()
+        super().advance()
+
+
+def cross_check(case, reference, buffered, seed):
+    rng = random.Random(seed)
+    size = rng.randint(4, 12)
+    density = rng.uniform(0.3, 0.9)
+    weights = rng.choice(((5, 2, 4, 3, 1, 1), (6, 1, 3, 2, 2, 2)))
+    placements = [(rng.choices(range(6), weights)[0], x, y)
+                  for y in range(size) for x in range(size) if rng.random() < density]
+    sims = [Simulation(size, size, buffered), reference(size, size, buffered)]
+    for sim in sims:
+        sim.place_items(placements)
+    sim = sims[0]
+    for tick in range(TICKS):
+        action = rng.random()
+        cells = sorted(sim.placed_cells())
+        # Les deux moteurs partagent la disposition des plans : une même cellule désigne la même case
+        if action < 0.3 and cells:
+            buttons = sim.cells_of_type(BUTTON)
+            if buttons:
+                cell = rng.choice(buttons)
+                for target in sims:
+                    target.toggle_item_state(cell)
+        elif action < 0.4:
+            placement = [(rng.choices(range(6), weights)[0], rng.randrange(size), rng.randrange(size))]
+            for target in sims:
+                target.place_items(placement)
+        elif action < 0.45 and cells:
+            cell = rng.choice(cells)
+            for target in sims:
+                target.delete_item(cell)
+        elif action < 0.5 and cells:
+            cell, x, y = rng.choice(cells), rng.randrange(size), rng.randrange(size)
+            for target in sims:
+                target.move_item(cell, x, y)
+        for target in sims:
+            target.advance()
+        case.assertEqual(bytes(sims[0].active), bytes(sims[1].active),
+                         f"graine {seed}, tick {tick}, mode {'bufferisé' if buffered else 'séquentiel'}")
+
+
+def random_sim(rng, buffered):
+    """Grille aléatoire dont quelques ticks ont été calculés (switches en chauffe, signaux en route)."""
+    rows, cols = rng.randint(4, 20), rng.randint(4, 20)
+    sim = Simulation(rows, cols, buffered)
+    sim.place_items([(rng.randrange(6), x, y) for y in range(rows) for x in range(cols) if rng.random() < 0.5])
+    sim.run(rng.randrange(4))
+    return sim
+
+
+def preset_sim(name, buffered, k):
+    """Preset posé, switches initialisés, la combinaison k donnant au bouton i l'état du bit i de k."""
+    width, height = schema_size(PRESETS[name])
+    sim = Simulation(height, width, buffered)
+    stamp(sim, PRESETS[name])
+    sim.run(SWITCH_INIT_DELAY + 1)
+    for i, cell in enumerate(sorted(sim.cells_of_type(BUTTON))):
+        if sim.active[cell] != (k >> i & 1):
+            sim.toggle_item_state(cell)
+    return sim
+
+
+def combinations(name):
+    return range(1 << sum(item_id == BUTTON for item_id, _, _ in PRESETS[name]))
+
+
+class CrossCheckTest(unittest.TestCase):
+    def check_reference(self, reference):
+        for buffered in (False, True):
+            for seed in range(TRIALS):
+                cross_check(self, reference, buffered, seed)
+
+    def test_full_recompute(self):
+        self.check_reference(FullRecompute)
+
+    @unittest.skipIf(np is None, "NumPy n'est pas installé")
+    def test_numpy_engine(self):
+        self.check_reference(NumpySimulation)
+
+
+class NetlistTest(unittest.TestCase):
+    def test_settle(self):
+        for name in PRESETS:
+            for buffered in (False, True):
+                for k in combinations(name):
+                    ticked, settled = preset_sim(name, buffered, k), preset_sim(name, buffered, k)
+                    ticked.run(SETTLE_TICKS)
+                    Netlist(settled).settle()
+                    self.assertEqual(bytes(ticked.active), bytes(settled.active), f"{name}, combinaison {k}")
+
+    def test_truth_table(self):
+        for name in PRESETS:
+            for buffered in (False, True):
+                netlist = Netlist(preset_sim(name, buffered, 0))
+                for block_bits in (1, 2, 16):
+                    table = netlist.truth_table(block_bits=block_bits)
+                    for k in combinations(name):
+                        sim = preset_sim(name, buffered, k)
+                        sim.run(SETTLE_TICKS)
+                        for led in sim.cells_of_type(LED):
+                            bits, unknown = table[led]
+                            self.assertEqual(unknown, 0)
+                            self.assertEqual(bits >> k & 1, sim.active[led], f"{name}, combinaison {k}")
+
+
+class MacroTest(unittest.TestCase):
+    def outputs(self, sim, macro, k):
+        """États des sorties de la macro posée en (0, 0) une fois la combinaison k stabilisée."""
+        Macro.set_inputs(sim, [sim.index(x, y) for x, y in macro.inputs], k)
+        sim.run(SETTLE_TICKS)
+        return tuple(sim.active[sim.index(x, y)] for x, y in macro.outputs)
+
+    def test_table(self):
+        for name in PRESETS:
+            macro = Macro(name, PRESETS[name])
+            for buffered in (False, True):
+                table = macro.table(buffered)
+                for k in combinations(name):
+                    sim = preset_sim(name, buffered, 0)
+                    self.assertEqual(self.outputs(sim, macro, k), table[k], f"{name}, combinaison {k}")
+
+    def test_instance(self):
+        for name in PRESETS:
+            macro = Macro(name, PRESETS[name])
+            for buffered in (False, True):
+                sim = Simulation(macro.height, macro.width, buffered)
+                stamp(sim, macro.schema)
+                collapse(sim, macro, 0, 0)
+                for k in combinations(name):
+                    self.assertEqual(self.outputs(sim, macro, k), macro.table(buffered)[k], f"{name}, combinaison {k}")
+
+    @unittest.skipIf(np is None, "NumPy n'est pas installé")
+    def test_numpy_refuses_collapse(self):
+        macro = Macro("Porte AND", PRESETS["Porte AND"])
+        sim = NumpySimulation(macro.height, macro.width)
+        stamp(sim, macro.schema)
+        planes = bytes(sim.kind), bytes(sim.active), bytes(sim.initialized)
+        warming = dict(sim.warming)
+        with self.assertRaises(ValueError):
+            collapse(sim, macro, 0, 0)
+        self.assertEqual((bytes(sim.kind), bytes(sim.active), bytes(sim.initialized)), planes)
+        self.assertEqual(sim.warming, warming)
+
+
+class BoardFileTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'grille.elk')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        for seed in range(TRIALS):
+            rng = random.Random(seed)
+            sim = random_sim(rng, rng.random() < 0.5)
+            save_board(sim, self.path, {'3': {'name': 'Câble'}}, chunk_size=5)
+            loaded, items = load_board(self.path)
+            self.assertEqual(items, {3: {'name': 'Câble'}})
+            self.assertEqual((loaded.tick, loaded.buffered), (sim.tick, sim.buffered))
+            for tick in range(TICKS):
+                for plane in ('kind', 'active', 'initialized'):
+                    self.assertEqual(bytes(getattr(loaded, plane)), bytes(getattr(sim, plane)),
+                                     f"graine {seed}, tick {tick}, plan {plane}")
+                sim.advance()
+                loaded.advance()
+
+    def test_truncated(self):
+        sim = random_sim(random.Random(0), False)
+        save_board(sim, self.path, chunk_size=5)
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        for length in range(len(data)):
+            with open(self.path, 'wb') as f:
+                f.write(data[:length])
+            with self.assertRaises(ValueError, msg=f"{length} octets sur {len(data)}"):
+                load_board(self.path)
+
+
+class HistoryTest(unittest.TestCase):
+    def record(self, rng):
+        """Moteur suivi par un historique ; renvoie (moteur, historique, empreinte de chaque tick calculé)."""
+        sim = random_sim(rng, rng.random() < 0.5)
+        history = History(capacity=TICKS, keyframe_every=7)
+        history.attach(sim)
+        digests = {sim.tick: sim.state_digest()}
+        for _ in range(2 * TICKS):
+            sim.advance()
+            digests[sim.tick] = sim.state_digest()
+            buttons = sim.cells_of_type(BUTTON)
+            if buttons and rng.random() < 0.2:
+                sim.toggle_item_state(rng.choice(buttons))
+        return sim, history, digests
+
+    def test_jump(self):
+        for seed in range(TRIALS):
+            rng = random.Random(seed)
+            sim, history, digests = self.record(rng)
+            ticks = [tick for tick in digests if history.retains(tick)]
+            for tick in sorted(rng.sample(ticks, 5), reverse=True):
+                history.jump(tick)
+                self.assertEqual(sim.tick, tick)
+                self.assertEqual(sim.state_digest(), digests[tick], f"graine {seed}, tick {tick}")
+
+    def test_rewind(self):
+        for seed in range(TRIALS):
+            sim, history, digests = self.record(random.Random(seed))
+            tick, _ = history.rewind(TICKS // 2)
+            self.assertEqual(tick, sim.tick)
+            self.assertEqual(sim.state_digest(), digests[tick], f"graine {seed}")
+            tick, _ = history.rewind(10 * TICKS)  # Au plus jusqu'au premier tick gardé
+            self.assertEqual(tick, history.oldest())
+            self.assertEqual(sim.state_digest(), digests[tick], f"graine {seed}")
+
+
+class WaveformTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'trace.elt')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def record(self, seed):
+        """Enregistre une grille aléatoire ; renvoie (sondes, état des sondes à chaque tick)."""
+        rng = random.Random(seed)
+        sim = random_sim(rng, rng.random() < 0.5)
+        probes = [(f"sonde {i}", rng.randrange(sim.cols), rng.randrange(sim.rows)) for i in range(5)]
+        probes.append(("hors grille", -1, 0))
+        recorder = TraceRecorder(self.path, probes, block_ticks=7)
+        recorder.attach(sim)
+        expected = {sim.tick: [sim.active[sim.index(x, y)] for _, x, y in probes[:-1]] + [0]}
+        for _ in range(TICKS):
+            buttons = sim.cells_of_type(BUTTON)
+            if buttons and rng.random() < 0.2:
+                sim.toggle_item_state(rng.choice(buttons))
+            sim.advance()
+            expected[sim.tick] = [sim.active[sim.index(x, y)] for _, x, y in probes[:-1]] + [0]
+        recorder.close()
+        return probes, expected
+
+    def test_round_trip(self):
+        for seed in range(TRIALS):
+            probes, expected = self.record(seed)
+            with TraceReader(self.path) as reader:
+                self.assertEqual(reader.probes, probes)
+                self.assertEqual((reader.start, reader.end), (min(expected), max(expected) + 1))
+                for probe in range(len(probes)):
+                    changes = [(tick, values[probe]) for tick, values in sorted(expected.items())
+                               if tick == reader.start or values[probe] != expected[tick - 1][probe]]
+                    self.assertEqual(list(reader.transitions(probe)), changes, f"graine {seed}, sonde {probe}")
+                    for tick, values in expected.items():
+                        self.assertEqual(reader.value_at(probe, tick), values[probe])
+
+    def test_vcd(self):
+        probes, expected = self.record(0)
+        vcd = os.path.join(self.directory.name, 'trace.vcd')
+        with TraceReader(self.path) as reader:
+            write_vcd(reader, vcd)
+            transitions = {name: list(reader.transitions(name)) for name, _, _ in probes}
+        names, changes, tick = {}, {}, None
+        with open(vcd) as f:
+            for line in f:
+                if line.startswith('$var'):
+                    _, _, _, identifier, name, _ = line.split()
+                    names[identifier] = name
+                elif line.startswith('#'):
+                    tick = int(line[1:])
+                elif line[0] in '01':
+                    changes.setdefault(names[line[1:].strip()], []).append((tick, int(line[0])))
+        self.assertEqual(tick, max(expected) + 1)
+        self.assertEqual(changes, {name.replace(' ', '_'): values for name, values in transitions.items()})
+
+
+class ShardedTest(unittest.TestCase):
+    def test_matches_buffered(self):
+        for seed in range(SHARDED_TRIALS):
+            rng = random.Random(seed)
+            reference = random_sim(random.Random(seed), True)
+            with ShardedSimulation(random_sim(random.Random(seed), True), shards=rng.randint(2, 4)) as sharded:
+                while reference.tick < TICKS:
+                    buttons = reference.cells_of_type(BUTTON)
+                    if buttons and rng.random() < 0.5:
+                        cell = rng.choice(buttons)
+                        reference.toggle_item_state(cell)
+                        sharded.toggle_item_state(cell)
+                    ticks = rng.randint(1, 8)
+                    reference.run(ticks)
+                    sharded.run(ticks)
+                    sim = sharded.sync()
+                    self.assertEqual(sim.tick, reference.tick)
+                    self.assertEqual(bytes(sim.active), bytes(reference.active), f"graine {seed}, tick {sim.tick}")
+                    self.assertEqual(bytes(sim.initialized), bytes(reference.initialized))
+
+
+class CliTest(unittest.TestCase):
+    def main(self, *argv):
+        """Code de sortie et sortie standard de cli.main."""
+        output = io.StringIO()
+        with redirect_stdout(output):
+            status = cli.main(list(argv))
+        return status, output.getvalue()
+
+    def test_expect(self):
+        self.assertEqual(self.main('--preset', 'Porte XOR', '--press', '0,0', '--until-stable', '--expect', '1')[0], 0)
+        status, output = self.main('--preset', 'Porte XOR', '--until-stable', '--expect', '1')
+        self.assertEqual(status, 1)
+        self.assertIn("Échec : états finaux 0, attendus 1", output)
+
+    def test_batch(self):
+        with tempfile.TemporaryDirectory() as directory:
+            board = os.path.join(directory, 'porte.elk')
+            save_board(cli.build_preset('Porte NOT'), board)
+            missing = os.path.join(directory, 'absente.elk')
+            self.assertEqual(self.main(board, '--until-stable', '--expect', '0')[0], 0)
+            # Une grille illisible fait échouer le lot, les suivantes sont tout de même vérifiées
+            status, output = self.main(missing, board, '--until-stable', '--expect', '0', '--json')
+        self.assertEqual(status, 1)
+        results = [json.loads(line) for line in output.splitlines()]
+        self.assertEqual([result['board'] for result in results], [missing, board])
+        self.assertTrue(results[0]['failures'])
+        self.assertEqual(results[1]['failures'], [])
+
+    def test_invalid_arguments(self):
+        with redirect_stderr(io.StringIO()), self.assertRaises(SystemExit) as context:
+            self.main('--preset', 'Porte XOR', '--ticks', '-1')
+        self.assertEqual(context.exception.code, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,353 @@
+"""Enregistrement de l'état de cellules sondes, tick par tick, dans un fichier de trace.
+
+Les sondes sont des positions de la grille. Après chaque tick, l'enregistreur
+relève leur état (un octet par sonde) et ne garde que les changements : pour
+chaque sonde, la trace est une suite de plages de ticks de même état
+(run-length encoding). Un tick sans changement ne coûte qu'une comparaison.
+
+Le fichier est en ajout seul : un en-tête (description des sondes) puis des
+blocs de block_ticks ticks au plus, écrits au fil de l'enregistrement. Chaque
+bloc est organisé en colonnes : un répertoire (état initial, largeur et
+nombre des plages de chaque sonde) puis, sonde après sonde, les longueurs des
+plages en entiers de 1, 2 ou 4 octets. Un fichier interrompu reste lisible
+jusqu'à son dernier bloc complet.
+
+TraceReader ouvre la trace par memory mapping : seuls le répertoire des blocs
+et les colonnes des sondes lues sont chargés, si bien qu'une trace de
+plusieurs millions de ticks s'analyse sans être lue en entier. write_vcd
+l'exporte au format VCD (Value Change Dump) pour un visualiseur de
+chronogrammes comme GTKWave.
+"""
+import bisect
+import heapq
+import json
+import mmap
+import re
+import struct
+import unicodedata
+from array import array
+from collections import deque
+
+from cycles import DEFAULT_HISTORY
+
+MAGIC = b'ELKTRACE'
+FORMAT_VERSION = 1
+BLOCK_TICKS = 65536  # Ticks au plus par bloc : la trace est écrite sur disque au moins à ce rythme
+HEADER = struct.Struct('<8sHI')  # magique, version, taille de la description JSON des sondes
+BLOCK_HEADER = struct.Struct('<4sQII')  # magique, premier tick, nombre de ticks, taille du reste du bloc
+BLOCK_MAGIC = b'BLCK'
+COLUMN = struct.Struct('<BcI')  # état initial, type des longueurs (array), nombre de plages
+WIDTHS = ('B', 'H', 'I')  # Types possibles des longueurs de plages, du plus compact au plus large
+
+
+class TraceRecorder:
+    def __init__(self, path, probes, block_ticks=BLOCK_TICKS):
+        """probes : [(nom, x, y), ...], positions de la grille dont l'état est enregistré."""
+        self.probes = [[name, x, y] for name, x, y in probes]
+        self.block_ticks = block_ticks
+        self.file = open(path, 'wb')
+        description = json.dumps([{'name': name, 'x': x, 'y': y} for name, x, y in self.probes]).encode()
+        self.file.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(description)) + description)
+        self.sim = None
+        self.saved = {}  # Méthodes du moteur remplacées par attach (wrappers du profileur compris)
+        self.period = None  # Fonction renvoyant la période de l'orbite sautée (voir attach)
+        self.plane = None  # Plan actif du moteur lors de la recherche des cellules sondes
+        self.cells = []
+        self.values = None  # État des sondes au dernier tick relevé
+        self.recent = deque(maxlen=DEFAULT_HISTORY)  # Derniers relevés, rejoués quand des ticks sont sautés
+        self.tick = None  # Dernier tick relevé
+        self.block_start = None
+        self.initial = None  # État des sondes au premier tick du bloc en cours
+        self.run_start = []  # Par sonde : tick où a commencé sa plage en cours
+        self.runs = []  # Par sonde : longueurs des plages terminées du bloc en cours
+        self.ticks = 0  # Ticks enregistrés
+
+    # ---------------------- Instrumentation du moteur ----------------------
+    def attach(self, sim, period=None):
+        """
+        Relève l'état des sondes au tick courant, puis après chaque tick calculé par sim. Les ticks sautés
+        sur une orbite périodique (voir cycles.py) sont reconstitués à partir des derniers relevés :
+        period renvoie la période de l'orbite (CycleDetector.current_period) ; sans period, un saut est
+        supposé couvrir un point fixe.
+        """
+        self.detach()
+        self.sim, self.period = sim, period
+        self.saved = {name: sim.__dict__.get(name) for name in ('advance', 'skip')}
+        self.locate()
+        self.start(sim.tick, self.read())
+        advance, skip = sim.advance, sim.skip
+
+        def recorded_advance():
+            advance()
+            self.record(self.read())
+
+        def recorded_skip(ticks):
+            period = (self.period() if self.period else None) or 1
+            skip(ticks)
+            self.replay(ticks, period)
+        sim.advance, sim.skip = recorded_advance, recorded_skip
+
+    def detach(self):
+        """Rend au moteur ses méthodes (celles qu'il avait à l'attache, profileur compris)."""
+        if self.sim is None:
+            return
+        for name, method in self.saved.items():
+            if method is None:
+                self.sim.__dict__.pop(name, None)
+            else:
+                setattr(self.sim, name, method)
+        self.sim = None
+
+    def locate(self):
+        """Cellules des sondes ; une sonde hors de la grille lit la bordure, toujours inactive."""
+        sim = self.sim
+        self.plane = sim.active
+        self.cells = [sim.index(x, y) if sim.in_bounds(x, y) else 0 for _, x, y in self.probes]
+
+    def shift(self, dx, dy):
+        """Suit les items décalés par un redimensionnement de la grille (voir Simulation.resize)."""
+        for probe in self.probes:
+            probe[1] += dx
+            probe[2] += dy
+        if self.sim is not None:
+            self.locate()
+
+    def read(self):
+        if self.sim.active is not self.plane:
+            self.locate()  # Plans réalloués par un redimensionnement
+        return bytes(map(self.plane.__getitem__, self.cells))
+
+    # ---------------------- Plages ----------------------
+    def start(self, tick, values):
+        self.tick = self.block_start = tick
+        self.values = self.initial = values
+        self.run_start = [tick] * len(values)
+        self.runs = [[] for _ in values]
+        self.recent.append(values)
+        self.ticks += 1
+
+    def record(self, values):
+        """Relève l'état des sondes au tick suivant le dernier relevé."""
+        tick = self.tick + 1
+        if tick - self.block_start == self.block_ticks:
+            self.flush()
+        if values != self.values:
+            run_start, runs = self.run_start, self.runs
+            for probe, (before, after) in enumerate(zip(self.values, values)):
+                if before != after:
+                    runs[probe].append(tick - run_start[probe])
+                    run_start[probe] = tick
+            self.values = values
+        self.tick = tick
+        self.recent.append(values)
+        self.ticks += 1
+
+    def replay(self, ticks, period):
+        """
+        Enregistre ticks ticks sautés : les period derniers relevés se répètent. Une orbite plus longue
+        que les relevés (détecteur non remis à zéro au début de l'enregistrement) est traitée en point fixe.
+        """
+        if period == 1 or period > len(self.recent):
+            self.hold(ticks)
+            return
+        cycle = list(self.recent)[-period:]
+        for offset in range(ticks):
+            self.record(cycle[offset % period])
+
+    def hold(self, ticks):
+        """Enregistre ticks ticks sans changement : les plages en cours s'allongent, bloc par bloc."""
+        self.recent.extend([self.values] * min(ticks, self.recent.maxlen))
+        self.ticks += ticks
+        while ticks:
+            if self.tick + 1 - self.block_start == self.block_ticks:
+                self.flush()
+            step = min(ticks, self.block_ticks - (self.tick + 1 - self.block_start))
+            self.tick += step
+            ticks -= step
+
+    def flush(self):
+        """Écrit le bloc en cours (ticks relevés depuis son début) et en commence un nouveau."""
+        end = self.tick + 1
+        directory, columns = [], []
+        for probe, runs in enumerate(self.runs):
+            runs.append(end - self.run_start[probe])
+            longest = max(runs)
+            typecode = next(code for code in WIDTHS if longest < 256 ** array(code).itemsize)
+            directory.append(COLUMN.pack(self.initial[probe], typecode.encode(), len(runs)))
+            columns.append(array(typecode, runs).tobytes())
+        payload = b''.join(directory + columns)
+        self.file.write(BLOCK_HEADER.pack(BLOCK_MAGIC, self.block_start, end - self.block_start, len(payload)))
+        self.file.write(payload)
+        self.file.flush()
+        self.block_start = end
+        self.initial = self.values
+        self.run_start = [end] * len(self.runs)
+        self.runs = [[] for _ in self.runs]
+
+    def close(self):
+        """Détache l'enregistreur, écrit le dernier bloc et ferme le fichier."""
+        self.detach()
+        if self.file.closed:
+            return
+        if self.tick is not None and self.tick >= self.block_start:
+            self.flush()
+        self.file.close()
+
+
+# ---------------------- Lecture ----------------------
+class TraceReader:
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self.read_header()
+        except struct.error as error:
+            self.map.close()
+            raise ValueError("Fichier de trace tronqué") from error
+        except ValueError:
+            self.map.close()
+            raise
+
+    def read_header(self):
+        magic, version, size = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise ValueError("Fichier de trace invalide")
+        if version > FORMAT_VERSION:
+            raise ValueError(f"Version de trace non prise en charge : {version}")
+        if HEADER.size + size > len(self.map):
+            raise ValueError("Fichier de trace tronqué")
+        self.probes = [(probe['name'], probe['x'], probe['y'])
+                       for probe in json.loads(self.map[HEADER.size:HEADER.size + size])]
+        # Répertoire des blocs : premiers ticks, nombres de ticks, positions du reste du bloc
+        self.firsts, self.lengths, self.offsets = [], [], []
+        offset = HEADER.size + size
+        while offset + BLOCK_HEADER.size <= len(self.map):
+            magic, first, ticks, payload = BLOCK_HEADER.unpack_from(self.map, offset)
+            offset += BLOCK_HEADER.size
+            if magic != BLOCK_MAGIC or offset + payload > len(self.map):
+                break  # Bloc incomplet : enregistrement interrompu
+            self.firsts.append(first)
+            self.lengths.append(ticks)
+            self.offsets.append(offset)
+            offset += payload
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.map.close()
+
+    @property
+    def start(self):
+        """Premier tick enregistré (None pour une trace vide)."""
+        return self.firsts[0] if self.firsts else None
+
+    @property
+    def end(self):
+        """Tick suivant le dernier tick enregistré."""
+        return self.firsts[-1] + self.lengths[-1] if self.firsts else None
+
+    def probe_index(self, probe):
+        """Numéro d'une sonde donnée par son numéro ou par son nom."""
+        if isinstance(probe, int):
+            return probe
+        for index, (name, _, _) in enumerate(self.probes):
+            if name == probe:
+                return index
+        raise KeyError(probe)
+
+    def block_runs(self, block, probe):
+        """État initial et longueurs des plages d'une sonde dans un bloc (seule sa colonne est lue)."""
+        offset = self.offsets[block]
+        position = offset + COLUMN.size * len(self.probes)
+        for column in range(probe + 1):
+            initial, typecode, count = COLUMN.unpack_from(self.map, offset + COLUMN.size * column)
+            size = count * array(typecode.decode()).itemsize
+            if column < probe:
+                position += size
+        runs = array(typecode.decode())
+        runs.frombytes(self.map[position:position + size])
+        return initial, runs
+
+    def runs(self, probe):
+        """Itère sur les plages (premier tick, état, nombre de ticks) d'une sonde, fusionnées entre blocs."""
+        probe = self.probe_index(probe)
+        pending = None
+        for block, first in enumerate(self.firsts):
+            value, runs = self.block_runs(block, probe)
+            tick = first
+            for length in runs:
+                if pending is not None and pending[1] == value:
+                    pending[2] += length
+                else:
+                    if pending is not None:
+                        yield tuple(pending)
+                    pending = [tick, value, length]
+                tick += length
+                value ^= 1
+        if pending is not None:
+            yield tuple(pending)
+
+    def transitions(self, probe):
+        """Itère sur les changements (tick, état) d'une sonde, état au premier tick compris."""
+        for tick, value, _ in self.runs(probe):
+            yield tick, value
+
+    def value_at(self, probe, tick):
+        """État d'une sonde à un tick enregistré (seul le bloc de ce tick est lu)."""
+        block = bisect.bisect_right(self.firsts, tick) - 1
+        if block < 0 or tick >= self.firsts[block] + self.lengths[block]:
+            raise IndexError(f"Tick hors de la trace : {tick}")
+        value, runs = self.block_runs(block, self.probe_index(probe))
+        position = self.firsts[block]
+        for length in runs:
+            position += length
+            if tick < position:
+                return value
+            value ^= 1
+
+
+# ---------------------- Export VCD ----------------------
+def vcd_identifier(index):
+    """Identifiant VCD court (caractères ASCII imprimables) du signal numéro index."""
+    characters = []
+    while True:
+        index, digit = divmod(index, 94)
+        characters.append(chr(33 + digit))
+        if not index:
+            return ''.join(characters)
+        index -= 1
+
+
+def vcd_name(name):
+    """Nom de signal VCD : accents retirés, puis tout caractère autre qu'alphanumérique remplacé par _."""
+    ascii_name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode()
+    return re.sub(r'[^0-9A-Za-z_]', '_', ascii_name) or '_'
+
+
+def labelled(transitions, identifier):
+    for tick, value in transitions:
+        yield tick, identifier, value
+
+
+def write_vcd(reader, path, timescale='100 ms'):
+    """Exporte une trace au format VCD ; une unité de temps par tick (100 ms par défaut, comme l'interface)."""
+    identifiers = [vcd_identifier(index) for index in range(len(reader.probes))]
+    changes = heapq.merge(*[labelled(reader.transitions(probe), identifier)
+                            for probe, identifier in enumerate(identifiers)])
+    with open(path, 'w') as f:
+        f.write(f"$version elektrikal $end\n$timescale {timescale} $end\n$scope module grille $end\n")
+        for (name, _, _), identifier in zip(reader.probes, identifiers):
+            f.write(f"$var wire 1 {identifier} {vcd_name(name)} $end\n")
+        f.write("$upscope $end\n$enddefinitions $end\n")
+        current = None
+        for tick, identifier, value in changes:
+            if tick != current:
+                f.write(f"#{tick}\n")
+                current = tick
+            f.write(f"{value}{identifier}\n")
+        if reader.end is not None:
+            f.write(f"#{reader.end}\n")